@@ -1,5 +1,10 @@
-from datetime import datetime
 from collections import deque
+import os
+import sys
+
+# 复用log2err中的时间戳快速解析模块
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'log2err'))
+from timestamp_decoder import TimestampDecoder
 
 class ProtocolAnalyzer:
     def __init__(self):
@@ -115,11 +120,13 @@ class ProtocolAnalyzer:
         # 运行时状态跟踪
         self.active_flows = {}
         self.completed_flows = []
+        self.completed_names = set()  # 已完成流程名称集合，前置条件检查O(1)
         self.over_flows = []
 
     def parse_log(self, file_path: str) -> list:
         """解析日志文件（基于制表符分隔的格式）"""
         logs = []
+        decoder = TimestampDecoder()
         with open(file_path, 'r', encoding='utf-8') as f:
             for line_num, line in enumerate(f, 1):
                 # 严格按制表符拆分字段
@@ -132,11 +139,10 @@ class ProtocolAnalyzer:
                 
                 try:
                     # 解析复合时间戳字段（格式：09:42:30.804, 2025-04-07）
-                    start_time_str = parts[2].replace(',', '').strip()  # 09:42:30.804 2025-04-07
                     # end_time_str = parts[3].replace(',', '').strip()
                     
-                    # 解析时间戳（使用第一个时间戳作为基准）
-                    timestamp = datetime.strptime(start_time_str, "%H:%M:%S.%f %Y-%m-%d")
+                    # 解析时间戳（使用第一个时间戳作为基准，固定格式按位置切片解析）
+                    timestamp = decoder.decode(parts[2])
                     
                     # 构建日志条目
                     log_entry = {
@@ -200,6 +206,7 @@ class ProtocolAnalyzer:
                     
                     # 检查流程是否完成
                     if current_state["current_step"] == len(flow_def["steps"]):
+                        self.completed_names.add(flow_name)
                         self.completed_flows.append({
                             "flow_name": flow_name,
                             "status": "completed",
@@ -225,11 +232,7 @@ class ProtocolAnalyzer:
     def _check_prerequisites(self, flow_name: str) -> bool:
         """检查流程前置条件"""
         required_flows = self.flow_definitions[flow_name]["prerequisites"]
-        return all(
-            any(f["flow_name"] == req and f["status"] == "completed" 
-                for f in self.completed_flows)
-            for req in required_flows
-        )
+        return all(req in self.completed_names for req in required_flows)
 
     def _generate_report(self) -> dict:
         """生成结构化报告"""
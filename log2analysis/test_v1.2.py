@@ -1,8 +1,13 @@
 # 该版本为在星网写的版本，逻辑等方面可能存在纰漏
-from datetime import datetime
 from collections import deque
+import os
+import sys
 import json
 
+# 复用log2err中的时间戳快速解析模块
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'log2err'))
+from timestamp_decoder import TimestampDecoder
+
 class ProtocolAnalyzer:
     def __init__(self):
         # 扩展流程模板（包含关键5G流程）
@@ -122,6 +127,7 @@ class ProtocolAnalyzer:
     def parse_log(self, file_path: str) -> list:
         """解析日志文件（基于制表符分隔的格式）"""
         logs = []
+        decoder = TimestampDecoder()
         with open(file_path, 'r', encoding='utf-8') as f:
             for line_num, line in enumerate(f, 1):
                 # 严格按制表符拆分字段
@@ -134,11 +140,10 @@ class ProtocolAnalyzer:
                 
                 try:
                     # 解析复合时间戳字段（格式：09:42:30.804, 2025-04-07）
-                    start_time_str = parts[2].replace(',', '').strip()  # 09:42:30.804 2025-04-07
                     # end_time_str = parts[3].replace(',', '').strip()
                     
-                    # 解析时间戳（使用第一个时间戳作为基准）
-                    timestamp = datetime.strptime(start_time_str, "%H:%M:%S.%f %Y-%m-%d")
+                    # 解析时间戳（使用第一个时间戳作为基准，固定格式按位置切片解析）
+                    timestamp = decoder.decode(parts[2])
                     
                     # 构建日志条目
                     log_entry = {
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+基于 asyncio 的诊断流水线
+把单个日志的诊断拆成相互独立的阶段并发执行：
+    流程诊断   FaultDiagnosisSystem.analyze_log_file，纯Python的CPU计算，放在进程池中
+    读取日志   线程池中读取与清洗文本（I/O为主）
+    向量诊断   AnomalyDetector 的向量引擎编码 + 故障库检索，放在单线程执行器中串行使用模型
+    知识查询   Neo4j 中 故障类型-[BECAUSE]->原因-[DEAL]->解决方案，同步驱动放在线程池中
+流程诊断与"读取→编码→检索"两条链路同时进行，各自得到故障类型后再查询知识图谱，
+单个日志的端到端耗时接近最慢的一条链路，而不是所有阶段之和；多个日志之间也并发处理。
+用法: python async_pipeline.py <日志目录或通配符...> [-j 进程数] [-c 并发日志数] [-o 结果文件]
+                               [--no-vector] [--neo4j bolt://localhost:7687 --user neo4j]
+Neo4j密码从环境变量 NEO4J_PASSWORD 读取，未设置时在终端提示输入（不通过命令行参数传递，避免出现在进程列表与shell历史中）
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import getpass
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from log2err_v1 import _init_worker, _diagnose_file, collect_log_files
+
+TXT2VEC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "txt2vec")
+
+
+class FaultKnowledgeGraph:
+    """故障知识图谱查询：故障类型 -> 原因 -> 解决方案，结果按故障类型缓存（多个线程共用，缓存读写加锁）"""
+
+    QUERY = (
+        "MATCH (t:type {name: $name})-[:BECAUSE]->(r:reason) "
+        "OPTIONAL MATCH (r)-[:DEAL]->(s:solution) "
+        "RETURN r.name AS reason, collect(s.name) AS solutions"
+    )
+
+    def __init__(self, client):
+        """client: 提供 run(query, parameters) 的客户端，例如 graphdatabase/study.py 中的 Neo4jClient"""
+        self.client = client
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, fault_type):
+        """返回 [{"reason": 原因, "solutions": [解决方案, ...]}, ...]"""
+        with self._lock:
+            if fault_type in self._cache:
+                return self._cache[fault_type]
+        # 查询时不持有锁，不同故障类型的查询可以并发进行；同一类型同时查询时保留先写入的结果
+        result = self.client.run(self.QUERY, {"name": fault_type})
+        with self._lock:
+            return self._cache.setdefault(fault_type, result)
+
+
+class AsyncDiagnosisPipeline:
+    def __init__(self, processes=None, io_threads=8, use_vectors=True, knowledge_graph=None,
+                 cache_dir=None, use_cache=False, top_k=3):
+        """
+        processes: 流程诊断进程数，默认CPU核数
+        io_threads: 读取日志与查询知识图谱的线程数
+        use_vectors: 是否进行向量诊断
+        knowledge_graph: FaultKnowledgeGraph，为None时不查询原因与解决方案
+        cache_dir/use_cache: 解析缓存配置，同 FaultDiagnosisSystem
+        top_k: 向量检索返回的相似故障数
+        """
+        self.cpu_executor = ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(cache_dir, use_cache))
+        self.io_executor = ThreadPoolExecutor(io_threads, thread_name_prefix="diagnosis-io")
+        # 模型只在这一个线程中使用，无需加锁
+        self.model_executor = ThreadPoolExecutor(1, thread_name_prefix="diagnosis-model")
+        self.use_vectors = use_vectors
+        self.knowledge_graph = knowledge_graph
+        self.top_k = top_k
+        self.detector = None
+
+        if use_vectors:
+            if TXT2VEC_DIR not in sys.path:
+                sys.path.append(TXT2VEC_DIR)
+            import text2vec_v1
+            text2vec_v1.Config.SHOW_ERROR_DIALOGS = False
+            # 模型在单线程执行器中加载与使用，故障库矩阵预先载入
+            self.detector = self.model_executor.submit(text2vec_v1.AnomalyDetector).result()
+            self.model_executor.submit(lambda: self.detector.vector_engine.model).result()
+            self.detector.fault_database.load_fault_matrix()
+
+    def close(self):
+        self.cpu_executor.shutdown()
+        self.io_executor.shutdown()
+        self.model_executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    async def _timed(self, timings, stage, executor, func, *args):
+        """在执行器中运行一个阶段并记录耗时（毫秒）"""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(executor, func, *args)
+        finally:
+            timings[stage] = round((time.perf_counter() - start) * 1000, 3)
+
+    def _read_text(self, file_path):
+        return self.detector.log_processor.clean_log_file(file_path, self.detector.vector_engine.text_token_limit())
+
+    def _match(self, text):
+        vector = self.detector.vector_engine.embed_text(text)
+        return self.detector.fault_database.search(vector, self.top_k) if vector is not None else []
+
+    async def _lookup(self, timings, stage, fault_type):
+        if self.knowledge_graph is None or not fault_type:
+            return None
+        return await self._timed(timings, stage, self.io_executor, self.knowledge_graph.lookup, fault_type)
+
+    async def _flow_branch(self, file_path, timings):
+        record = await self._timed(timings, "flow", self.cpu_executor, _diagnose_file, file_path)
+        if record["success"]:
+            knowledge = await self._lookup(timings, "flow_graph", record["diagnosis"].get("fault_type"))
+            if knowledge is not None:
+                record["knowledge"] = knowledge
+        return record
+
+    async def _vector_branch(self, file_path, timings):
+        text = await self._timed(timings, "read", self.io_executor, self._read_text, file_path)
+        if not text:
+            return {"success": False, "error": "日志文本清洗失败，可能不是9005日志格式"}
+        matches = await self._timed(timings, "vector", self.model_executor, self._match, text)
+        if not matches:
+            return {"success": False, "error": "向量化失败或故障库为空"}
+        result = {
+            "success": True,
+            "fault_type": matches[0][0],
+            "top_matches": [{"fault_type": label, "similarity": round(score, 4)} for label, score in matches],
+        }
+        knowledge = await self._lookup(timings, "vector_graph", result["fault_type"])
+        if knowledge is not None:
+            result["knowledge"] = knowledge
+        return result
+
+    async def diagnose(self, file_path):
+        """并发执行流程链路与向量链路，返回合并后的诊断结果与各阶段耗时"""
+        timings = {}
+        start = time.perf_counter()
+        branches = [self._flow_branch(file_path, timings)]
+        if self.use_vectors:
+            branches.append(self._vector_branch(file_path, timings))
+        results = await asyncio.gather(*branches)
+
+        result = {"file": file_path, "flow": results[0]}
+        if self.use_vectors:
+            result["vector"] = results[1]
+        result["latency_ms"] = dict(timings,
+                                    stages_sum=round(sum(timings.values()), 3),
+                                    total=round((time.perf_counter() - start) * 1000, 3))
+        return result
+
+    async def diagnose_many(self, file_paths, concurrency=8):
+        """并发诊断多个日志（同时最多 concurrency 个），按完成顺序产出结果"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(file_path):
+            async with semaphore:
+                return await self.diagnose(file_path)
+
+        for task in asyncio.as_completed([bounded(file_path) for file_path in file_paths]):
+            yield await task
+
+
+async def run(args, out):
+    knowledge_graph = None
+    if args.neo4j:
+        sys.path.append(os.path.join(os.path.dirname(TXT2VEC_DIR), "graphdatabase"))
+        from study import Neo4jClient
+        password = os.environ.get("NEO4J_PASSWORD")
+        if password is None:
+            password = getpass.getpass("Neo4j密码: ")
+        knowledge_graph = FaultKnowledgeGraph(Neo4jClient(args.neo4j, args.user, password))
+
+    files = collect_log_files(args.inputs)
+    print(f"共找到 {len(files)} 个日志文件", file=sys.stderr)
+    start = time.perf_counter()
+    with AsyncDiagnosisPipeline(args.processes, use_vectors=not args.no_vector,
+                                knowledge_graph=knowledge_graph) as pipeline:
+        async for result in pipeline.diagnose_many(files, args.concurrency):
+            out.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+    if knowledge_graph is not None:
+        knowledge_graph.client.close()
+    print(f"完成: {len(files)} 个文件，耗时 {time.perf_counter() - start:.2f}秒", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发诊断5G日志（流程诊断 + 向量诊断 + 知识图谱）")
+    parser.add_argument("inputs", nargs="+", help="日志目录或通配符")
+    parser.add_argument("-j", "--processes", type=int, default=None, help="流程诊断进程数，默认CPU核数")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="同时处理的日志数")
+    parser.add_argument("-o", "--output", help="结果文件（JSON Lines），默认输出到stdout")
+    parser.add_argument("--no-vector", action="store_true", help="只进行流程诊断，不加载向量模型")
+    parser.add_argument("--neo4j", help="Neo4j地址，例如 bolt://localhost:7687，指定时查询原因与解决方案")
+    parser.add_argument("--user", default="neo4j", help="Neo4j用户名")
+    args = parser.parse_args()
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        asyncio.run(run(args, out))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
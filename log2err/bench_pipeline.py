@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+统一流水线基准测试
+对比"流程诊断与文本清洗各读一遍文件"与"单次读取同时完成两者"的耗时、CPU时间与读取字节数，
+并校验两种方式的诊断结果与清洗文本一致。向量编码两种方式相同，不计入对比。
+读取字节数来自 /proc/self/io 的 rchar，其他平台不显示。
+用法: python bench_pipeline.py <日志文件或目录...> [--repeat 次数] [--max-tokens 单词数]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import contextlib
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from log2err_v1 import collect_log_files
+from unified_pipeline import UnifiedDiagnosisPipeline
+
+
+def read_bytes():
+    """当前进程累计读取的字节数，不支持时返回None"""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def run_separate(pipeline, files, max_tokens):
+    """原方式：流程诊断与文本清洗分别读取文件"""
+    results = []
+    for file_path in files:
+        system = pipeline.system
+        system.analyzer.reset()
+        flow_result = system.analyze_log_file(file_path)
+        text = pipeline.log_processor.clean_log_file(file_path, max_tokens)
+        results.append((flow_result.get("diagnosis"), text))
+    return results
+
+
+def run_unified(pipeline, files, max_tokens):
+    """统一流水线：单次读取"""
+    results = []
+    for file_path in files:
+        flow_result, text = pipeline.read_once(file_path, max_tokens)
+        results.append((flow_result.get("diagnosis"), text))
+    return results
+
+
+def measure(pipeline, files, max_tokens, repeat):
+    """两种方式交替运行，避免机器负载波动偏向其中一方
+    返回 {方式: (结果, 最短耗时, 对应的CPU时间, 每轮读取字节数)}
+    """
+    best = {}
+    for _ in range(repeat):
+        for name, func in (("分别读取", run_separate), ("单次读取", run_unified)):
+            bytes_before = read_bytes()
+            cpu_start, start = time.process_time(), time.perf_counter()
+            # 解析告警不计入耗时
+            with contextlib.redirect_stdout(open(os.devnull, 'w')):
+                results = func(pipeline, files, max_tokens)
+            elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+            io_bytes = read_bytes() - bytes_before if bytes_before is not None else None
+            if name not in best or elapsed < best[name][1]:
+                best[name] = (results, elapsed, cpu, io_bytes)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比分别读取与单次读取的诊断耗时")
+    parser.add_argument("inputs", nargs="+", help="日志文件、目录或通配符")
+    parser.add_argument("--repeat", type=int, default=7, help="重复次数，取最短耗时")
+    parser.add_argument("--max-tokens", type=int, default=None,
+                        help="文本清洗保留的单词数（整体编码时为max_seq_length），默认保留全文（分块编码）")
+    args = parser.parse_args()
+
+    # 清洗失败等日志不影响测量
+    logging.disable(logging.CRITICAL)
+    files = collect_log_files(args.inputs)
+    total_size = sum(os.path.getsize(path) for path in files)
+    pipeline = UnifiedDiagnosisPipeline(use_vectors=False)
+    print(f"{len(files)} 个文件，共 {total_size / 1e6:.1f} MB，"
+          f"单词上限 {args.max_tokens or '不限'}，每项重复 {args.repeat} 次取最短")
+
+    best = measure(pipeline, files, args.max_tokens, args.repeat)
+    separate, unified = best["分别读取"], best["单次读取"]
+    if separate[0] != unified[0]:
+        print("警告: 两种方式的结果不一致")
+
+    print("-" * 64)
+    print(f"{'方式':<12}{'耗时':>12}{'CPU时间':>12}{'读取字节':>16}")
+    for name, (_, elapsed, cpu, io_bytes) in best.items():
+        io_text = f"{io_bytes / 1e6:.1f} MB" if io_bytes is not None else "-"
+        print(f"{name:<12}{elapsed * 1000:>10.1f}ms{cpu * 1000:>10.1f}ms{io_text:>16}")
+    print("-" * 64)
+    print(f"耗时减少 {(1 - unified[1] / separate[1]) * 100:.1f}%，CPU时间减少 {(1 - unified[2] / separate[2]) * 100:.1f}%")
+
+if __name__ == "__main__":
+    main()
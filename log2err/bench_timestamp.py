@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+时间戳解析基准测试
+生成合成的9005日志（默认1000万行），对比逐行 datetime.strptime 与 TimestampDecoder 的解析速度（行/秒）
+用法: python bench_timestamp.py [行数] [日志文件路径]
+"""
+import os
+import sys
+import time
+import tempfile
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from timestamp_decoder import TimestampDecoder
+
+
+def write_synthetic_log(file_path, line_count):
+    """生成合成日志：每行一个递增的时间戳，字段布局与9005日志一致"""
+    messages = [("U", "nrrrc", "rrcSetupRequest"), ("D", "nrrrc", "rrcSetup"),
+                ("U", "nas", "Registration request"), ("D", "nas", "Registration accept")]
+    ms = 9 * 3600 * 1000
+    with open(file_path, 'w', encoding='utf-8') as f:
+        for seq in range(1, line_count + 1):
+            ms += 7
+            day_ms = ms % (86400 * 1000)
+            ts = (f"{day_ms // 3600000:02d}:{day_ms // 60000 % 60:02d}:"
+                  f"{day_ms // 1000 % 60:02d}.{day_ms % 1000:03d}, 2025-04-{7 + ms // 86400000:02d}")
+            direction, protocol, msg = messages[seq % len(messages)]
+            f.write(f"{seq}\t0\t{ts}\t{ts}\t-\t{direction}\t{protocol}\t-\t{msg}\n")
+
+
+def bench(file_path, decode):
+    """读取日志并解析每行的时间戳字段，返回(行数, 耗时)"""
+    count = 0
+    start = time.perf_counter()
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.strip().split('\t')
+            decode(parts[2])
+            count += 1
+    return count, time.perf_counter() - start
+
+
+def strptime_decode(field):
+    """原有实现：逐行 datetime.strptime"""
+    return datetime.strptime(field.replace(',', '').strip(), "%H:%M:%S.%f %Y-%m-%d")
+
+
+def main():
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000000
+    file_path = sys.argv[2] if len(sys.argv) > 2 else None
+    remove = file_path is None
+    if file_path is None:
+        fd, file_path = tempfile.mkstemp(suffix='.txt')
+        os.close(fd)
+
+    try:
+        print(f"生成合成日志: {file_path} ({line_count} 行)")
+        write_synthetic_log(file_path, line_count)
+
+        decoder = TimestampDecoder()
+        cases = [
+            ("datetime.strptime", strptime_decode),
+            ("TimestampDecoder.decode", decoder.decode),
+            ("TimestampDecoder.decode_us", decoder.decode_us),
+        ]
+        baseline = None
+        print("-" * 60)
+        for name, decode in cases:
+            count, elapsed = bench(file_path, decode)
+            rate = count / elapsed
+            baseline = baseline or rate
+            print(f"{name:<30} {rate:>12,.0f} 行/秒  ({elapsed:.2f}秒, x{rate / baseline:.2f})")
+        print("-" * 60)
+    finally:
+        if remove:
+            os.remove(file_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""
+常驻诊断服务
+启动时加载一次向量模型、故障库矩阵和各工作线程的流程分析器，之后通过本地HTTP接口接收诊断请求，
+同时返回流程诊断（log2err）与向量检索诊断（txt2vec）的结果。
+请求先进入有界队列，由固定数量的工作线程处理，队列满时立即返回503。
+
+接口:
+    POST /diagnose   请求体为JSON {"path": "日志路径"}，或直接上传日志文本
+    GET  /stats      各阶段延迟直方图、队列长度与请求计数
+    GET  /health     健康检查
+用法: python diagnosis_service.py [--host 127.0.0.1] [--port 8765] [-j 工作线程数] [--queue-size 队列长度] [--no-vector] [--budgets]
+"""
+import os
+import sys
+import json
+import time
+import queue
+import bisect
+import argparse
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from log2err_v1 import FaultDiagnosisSystem
+from logany import DEFAULT_LATENCY_BUDGETS
+
+TXT2VEC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "txt2vec")
+
+
+class LatencyHistogram:
+    """按对数间隔分桶的延迟直方图（毫秒），线程安全"""
+
+    BOUNDS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.BOUNDS_MS, elapsed_ms)] += 1
+            self.count += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def percentile(self, q):
+        """按桶上界估计分位数（不超过实际最大值）"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for idx, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return round(min(self.BOUNDS_MS[idx], self.max_ms) if idx < len(self.BOUNDS_MS) else self.max_ms, 3)
+        return round(self.max_ms, 3)
+
+    def snapshot(self):
+        with self._lock:
+            buckets = {f"<={bound}": count for bound, count in zip(self.BOUNDS_MS, self.counts)}
+            buckets[f">{self.BOUNDS_MS[-1]}"] = self.counts[-1]
+            return {
+                "count": self.count,
+                "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+                "p50_ms": self.percentile(0.5),
+                "p90_ms": self.percentile(0.9),
+                "p99_ms": self.percentile(0.99),
+                "max_ms": round(self.max_ms, 3),
+                "buckets": buckets,
+            }
+
+
+class DiagnosisService:
+    STAGES = ("queue", "flow", "vector", "total")
+
+    def __init__(self, workers=2, queue_size=64, use_vectors=True, cache_dir=None, use_cache=False, top_k=3,
+                 latency_budgets=None):
+        """
+        workers: 工作线程数，每个线程持有独立的流程分析器
+        queue_size: 等待处理的请求上限，超过时拒绝新请求
+        use_vectors: 是否同时进行向量检索诊断
+        cache_dir/use_cache: 解析缓存配置，同 FaultDiagnosisSystem
+        top_k: 向量检索返回的相似故障数
+        latency_budgets: 时延预算，同 FaultDiagnosisSystem，默认不启用
+        """
+        self.workers = workers
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.use_vectors = use_vectors
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+        self.top_k = top_k
+        self.latency_budgets = latency_budgets
+        self.histograms = {stage: LatencyHistogram() for stage in self.STAGES}
+        self.counters = {"accepted": 0, "rejected": 0, "failed": 0}
+        self._counter_lock = threading.Lock()
+        # 向量模型、向量缓存（sqlite连接只能在创建它的线程中使用）与故障库只在这一个线程中创建和使用，
+        # 工作线程把编码与检索提交给它，同一时间只有一个请求进入模型
+        self.model_executor = None
+        # 清洗文本时保留的单词数，模型加载后在模型线程中读取一次
+        self.token_limit = None
+        # 向量模型加载失败时的错误信息：服务照常提供流程诊断，向量诊断返回该错误
+        self.vector_error = None
+        self._threads = []
+
+    def start(self):
+        """预热向量模型与故障库，启动工作线程"""
+        if self.use_vectors:
+            if TXT2VEC_DIR not in sys.path:
+                sys.path.append(TXT2VEC_DIR)
+            import text2vec_v1
+            text2vec_v1.Config.SHOW_ERROR_DIALOGS = False
+            self.log_processor = text2vec_v1.LogProcessor()
+            self.model_executor = ThreadPoolExecutor(1, thread_name_prefix="diagnosis-model")
+            self.model_executor.submit(self._load_vector_models, text2vec_v1).result()
+
+        for idx in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"diagnosis-worker-{idx}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _load_vector_models(self, text2vec_v1):
+        """在模型线程中加载向量模型与故障库"""
+        self.vector_engine = text2vec_v1.VectorEngine()
+        self.fault_database = text2vec_v1.FaultDatabase()
+        try:
+            _ = self.vector_engine.model
+            self.token_limit = self.vector_engine.text_token_limit()
+        except RuntimeError as e:
+            self.vector_error = str(e)
+            print(f"{e}，向量诊断不可用，只进行流程诊断", file=sys.stderr)
+            return
+        self.fault_database.load_fault_matrix()
+        self.fault_database.get_ann_index()
+
+    def stop(self):
+        for _ in self._threads:
+            self.jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self.model_executor is not None:
+            self.model_executor.shutdown()
+            self.model_executor = None
+
+    def submit(self, file_path, remove_after=False):
+        """提交诊断请求，返回 Future；队列已满时抛出 queue.Full"""
+        future = Future()
+        try:
+            self.jobs.put_nowait((file_path, remove_after, time.perf_counter(), future))
+        except queue.Full:
+            self._count("rejected")
+            raise
+        self._count("accepted")
+        return future
+
+    def _count(self, name):
+        with self._counter_lock:
+            self.counters[name] += 1
+
+    def _worker(self):
+        # 每个线程一个诊断系统：流程定义与故障映射只加载一次，分析器在文件之间复用
+        system = FaultDiagnosisSystem(self.cache_dir, self.use_cache, self.latency_budgets)
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            file_path, remove_after, enqueued, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self.diagnose(system, file_path, enqueued))
+            except Exception as e:
+                self._count("failed")
+                future.set_exception(e)
+            finally:
+                if remove_after:
+                    os.remove(file_path)
+
+    def diagnose(self, system, file_path, enqueued=None):
+        """对单个文件进行流程诊断与向量诊断，返回结果与各阶段耗时"""
+        start = time.perf_counter()
+        latency = {"queue": (start - enqueued) * 1000 if enqueued else 0.0}
+
+        system.analyzer.reset()
+        flow_result = system.analyze_log_file(file_path)
+        flow_done = time.perf_counter()
+        latency["flow"] = (flow_done - start) * 1000
+
+        result = {"file": file_path, "flow": flow_result}
+        if self.use_vectors:
+            result["vector"] = self.vector_diagnose(file_path)
+            latency["vector"] = (time.perf_counter() - flow_done) * 1000
+        latency["total"] = latency["queue"] + (time.perf_counter() - start) * 1000
+
+        for stage, elapsed_ms in latency.items():
+            self.histograms[stage].record(elapsed_ms)
+        result["latency_ms"] = {stage: round(elapsed_ms, 3) for stage, elapsed_ms in latency.items()}
+        return result
+
+    def vector_diagnose(self, file_path):
+        """清洗日志文本并在故障库中检索最相似的故障类型"""
+        if self.vector_error:
+            return {"success": False, "error": self.vector_error}
+        text = self.log_processor.clean_log_file(file_path, self.token_limit)
+        if not text:
+            return {"success": False, "error": "日志文本清洗失败，可能不是9005日志格式"}
+        matches = self.model_executor.submit(self._match, text).result()
+        if not matches:
+            return {"success": False, "error": "向量化失败或故障库为空"}
+        return {
+            "success": True,
+            "fault_type": matches[0][0],
+            "top_matches": [{"fault_type": label, "similarity": round(score, 4)} for label, score in matches],
+        }
+
+    def _match(self, text):
+        """在模型线程中向量化文本并检索故障库"""
+        vector = self.vector_engine.embed_text(text)
+        return self.fault_database.search(vector, self.top_k) if vector is not None else []
+
+    def stats(self):
+        with self._counter_lock:
+            counters = dict(self.counters)
+        return {
+            "queue_depth": self.jobs.qsize(),
+            "queue_size": self.jobs.maxsize,
+            "workers": self.workers,
+            "requests": counters,
+            "latency": {stage: histogram.snapshot() for stage, histogram in self.histograms.items()},
+        }
+
+
+class DiagnosisRequestHandler(BaseHTTPRequestHandler):
+    # 单个请求等待诊断结果的最长时间（秒）
+    request_timeout = 300
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self._send_json(200, self.server.service.stats())
+        else:
+            self._send_json(404, {"error": f"未知路径: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/diagnose":
+            self._send_json(404, {"error": f"未知路径: {self.path}"})
+            return
+
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            try:
+                file_path = json.loads(body.decode('utf-8'))["path"]
+            except (ValueError, KeyError, TypeError):
+                self._send_json(400, {"error": "请求体应为 {\"path\": \"日志路径\"}"})
+                return
+            if not os.path.isfile(file_path):
+                self._send_json(404, {"error": f"文件不存在: {file_path}"})
+                return
+            remove_after = False
+        else:
+            # 上传的日志写入临时文件，诊断完成后删除
+            fd, file_path = tempfile.mkstemp(suffix=".txt", prefix="diagnosis_")
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+            remove_after = True
+
+        try:
+            future = self.server.service.submit(file_path, remove_after)
+        except queue.Full:
+            if remove_after:
+                os.remove(file_path)
+            self._send_json(503, {"error": "诊断队列已满，请稍后重试"})
+            return
+
+        try:
+            self._send_json(200, future.result(timeout=self.request_timeout))
+        except FutureTimeoutError:
+            self._send_json(504, {"error": "诊断超时"})
+        except Exception as e:
+            self._send_json(500, {"error": f"诊断失败: {e}"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻5G日志诊断服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址，默认只接受本机请求")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("-j", "--workers", type=int, default=2, help="工作线程数")
+    parser.add_argument("--queue-size", type=int, default=64, help="等待队列长度，超过时返回503")
+    parser.add_argument("--no-vector", action="store_true", help="只进行流程诊断，不加载向量模型")
+    parser.add_argument("--cache", action="store_true", help="启用解析缓存")
+    parser.add_argument("--cache-dir", help="解析缓存目录，指定时自动启用缓存")
+    parser.add_argument("--budgets", action="store_true", help="按3GPP协议定时器的时延预算诊断超时")
+    args = parser.parse_args()
+
+    service = DiagnosisService(args.workers, args.queue_size, not args.no_vector, args.cache_dir, args.cache,
+                               latency_budgets=DEFAULT_LATENCY_BUDGETS if args.budgets else None)
+    print("正在预热模型与故障库..." if service.use_vectors else "正在启动...", file=sys.stderr)
+    service.start()
+
+    server = ThreadingHTTPServer((args.host, args.port), DiagnosisRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    print(f"诊断服务已启动: http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@
 """
 
 # 故障映射规则字典
+# 启用时延预算时：timeout: 流程完成但步骤或整体时延超出预算；pending: 日志结束时流程进行中且尚未超出预算
 FAULT_MAPPING = {
     # 完全未启动的情况
     "Registration Request": {
@@ -17,14 +18,18 @@ FAULT_MAPPING = {
     "RRC Connection Setup": {
         "not_started": "卡MSG1 - RRC连接建立未启动",
         "in_progress": "卡MSG1 - RRC连接建立过程中断",
-        "problematic": "RRC连接异常 - 连接建立流程异常"
+        "problematic": "RRC连接异常 - 连接建立流程异常",
+        "timeout": "RRC连接建立超时 - rrcSetup超过T300时延预算",
+        "pending": "待定 - 日志结束时RRC连接建立仍在时延预算内"
     },
     
     # NAS鉴权问题
     "NAS Authentication": {
         "not_started": "卡MSG2 - NAS鉴权未启动", 
         "in_progress": "卡MSG2 - NAS鉴权过程中断",
-        "problematic": "鉴权失败 - NAS鉴权流程异常"
+        "problematic": "鉴权失败 - NAS鉴权流程异常",
+        "timeout": "NAS鉴权超时 - 鉴权响应超过T3560时延预算",
+        "pending": "待定 - 日志结束时NAS鉴权仍在时延预算内"
     },
     
     # RRC鉴权问题
@@ -38,7 +43,9 @@ FAULT_MAPPING = {
     "NAS SMC": {
         "not_started": "卡MSG4 - NAS安全模式配置未启动",
         "in_progress": "卡MSG4 - NAS安全模式配置中断",
-        "problematic": "安全配置失败 - NAS安全模式异常"
+        "problematic": "安全配置失败 - NAS安全模式异常",
+        "timeout": "NAS安全模式超时 - 安全模式完成超过T3560时延预算",
+        "pending": "待定 - 日志结束时NAS安全模式配置仍在时延预算内"
     },
     
     # UE能力上报问题
@@ -66,14 +73,18 @@ FAULT_MAPPING = {
     "Registration response": {
         "not_started": "注册失败 - 网络未响应注册请求",
         "in_progress": "注册超时 - 注册响应流程不完整",
-        "problematic": "注册异常 - 注册响应流程异常"
+        "problematic": "注册异常 - 注册响应流程异常",
+        "timeout": "注册完成超时 - 注册完成超过T3550时延预算",
+        "pending": "待定 - 日志结束时注册响应仍在时延预算内"
     },
     
     # PDU会话问题
     "PDU session": {
         "not_started": "连接失败 - PDU会话建立未启动",
         "in_progress": "连接超时 - PDU会话建立中断", 
-        "problematic": "数据连接失败 - PDU会话建立异常"
+        "problematic": "数据连接失败 - PDU会话建立异常",
+        "timeout": "PDU会话建立超时 - 会话建立超过T3580时延预算",
+        "pending": "待定 - 日志结束时PDU会话建立仍在时延预算内"
     },
     
     # SIP注册问题
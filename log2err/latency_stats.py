@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+流程时延统计
+对大量日志的分析结果汇总时延KPI：每个流程的耗时（第一步到完成，同 test_v1.0.py 的 duration）、
+流程内相邻步骤的时延，以及跨流程的区间（例如 Registration request 到 Registration accept）。
+每个指标使用 HDR 直方图风格的对数-线性分桶，相对误差小于 1%，内存与样本数无关，
+不同进程或不同批次的统计可以直接按桶相加合并，并导出为 JSON 或 CSV。
+用法: python latency_stats.py merge <统计JSON...> [-o 输出文件(.json/.csv)]
+"""
+import os
+import sys
+import csv
+import json
+import math
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# 跨流程区间: 名称 -> ((起点流程, 起点步骤序号), (终点流程, 终点步骤序号))
+DEFAULT_SPANS = {
+    "Registration request -> Registration accept": (("Registration Request", 0), ("Registration response", 0)),
+    "Registration request -> Registration complete": (("Registration Request", 0), ("Registration response", 1)),
+    "Registration request -> PDU session establishment accept": (("Registration Request", 0), ("PDU session", 5)),
+}
+
+
+class LatencySketch:
+    """对数-线性分桶的时延直方图（整数微秒）
+    小于 2^(SUB_BUCKET_BITS+1) 的值精确记录，更大的值保留最高 SUB_BUCKET_BITS+1 位，
+    桶序号只由数值决定，因此任意两个直方图可以逐桶相加合并
+    """
+
+    SUB_BUCKET_BITS = 7
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def bucket_index(cls, value):
+        shift = max(0, value.bit_length() - cls.SUB_BUCKET_BITS - 1)
+        return (shift << cls.SUB_BUCKET_BITS) + (value >> shift)
+
+    @classmethod
+    def bucket_range(cls, index):
+        """桶序号对应的取值范围 [下界, 上界)"""
+        shift = max(0, (index >> cls.SUB_BUCKET_BITS) - 1)
+        lower = (index - (shift << cls.SUB_BUCKET_BITS)) << shift
+        return lower, lower + (1 << shift)
+
+    def record(self, value_us, count=1):
+        """记录时延样本；日志乱序造成的负值按0记录"""
+        value_us = max(0, int(value_us))
+        index = self.bucket_index(value_us)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+        self.total += value_us * count
+        self.min = value_us if self.min is None else min(self.min, value_us)
+        self.max = value_us if self.max is None else max(self.max, value_us)
+
+    def merge(self, other):
+        """把另一个直方图合并进来，返回自身"""
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def percentile(self, q):
+        """分位数估计（微秒），取所在桶的中点并限制在实际最小/最大值之间"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                lower, upper = self.bucket_range(index)
+                return min(max((lower + upper - 1) / 2, self.min), self.max)
+        return self.max
+
+    def summary(self, quantiles=(0.5, 0.95, 0.99)):
+        """统计摘要（毫秒）"""
+        row = {"count": self.count}
+        if not self.count:
+            return row
+        row["min_ms"] = self.min / 1000
+        row["mean_ms"] = round(self.total / self.count / 1000, 3)
+        for q in quantiles:
+            row[f"p{round(q * 100):g}_ms"] = round(self.percentile(q) / 1000, 3)
+        row["max_ms"] = self.max / 1000
+        return row
+
+    def to_dict(self):
+        return {"buckets": {str(index): count for index, count in self.buckets.items()},
+                "count": self.count, "total": self.total, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls()
+        sketch.buckets = {int(index): count for index, count in data["buckets"].items()}
+        sketch.count = data["count"]
+        sketch.total = data["total"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        return sketch
+
+
+class FlowLatencyStats:
+    """按指标名称汇总多个日志的时延直方图
+    指标名称: "flow/<流程>" 流程耗时，"step/<流程>/<步骤>" 与上一步骤的时延，"span/<区间>" 跨流程区间
+    """
+
+    def __init__(self, spans=None):
+        self.spans = DEFAULT_SPANS if spans is None else spans
+        self.metrics = {}
+        self.captures = 0
+
+    def record(self, metric, value_us):
+        sketch = self.metrics.get(metric)
+        if sketch is None:
+            sketch = self.metrics[metric] = LatencySketch()
+        sketch.record(value_us)
+
+    def add_analysis(self, analyzer):
+        """加入一次 ProtocolAnalyzer 分析的结果（分析结束后调用），返回自身"""
+        self.captures += 1
+        for (flow_name, step_idx), samples in analyzer.step_latencies.items():
+            metric = f"step/{flow_name}/{analyzer.flow_definitions[flow_name]['steps'][step_idx]['msg']}"
+            for value in samples:
+                self.record(metric, value)
+
+        step_times = {}
+        for flow_name, status in analyzer.flow_status.items():
+            found_steps = status["found_steps"]
+            for step_idx, found in enumerate(found_steps):
+                step_times[(flow_name, step_idx)] = analyzer.timestamp_us(found["timestamp"])
+            if status["completed"]:
+                self.record(f"flow/{flow_name}",
+                            step_times[(flow_name, len(found_steps) - 1)] - step_times[(flow_name, 0)])
+
+        for span_name, (start, end) in self.spans.items():
+            if start in step_times and end in step_times:
+                self.record(f"span/{span_name}", step_times[end] - step_times[start])
+        return self
+
+    def merge(self, other):
+        """合并另一个统计（例如其他工作进程的结果），返回自身"""
+        self.captures += other.captures
+        for metric, sketch in other.metrics.items():
+            if metric in self.metrics:
+                self.metrics[metric].merge(sketch)
+            else:
+                self.metrics[metric] = LatencySketch().merge(sketch)
+        return self
+
+    def to_dict(self):
+        return {"captures": self.captures,
+                "metrics": {metric: sketch.to_dict() for metric, sketch in self.metrics.items()}}
+
+    @classmethod
+    def from_dict(cls, data, spans=None):
+        stats = cls(spans)
+        stats.captures = data["captures"]
+        stats.metrics = {metric: LatencySketch.from_dict(sketch) for metric, sketch in data["metrics"].items()}
+        return stats
+
+    def summary_rows(self, quantiles=(0.5, 0.95, 0.99)):
+        """每个指标一行统计摘要，按指标名称排序"""
+        return [dict({"metric": metric}, **self.metrics[metric].summary(quantiles)) for metric in sorted(self.metrics)]
+
+    def dump_json(self, path):
+        """导出摘要与完整直方图，完整直方图可用 load_json 读回继续合并"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"summary": self.summary_rows(), **self.to_dict()}, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load_json(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def dump_csv(self, path, quantiles=(0.5, 0.95, 0.99)):
+        """导出摘要表格"""
+        rows = self.summary_rows(quantiles)
+        fields = ["metric", "count", "min_ms", "mean_ms"] + [f"p{round(q * 100):g}_ms" for q in quantiles] + ["max_ms"]
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def dump(self, path):
+        """按扩展名导出为 CSV 或 JSON"""
+        if path.lower().endswith(".csv"):
+            self.dump_csv(path)
+        else:
+            self.dump_json(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合并与导出流程时延统计")
+    sub = parser.add_subparsers(dest="command", required=True)
+    merge_parser = sub.add_parser("merge", help="合并多个统计JSON（log2err_v1.py --batch --latency-stats 的输出）")
+    merge_parser.add_argument("inputs", nargs="+", help="统计JSON文件")
+    merge_parser.add_argument("-o", "--output", help="输出文件，扩展名为.csv时导出表格，否则导出JSON")
+    args = parser.parse_args()
+
+    stats = FlowLatencyStats()
+    for path in args.inputs:
+        stats.merge(FlowLatencyStats.load_json(path))
+    if args.output:
+        stats.dump(args.output)
+        print(f"已合并 {len(args.inputs)} 个统计（{stats.captures} 个日志），输出到 {args.output}")
+    else:
+        for row in stats.summary_rows():
+            print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
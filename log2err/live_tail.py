@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+实时跟踪模式
+跟踪仍在写入的9005日志文件，只读取新追加的字节，逐条推进流程状态机，并在状态变化时输出事件：
+    flow_started    流程匹配到第一个步骤
+    flow_progress   流程匹配到后续步骤
+    flow_completed  流程全部步骤完成
+    flow_stalled    流程进行中或前置条件已满足但未开始，超过超时时间没有进展（附带故障描述，如"卡MSG3"）
+    flow_timeout    按日志时间，流程的步骤或整体超出时延预算（--budgets 启用）
+    log_reset       日志文件被截断或替换，从头重新分析
+用法: python live_tail.py <日志文件> [--timeout 超时秒数] [--interval 轮询间隔秒数] [--json] [--exit-on-complete] [--budgets]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from logany import ProtocolAnalyzer, DEFAULT_LATENCY_BUDGETS
+from fault_mapping import get_fault_mapping
+from timestamp_decoder import TimestampDecoder
+
+
+class LogTailer:
+    """增量读取不断增长的日志文件，只返回完整的行"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.offset = 0
+        self.line_num = 0
+        self._partial = b""
+
+    def read_new_lines(self):
+        """
+        读取上次位置之后追加的内容
+        返回 ([(行号, 行), ...], 是否发生了截断/替换)；最后一行没有换行符时暂存，等写完整后再返回
+        """
+        try:
+            size = os.path.getsize(self.file_path)
+        except OSError:
+            return [], False
+
+        reset = size < self.offset
+        if reset:
+            self.offset = 0
+            self.line_num = 0
+            self._partial = b""
+        if size == self.offset:
+            return [], reset
+
+        with open(self.file_path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        self.offset += len(data)
+
+        chunks = (self._partial + data).split(b"\n")
+        self._partial = chunks.pop()
+        lines = [(self.line_num + idx, chunk.decode('utf-8', errors='replace'))
+                 for idx, chunk in enumerate(chunks, 1)]
+        self.line_num += len(lines)
+        return lines, reset
+
+
+class LiveFlowTracker:
+    """在 ProtocolAnalyzer 之上逐条输入日志并对比前后状态，产出状态变化事件"""
+
+    def __init__(self, analyzer: ProtocolAnalyzer = None, stall_timeout: float = 5.0, clock=time.monotonic):
+        """
+        analyzer: 提供流程定义的分析器，默认新建
+        stall_timeout: 流程没有进展多少秒后视为卡住
+        clock: 计时函数（秒），默认使用单调时钟
+        """
+        self.analyzer = analyzer or ProtocolAnalyzer()
+        self.stall_timeout = stall_timeout
+        self.clock = clock
+        self.fault_mapping = get_fault_mapping()
+        self.decoder = TimestampDecoder()
+        self.start()
+
+    def start(self):
+        """清空状态，重新开始跟踪"""
+        self.analyzer.reset()
+        self.analyzer.start_analysis()
+        now = self.clock()
+        # 每个流程最近一次进展（开始等待或匹配到步骤）的时间，只包含前置条件已满足且未完成的流程
+        self.last_progress = {}
+        self.stalled = set()
+        self._mark_ready(self.analyzer.ready_mask, now)
+
+    def _mark_ready(self, ready_mask, now):
+        for flow_idx, flow_name in enumerate(self.analyzer.flow_names):
+            if ready_mask >> flow_idx & 1 and flow_name not in self.last_progress \
+                    and not self.analyzer.flow_status[flow_name]["completed"]:
+                self.last_progress[flow_name] = now
+
+    def _event(self, event, flow_name, log_entry=None, **fields):
+        analyzer = self.analyzer
+        found = len(analyzer.flow_status[flow_name]["found_steps"])
+        total = len(analyzer.flow_definitions[flow_name]["steps"])
+        record = {"event": event, "flow": flow_name, "progress": f"{found}/{total}"}
+        if log_entry is not None:
+            record["seq"] = log_entry["seq"]
+            record["log_time"] = analyzer.format_time(log_entry["timestamp"])
+        record.update(fields)
+        return record
+
+    def feed_line(self, line, line_num):
+        """解析一行日志并推进状态机，返回产生的事件列表"""
+        log_entry = self.analyzer.parse_line(line, line_num, self.decoder.decode)
+        return self.feed(log_entry) if log_entry is not None else []
+
+    def feed(self, log_entry):
+        """输入一条日志，返回产生的事件列表"""
+        analyzer = self.analyzer
+        candidates = analyzer.dispatch_index.get((log_entry["protocol"].lower(), log_entry["direction"].lower()))
+        timeouts_before = len(analyzer.timeout_records)
+        if not candidates:
+            # 不匹配任何流程的日志也推进日志时间，可能使超时定时器到期
+            analyzer.feed(log_entry)
+            return self._timeout_events(timeouts_before, log_entry)
+
+        # 只有该(协议, 方向)下的候选流程可能发生变化，记录输入前的进度用于对比
+        before = {flow_name: len(analyzer.flow_status[flow_name]["found_steps"])
+                  for _, flow_name, _, _ in candidates}
+        ready_before = analyzer.ready_mask
+        analyzer.feed(log_entry)
+
+        events = []
+        now = self.clock()
+        for flow_name, count in before.items():
+            status = analyzer.flow_status[flow_name]
+            found_steps = status["found_steps"]
+            if len(found_steps) == count:
+                continue
+            step = found_steps[-1]["step"]["msg"]
+            self.stalled.discard(flow_name)
+            if status["completed"]:
+                self.last_progress.pop(flow_name, None)
+                events.append(self._event("flow_completed", flow_name, log_entry, step=step))
+                continue
+            self.last_progress[flow_name] = now
+            event = "flow_started" if count == 0 else "flow_progress"
+            events.append(self._event(event, flow_name, log_entry, step=step))
+
+        if analyzer.ready_mask != ready_before:
+            self._mark_ready(analyzer.ready_mask & ~ready_before, now)
+        return self._timeout_events(timeouts_before, log_entry) + events
+
+    def _timeout_events(self, timeouts_before, log_entry):
+        """输入一条日志后新增的超时记录转为事件"""
+        records = list(self.analyzer.timeout_records.values())[timeouts_before:]
+        return [self._event("flow_timeout", record["flow_name"], log_entry,
+                            scope=record["scope"], step=record["step"], budget_ms=record["budget_ms"],
+                            deadline=self.analyzer.format_time(record["deadline"]))
+                for record in records]
+
+    def check_stalls(self):
+        """检查超时没有进展的流程，每次卡住只报告一次，有新进展后重新计时"""
+        events = []
+        now = self.clock()
+        for flow_name, last in self.last_progress.items():
+            if flow_name in self.stalled or now - last < self.stall_timeout:
+                continue
+            self.stalled.add(flow_name)
+            found_steps = self.analyzer.flow_status[flow_name]["found_steps"]
+            status = "in_progress" if found_steps else "not_started"
+            steps = self.analyzer.flow_definitions[flow_name]["steps"]
+            fields = {
+                "status": status,
+                "waiting_for": steps[len(found_steps)]["msg"],
+                "idle_seconds": round(now - last, 3),
+            }
+            description = self.fault_mapping.get(flow_name, {}).get(status)
+            if description:
+                fields["fault_description"] = description
+            if found_steps:
+                fields["last_step_time"] = self.analyzer.format_time(found_steps[-1]["timestamp"])
+            events.append(self._event("flow_stalled", flow_name, **fields))
+        return events
+
+    def all_completed(self):
+        return len(self.analyzer.completed_flows) == len(self.analyzer.flow_definitions)
+
+
+def follow(file_path, stall_timeout=5.0, interval=0.2, exit_on_complete=False, latency_budgets=None):
+    """跟踪日志文件，持续产出事件；exit_on_complete为True时所有流程完成后结束
+    latency_budgets为时延预算（见 logany.DEFAULT_LATENCY_BUDGETS），指定时产出 flow_timeout 事件
+    """
+    tailer = LogTailer(file_path)
+    tracker = LiveFlowTracker(ProtocolAnalyzer(latency_budgets), stall_timeout=stall_timeout)
+    while True:
+        lines, reset = tailer.read_new_lines()
+        if reset:
+            tracker.start()
+            yield {"event": "log_reset", "file": file_path}
+        for line_num, line in lines:
+            for event in tracker.feed_line(line, line_num):
+                yield event
+        for event in tracker.check_stalls():
+            yield event
+        if exit_on_complete and tracker.all_completed():
+            return
+        if not lines:
+            time.sleep(interval)
+
+
+def format_event(event):
+    """事件转为单行可读文本"""
+    kind = event["event"]
+    if kind == "log_reset":
+        return f"[重置] 日志文件被截断或替换，重新分析: {event['file']}"
+    head = f"[{event.get('log_time', time.strftime('%H:%M:%S'))}] {event['flow']} ({event['progress']})"
+    if kind == "flow_started":
+        return f"{head} 开始: {event['step']}"
+    if kind == "flow_progress":
+        return f"{head} 进展: {event['step']}"
+    if kind == "flow_completed":
+        return f"{head} 完成"
+    if kind == "flow_timeout":
+        target = f"等待 {event['step']}" if event["scope"] == "step" else "流程整体"
+        return f"{head} 超时: {target} 超过预算 {event['budget_ms']:.0f}ms（截止 {event['deadline']}）"
+    description = event.get("fault_description", "")
+    return f"{head} 卡住 {event['idle_seconds']:.1f}秒，等待 {event['waiting_for']} {description}".rstrip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="实时跟踪5G日志的流程状态")
+    parser.add_argument("file", help="正在写入的日志文件")
+    parser.add_argument("--timeout", type=float, default=5.0, help="流程没有进展多少秒后报告卡住")
+    parser.add_argument("--interval", type=float, default=0.2, help="没有新内容时的轮询间隔（秒）")
+    parser.add_argument("--json", action="store_true", help="以JSON Lines格式输出事件")
+    parser.add_argument("--exit-on-complete", action="store_true", help="所有流程完成后退出")
+    parser.add_argument("--budgets", action="store_true", help="按3GPP协议定时器的时延预算报告超时")
+    args = parser.parse_args()
+
+    budgets = DEFAULT_LATENCY_BUDGETS if args.budgets else None
+    try:
+        for event in follow(args.file, args.timeout, args.interval, args.exit_on_complete, budgets):
+            print(json.dumps(event, ensure_ascii=False) if args.json else format_event(event), flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,10 @@
 import sys
 import os
+import glob
+import json
+import time
+import argparse
+from multiprocessing import Pool
 from datetime import datetime
 import tkinter as tk
 from tkinter import filedialog
@@ -9,16 +14,23 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # 导入logany模块
 try:
-    from logany import ProtocolAnalyzer, result_out
+    from logany import ProtocolAnalyzer, DEFAULT_LATENCY_BUDGETS, result_out
     from fault_mapping import get_fault_mapping
+    from parse_cache import ParsedLogCache
+    from latency_stats import FlowLatencyStats
 except ImportError:
     print("无法导入logany模块或fault_mapping模块，请确保相关文件在同一目录下")
     sys.exit(1)
 
 class FaultDiagnosisSystem:
-    def __init__(self):
-        """初始化故障诊断系统"""
-        self.analyzer = ProtocolAnalyzer()
+    def __init__(self, cache_dir=None, use_cache=False, latency_budgets=None):
+        """初始化故障诊断系统
+        use_cache为True时启用解析缓存，cache_dir为缓存目录（默认在日志文件旁的 .logcache）
+        latency_budgets为时延预算（见 logany.DEFAULT_LATENCY_BUDGETS），默认不按时延判断超时
+        """
+        self.latency_budgets = latency_budgets
+        self.analyzer = ProtocolAnalyzer(latency_budgets)
+        self.parse_cache = ParsedLogCache(cache_dir) if use_cache or cache_dir else None
         
         # 从外部文件加载故障映射规则
         self.fault_mapping = get_fault_mapping()
@@ -26,33 +38,13 @@ class FaultDiagnosisSystem:
     def analyze_log_file(self, file_path):
         """分析日志文件并返回故障诊断结果"""
         try:
-            # 使用logany模块解析日志
-            logs = self.analyzer.parse_log(file_path)
-            if not logs:
-                return {
-                    "success": False,
-                    "error": "日志文件为空或格式不正确"
-                }
-            
-            # 分析流程完整性
-            self.analyzer.analyze_flow_completeness(logs)
-            report = self.analyzer.generate_analysis_report()
-            
-            # 获取流程顺序
-            flow_order = list(self.analyzer.flow_definitions.keys())
-            
-            # 找到第一个错误
-            first_error = self.analyzer.print_first_error(report, flow_order)
-            
-            # 生成故障诊断结果
-            diagnosis_result = self.generate_fault_diagnosis(first_error, report)
-            
-            return {
-                "success": True,
-                "diagnosis": diagnosis_result,
-                "detailed_report": report,
-                "analyzed_logs_count": len(logs)
-            }
+            # 使用logany模块流式解析日志并分析流程完整性，启用缓存时直接读取解析结果
+            if self.parse_cache is not None:
+                with self.parse_cache.open(self.analyzer, file_path) as cached_log:
+                    logs_count = self.analyzer.analyze_entries(cached_log)
+            else:
+                logs_count = self.analyzer.analyze_log_stream(file_path)
+            return self.summarize_analysis(logs_count)
             
         except Exception as e:
             return {
@@ -60,6 +52,32 @@ class FaultDiagnosisSystem:
                 "error": f"分析过程中发生错误: {str(e)}"
             }
     
+    def summarize_analysis(self, logs_count):
+        """分析器输入完所有日志后，生成报告与故障诊断结果"""
+        if not logs_count:
+            return {
+                "success": False,
+                "error": "日志文件为空或格式不正确"
+            }
+        
+        report = self.analyzer.generate_analysis_report()
+        
+        # 获取流程顺序
+        flow_order = list(self.analyzer.flow_definitions.keys())
+        
+        # 找到第一个错误
+        first_error = self.analyzer.print_first_error(report, flow_order)
+        
+        # 生成故障诊断结果
+        diagnosis_result = self.generate_fault_diagnosis(first_error, report)
+        
+        return {
+            "success": True,
+            "diagnosis": diagnosis_result,
+            "detailed_report": report,
+            "analyzed_logs_count": logs_count
+        }
+    
     def generate_fault_diagnosis(self, first_error, detailed_report):
         """根据分析结果生成故障诊断"""
         if first_error.get("status") == "all_flows_completed":
@@ -103,6 +121,8 @@ class FaultDiagnosisSystem:
         """从故障描述中提取故障类型"""
         if "启动失败" in fault_description:
             return "启动失败"
+        elif "待定" in fault_description:
+            return "待定"
         elif "卡MSG" in fault_description:
             return "流程中断"
         elif "失败" in fault_description:
@@ -176,8 +196,125 @@ def select_log_file():
     
     return file_path
 
+# ---------------------------------------
+# 批量诊断模式（无界面）：python log2err_v1.py --batch <目录或通配符> [-j 进程数] [-o 结果文件]
+
+_worker_system = None
+_worker_collect_latency = False
+
+def _init_worker(cache_dir=None, use_cache=False, collect_latency=False, latency_budgets=None):
+    """进程池初始化：每个工作进程只创建一次诊断系统，解析告警输出到stderr避免混入结果
+    collect_latency为True时每个结果附带该文件的时延统计，由主进程合并
+    """
+    global _worker_system, _worker_collect_latency
+    sys.stdout = sys.stderr
+    _worker_system = FaultDiagnosisSystem(cache_dir, use_cache, latency_budgets)
+    _worker_collect_latency = collect_latency
+
+def _diagnose_file(file_path):
+    """工作进程中诊断单个文件，返回可序列化为JSON的结果"""
+    start = time.perf_counter()
+    # 每个文件使用新的分析器，避免上一个文件的流程状态残留
+    _worker_system.analyzer = ProtocolAnalyzer(_worker_system.latency_budgets)
+    result = _worker_system.analyze_log_file(file_path)
+    record = {"file": file_path, "success": result["success"]}
+    if result["success"]:
+        record["diagnosis"] = result["diagnosis"]
+        record["analyzed_logs_count"] = result["analyzed_logs_count"]
+        if _worker_collect_latency:
+            record["latency_stats"] = FlowLatencyStats().add_analysis(_worker_system.analyzer).to_dict()
+    else:
+        record["error"] = result["error"]
+    record["elapsed"] = round(time.perf_counter() - start, 4)
+    return record
+
+def collect_log_files(inputs, extensions=(".txt", ".log")):
+    """展开输入的目录或通配符，返回排序去重后的日志文件列表"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for dir_path, _, file_names in os.walk(item):
+                files.extend(os.path.join(dir_path, name) for name in file_names
+                             if name.lower().endswith(extensions))
+        else:
+            files.extend(path for path in glob.glob(item, recursive=True) if os.path.isfile(path))
+    return sorted(set(files))
+
+def batch_diagnose(files, workers=None, out=sys.stdout, chunksize=4, progress_interval=1.0,
+                   cache_dir=None, use_cache=False, latency_stats=None, latency_budgets=None):
+    """使用进程池批量诊断，每完成一个文件向out写入一行JSON，并在stderr输出进度与吞吐量
+    latency_stats为 FlowLatencyStats 时汇总所有文件的流程时延统计（不写入结果文件）
+    latency_budgets为时延预算，同 FaultDiagnosisSystem
+    """
+    total = len(files)
+    done = failed = lines = 0
+    start = last_report = time.perf_counter()
+
+    def report_progress():
+        elapsed = time.perf_counter() - start
+        print(f"[进度] {done}/{total} 文件，失败 {failed}，"
+              f"{done / elapsed:.1f} 文件/秒，{lines / elapsed:,.0f} 行/秒", file=sys.stderr)
+
+    initargs = (cache_dir, use_cache, latency_stats is not None, latency_budgets)
+    with Pool(processes=workers, initializer=_init_worker, initargs=initargs) as pool:
+        for record in pool.imap_unordered(_diagnose_file, files, chunksize=chunksize):
+            done += 1
+            if "latency_stats" in record:
+                latency_stats.merge(FlowLatencyStats.from_dict(record.pop("latency_stats")))
+            if record["success"]:
+                lines += record["analyzed_logs_count"]
+            else:
+                failed += 1
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+
+            now = time.perf_counter()
+            if now - last_report >= progress_interval:
+                last_report = now
+                report_progress()
+
+    if total:
+        report_progress()
+    return {"files": total, "failed": failed, "lines": lines, "elapsed": time.perf_counter() - start}
+
+def batch_main(argv):
+    """批量诊断命令行入口"""
+    parser = argparse.ArgumentParser(prog="log2err_v1.py --batch", description="批量诊断5G日志文件")
+    parser.add_argument("inputs", nargs="+", help="日志目录或通配符（如 logs/**/*.txt）")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="工作进程数，默认CPU核数")
+    parser.add_argument("-o", "--output", help="结果文件（JSON Lines），默认输出到stdout")
+    parser.add_argument("--chunksize", type=int, default=4, help="每次分发给工作进程的文件数")
+    parser.add_argument("--cache", action="store_true", help="启用解析缓存（默认缓存在日志文件旁的 .logcache）")
+    parser.add_argument("--cache-dir", help="解析缓存目录，指定时自动启用缓存")
+    parser.add_argument("--budgets", action="store_true",
+                        help="按3GPP协议定时器的时延预算诊断超时（timeout/pending），默认不启用")
+    parser.add_argument("--latency-stats", help="汇总流程时延统计并输出到该文件（.csv为表格，否则为可合并的JSON）")
+    args = parser.parse_args(argv)
+
+    files = collect_log_files(args.inputs)
+    print(f"共找到 {len(files)} 个日志文件，使用 {args.workers} 个进程", file=sys.stderr)
+
+    latency_stats = FlowLatencyStats() if args.latency_stats else None
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        stats = batch_diagnose(files, args.workers, out, args.chunksize,
+                               cache_dir=args.cache_dir, use_cache=args.cache, latency_stats=latency_stats,
+                               latency_budgets=DEFAULT_LATENCY_BUDGETS if args.budgets else None)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if latency_stats is not None:
+        latency_stats.dump(args.latency_stats)
+        print(f"时延统计已输出到 {args.latency_stats}", file=sys.stderr)
+    print(f"完成: {stats['files']} 个文件，失败 {stats['failed']}，共 {stats['lines']} 行，"
+          f"耗时 {stats['elapsed']:.2f}秒", file=sys.stderr)
+
 def main():
     """主函数"""
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        batch_main(sys.argv[2:])
+        return
+
     print("5G日志故障诊断系统 v1.0")
     print("-" * 40)
     
@@ -1,13 +1,33 @@
 # 在v1.3的基础上，增加了对于[]的处理
-from datetime import datetime
 from collections import deque
 import json
+import math
 import tkinter as tk
 from tkinter import filedialog
+from timestamp_decoder import TimestampDecoder, from_us, to_us
+from timer_wheel import TimerWheel
+
+# 3GPP协议定时器（T300、T3560、T3550、T3580）对应的时延预算（秒），需要时通过 latency_budgets 启用：
+# {流程名: {"steps": {步骤消息: 距上一步骤的最长时间}, "timeout": 从第一步到完成的最长时间}}
+DEFAULT_LATENCY_BUDGETS = {
+    "RRC Connection Setup": {"steps": {"rrcSetup": 2.0}},
+    "NAS Authentication": {"steps": {"Authentication response": 6.0}},
+    "NAS SMC": {"steps": {"Security mode complete": 6.0}},
+    "Registration response": {"steps": {"Registration complete": 6.0}},
+    "PDU session": {"timeout": 16.0},
+}
 
 class ProtocolAnalyzer:
-    def __init__(self):
+    # 解析器版本，iter_log 的输出格式或解析规则变化时递增，使旧的解析缓存失效
+    PARSER_VERSION = 1
+
+    def __init__(self, latency_budgets=None):
+        """
+        latency_budgets: 时延预算（格式同 DEFAULT_LATENCY_BUDGETS），默认不启用，
+                         启用后超出预算的流程诊断为 timeout，日志结束时仍在预算内的流程诊断为 pending
+        """
         # 扩展流程模板（包含关键5G流程）
+        # 可选的时延预算（秒）：步骤的"timeout"为距上一步骤的最长时间，流程的"timeout"为从第一步到完成的最长时间
         self.flow_definitions = {
             # 注册请求
             "Registration Request": {
@@ -120,123 +140,391 @@ class ProtocolAnalyzer:
         self.active_flows = {}
         self.completed_flows = []
         self.over_flows = []
+        self.flow_status = {}
+        self.dispatch_index = {}
+        self.flow_names = []
+        self.flow_totals = []
+        self.flow_prereq_masks = []
+        self.flow_dependents = []
+        self.done_mask = 0
+        self.ready_mask = 0
+        # 时延预算（整数微秒，未配置为None）与超时跟踪
+        self.step_budgets = []
+        self.flow_budgets = []
+        self.timer_wheel = TimerWheel()
+        self.timer_tokens = []
+        self.timeout_records = {}
+        self.step_latencies = {}
+        self.last_timestamp = None
+        if latency_budgets:
+            self.apply_latency_budgets(latency_budgets)
+
+    def apply_latency_budgets(self, latency_budgets):
+        """把时延预算写入流程定义的"timeout"，下一次开始分析时生效"""
+        for flow_name, budget in latency_budgets.items():
+            flow_def = self.flow_definitions[flow_name]
+            if "timeout" in budget:
+                flow_def["timeout"] = budget["timeout"]
+            step_budgets = budget.get("steps", {})
+            for step in flow_def["steps"]:
+                if step["msg"] in step_budgets:
+                    step["timeout"] = step_budgets[step["msg"]]
+
+    def reset(self):
+        """清除上一次分析留下的运行时状态（包括跨调用保留的已完成流程），分析器可直接复用于下一个文件"""
+        self.active_flows = {}
+        self.completed_flows = []
+        self.over_flows = []
+        self.flow_status = {}
 
     def parse_log(self, file_path: str) -> list:
         """解析日志文件（基于制表符分隔的格式）"""
-        logs = []
+        return list(self.iter_log(file_path))
+
+    def iter_log(self, file_path: str, timestamp_us: bool = False, session_field: int = None):
+        """流式解析日志文件，逐条产出日志条目，内存占用与文件大小无关
+        timestamp_us为True时时间戳保留为整数微秒，而不是datetime
+        session_field为会话字段的列号（从0开始），指定时条目中增加"session"字段用于多UE拆分
+        """
+        decoder = TimestampDecoder()
+        decode = decoder.decode_us if timestamp_us else decoder.decode
         with open(file_path, 'r', encoding='utf-8') as f:
             for line_num, line in enumerate(f, 1):
-                # 严格按制表符拆分字段
-                parts = line.strip().split('\t')
-                
-                # 验证字段数量（根据样例日志至少有9个字段）
-                if len(parts) < 9:
-                    print(f"行 {line_num} 字段不足: {line.strip()}")
-                    continue
-                
-                try:
-                    # 解析复合时间戳字段（格式：09:42:30.804, 2025-04-07）
-                    start_time_str = parts[2].replace(',', '').strip()  # 09:42:30.804 2025-04-07
-                    # end_time_str = parts[3].replace(',', '').strip()
-                    
-                    # 解析时间戳（使用第一个时间戳作为基准）
-                    timestamp = datetime.strptime(start_time_str, "%H:%M:%S.%f %Y-%m-%d")
-                    
-                    # 构建日志条目
-                    log_entry = {
-                        # "line_num": line_num,
-                        "seq": int(parts[0]),
-                        "timestamp": timestamp,
-                        # "duration": datetime.strptime(end_time_str, "%H:%M:%S.%f %Y-%m-%d") - timestamp,
-                        "protocol": parts[6],  # 第7个字段是协议类型
-                        "direction": parts[5], # 第6个字段是方向(U/D)
-                        "message": parts[8].strip().lower()  # 直接处理原始消息
-                        # "raw": line.strip()
-                    }
-                    logs.append(log_entry)
-                    
-                except Exception as e:
-                    print(f"解析错误 行 {line_num}: {line.strip()}")
-                    print(f"错误详情: {str(e)}")
-        return logs
+                log_entry = self.parse_line(line, line_num, decode, session_field)
+                if log_entry is not None:
+                    yield log_entry
+
+    def parse_line(self, line: str, line_num: int, decode, session_field: int = None):
+        """解析一行日志，字段不足或解析失败时打印原因并返回None
+        decode为时间戳解析函数（TimestampDecoder.decode 或 decode_us）
+        """
+        # 严格按制表符拆分字段
+        parts = line.strip().split('\t')
+        
+        # 验证字段数量（根据样例日志至少有9个字段）
+        if len(parts) < 9:
+            print(f"行 {line_num} 字段不足: {line.strip()}")
+            return None
+        
+        try:
+            # 解析复合时间戳字段（格式：09:42:30.804, 2025-04-07）
+            # end_time_str = parts[3].replace(',', '').strip()
+            
+            # 解析时间戳（使用第一个时间戳作为基准，固定格式按位置切片解析）
+            timestamp = decode(parts[2])
+            
+            # 构建日志条目
+            log_entry = {
+                # "line_num": line_num,
+                "seq": int(parts[0]),
+                "timestamp": timestamp,
+                # "duration": datetime.strptime(end_time_str, "%H:%M:%S.%f %Y-%m-%d") - timestamp,
+                "protocol": parts[6],  # 第7个字段是协议类型
+                "direction": parts[5], # 第6个字段是方向(U/D)
+                "message": parts[8].strip().lower()  # 直接处理原始消息
+                # "raw": line.strip()
+            }
+            if session_field is not None:
+                log_entry["session"] = parts[session_field].strip() if session_field < len(parts) else ""
+        except Exception as e:
+            print(f"解析错误 行 {line_num}: {line.strip()}")
+            print(f"错误详情: {str(e)}")
+            return None
+        return log_entry
     
     def contains_in_order(self, a_str, b_str):
-        a_str = a_str.replace('[',' ')  # 替换方括号
-        b_str = b_str.replace('[',' ')
-        words = b_str.split()  # 按空格分割成单词列表
+        """判断b_str中的单词是否按顺序出现在a_str中"""
+        return self.match_tokens(self.normalize_message(a_str), self.compile_step_msg(b_str))
+
+    @staticmethod
+    def normalize_message(message):
+        """日志消息预处理：替换方括号，每条日志只需处理一次"""
+        return message.replace('[', ' ')
+
+    @staticmethod
+    def compile_step_msg(msg):
+        """将步骤模板消息预编译为单词序列，模板在分析过程中不变"""
+        return tuple(msg.replace('[', ' ').split())
+
+    @staticmethod
+    def match_tokens(message, words):
+        """按顺序在预处理后的消息中查找预编译的单词序列"""
+        if len(words) == 1:
+            return words[0] in message
         current_pos = 0  # 标记当前查找的起始位置
         for word in words:
-            idx = a_str.find(word, current_pos)  # 从current_pos开始查找单词
+            idx = message.find(word, current_pos)  # 从current_pos开始查找单词
             if idx == -1:
                 return False  # 未找到单词，直接返回False
             current_pos = idx + len(word)  # 更新查找位置到当前单词末尾
         return True  # 所有单词均按顺序找到
 
     def analyze_flow_completeness(self, logs):
-        """分析日志中的流程完整性"""
-        # 初始化所有流程的跟踪状态
-        flow_status = {name: {"found_steps": [], "completed": False} for name in self.flow_definitions}
-        
+        """分析日志中的流程完整性（logs 可以是列表，也可以是 iter_log 的生成器）"""
+        self.start_analysis()
         for log_entry in logs:
-            for flow_name, flow_def in self.flow_definitions.items():
-                # 跳过已完成的流程
-                if flow_status[flow_name]["completed"]:
-                    continue
-                
-                # 检查前置条件是否满足
-                if not all(p in self.completed_flows for p in flow_def["prerequisites"]):
-                    continue
-                
-                # 检查当前步骤是否匹配
-                expected_steps = flow_def["steps"]
-                current_step_index = len(flow_status[flow_name]["found_steps"])
+            self.feed(log_entry)
+        self.finish_analysis()
+
+    def analyze_log_stream(self, file_path: str, timestamp_us: bool = False) -> int:
+        """流式分析日志文件：边解析边推进状态机，返回处理的日志条数"""
+        return self.analyze_entries(self.iter_log(file_path, timestamp_us))
+
+    def analyze_entries(self, entries) -> int:
+        """分析任意日志条目序列（生成器、解析缓存等），返回处理的日志条数"""
+        count = 0
+        self.start_analysis()
+        for log_entry in entries:
+            self.feed(log_entry)
+            count += 1
+        self.finish_analysis()
+        return count
+
+    def compile_flows(self):
+        """将流程定义编译为按(协议, 方向)分派的索引
+        索引值为按流程定义顺序排列的候选流程列表，每个候选记录该键下的步骤 {步骤序号: (预编译单词序列, 步骤)}，
+        每条日志只需检查当前期望步骤可能匹配的流程
+        """
+        self.flow_names = list(self.flow_definitions)
+        flow_ids = {name: idx for idx, name in enumerate(self.flow_names)}
+        self.flow_totals = [len(flow_def["steps"]) for flow_def in self.flow_definitions.values()]
+        # 前置条件位掩码：第i位表示依赖第i个流程，引用了未定义的流程时置一个永远不会完成的位
+        never_done = 1 << len(self.flow_names)
+        self.flow_prereq_masks = []
+        self.flow_dependents = [[] for _ in self.flow_names]
+        for flow_idx, flow_def in enumerate(self.flow_definitions.values()):
+            mask = 0
+            for p in flow_def["prerequisites"]:
+                if p in flow_ids:
+                    mask |= 1 << flow_ids[p]
+                    self.flow_dependents[flow_ids[p]].append(flow_idx)
+                else:
+                    mask |= never_done
+            self.flow_prereq_masks.append(mask)
+
+        index = {}
+        for flow_idx, (flow_name, flow_def) in enumerate(self.flow_definitions.items()):
+            for step_idx, step in enumerate(flow_def["steps"]):
+                key = (step["protocol"].lower(), step["dir"].lower())
+                flows = index.setdefault(key, {})
+                if flow_name not in flows:
+                    flows[flow_name] = (flow_idx, flow_name, len(flow_def["steps"]), {})
+                flows[flow_name][3][step_idx] = (self.compile_step_msg(step["msg"].lower()), step)
+        self.dispatch_index = {key: list(flows.values()) for key, flows in index.items()}
+
+        self.step_budgets = [[self.budget_us(step.get("timeout")) for step in flow_def["steps"]]
+                             for flow_def in self.flow_definitions.values()]
+        self.flow_budgets = [self.budget_us(flow_def.get("timeout")) for flow_def in self.flow_definitions.values()]
+
+    @staticmethod
+    def budget_us(seconds):
+        """时延预算（秒）转为整数微秒"""
+        return None if seconds is None else int(seconds * 1000000)
+
+    @staticmethod
+    def timestamp_us(timestamp):
+        """时间戳转为整数微秒，兼容datetime和整数微秒两种表示"""
+        return timestamp if isinstance(timestamp, int) else to_us(timestamp)
+
+    def names_to_mask(self, flow_names):
+        """流程名称列表转为完成位集"""
+        mask = 0
+        for idx, name in enumerate(self.flow_names):
+            if name in flow_names:
+                mask |= 1 << idx
+        return mask
+
+    def initial_ready_mask(self, done_mask):
+        """根据完成位集计算前置条件已满足的流程位集"""
+        ready = 0
+        for idx, mask in enumerate(self.flow_prereq_masks):
+            if done_mask & mask == mask:
+                ready |= 1 << idx
+        return ready
+
+    def complete_flow(self, flow_idx, done_mask, ready_mask):
+        """流程完成事件：置位完成位集，并只检查依赖该流程的后续流程是否解锁"""
+        done_mask |= 1 << flow_idx
+        for dependent in self.flow_dependents[flow_idx]:
+            mask = self.flow_prereq_masks[dependent]
+            if done_mask & mask == mask:
+                ready_mask |= 1 << dependent
+        return done_mask, ready_mask
+
+    def start_analysis(self):
+        """初始化所有流程的跟踪状态，之后可通过 feed 逐条输入日志"""
+        self.compile_flows()
+        self.flow_status = {name: {"found_steps": [], "completed": False} for name in self.flow_definitions}
+        self.done_mask = self.names_to_mask(self.completed_flows)
+        self.ready_mask = self.initial_ready_mask(self.done_mask)
+        self.timer_wheel.clear()
+        self.timer_tokens = [0] * len(self.flow_names)
+        self.timeout_records = {}
+        self.step_latencies = {}
+        self.last_timestamp = None
+
+    def feed(self, log_entry):
+        """输入一条日志，推进各流程的状态机"""
+        # 先按当前日志时间处理到期的超时定时器，没有定时器时不做时间换算
+        self.last_timestamp = log_entry["timestamp"]
+        if self.timer_wheel.pending:
+            self.expire_timers(self.timestamp_us(self.last_timestamp))
+        candidates = self.dispatch_index.get((log_entry["protocol"].lower(), log_entry["direction"].lower()))
+        if not candidates:
+            return
+        message = self.normalize_message(log_entry["message"].lower())
+        flow_status = self.flow_status
+        # 候选按流程定义顺序检查，同一条日志上先完成的流程可以解锁后面的流程
+        for flow_idx, flow_name, total_steps, steps in candidates:
+            status = flow_status[flow_name]
+            # 跳过已完成的流程
+            if status["completed"]:
+                continue
+            
+            # 当前期望步骤不属于该(协议, 方向)时直接跳过
+            found_steps = status["found_steps"]
+            expected = steps.get(len(found_steps))
+            if expected is None:
+                continue
+            
+            # 检查前置条件是否满足（位集O(1)判断，在前置流程完成时更新）
+            if not self.ready_mask >> flow_idx & 1:
+                continue
+            
+            # 检查当前步骤是否匹配
+            expected_words, expected_step = expected
+            if self.match_tokens(message, expected_words):
+                # 记录找到的步骤
+                found_steps.append({
+                    "step": expected_step,
+                    "timestamp": log_entry["timestamp"]
+                })
+                self.track_step_timing(flow_idx, flow_name, found_steps)
                 
-                if current_step_index < len(expected_steps):
-                    expected = expected_steps[current_step_index]
-                    if (self.contains_in_order(log_entry["message"].lower(), expected["msg"].lower()) and
-                        # expected["msg"].lower() in log_entry["message"].lower() and
-                        log_entry["protocol"].lower() == expected["protocol"].lower() and
-                        log_entry["direction"].lower() == expected["dir"].lower()):
-                        
-                        # 记录找到的步骤
-                        flow_status[flow_name]["found_steps"].append({
-                            "step": expected,
-                            "timestamp": log_entry["timestamp"]
-                        })
-                        
-                        # 标记完成状态
-                        if len(flow_status[flow_name]["found_steps"]) == len(expected_steps):
-                            flow_status[flow_name]["completed"] = True
-                            self.completed_flows.append(flow_name)
-                            if flow_name in self.active_flows:
-                                del self.active_flows[flow_name]
-
-        # 更新激活流程状态
-        for flow_name in self.flow_definitions:
-            if flow_name in self.completed_flows:
+                # 标记完成状态
+                if len(found_steps) == total_steps:
+                    status["completed"] = True
+                    self.completed_flows.append(flow_name)
+                    self.done_mask, self.ready_mask = self.complete_flow(flow_idx, self.done_mask, self.ready_mask)
+                    if flow_name in self.active_flows:
+                        del self.active_flows[flow_name]
+
+    def track_step_timing(self, flow_idx, flow_name, found_steps):
+        """记录与上一步骤的时延并检查预算，作废该流程之前的定时器，再为下一步骤和整个流程登记新的定时器"""
+        step_idx = len(found_steps) - 1
+        step_budgets = self.step_budgets[flow_idx]
+        flow_budget = self.flow_budgets[flow_idx]
+        now_us = self.timestamp_us(found_steps[-1]["timestamp"])
+        if step_idx > 0:
+            prev_us = self.timestamp_us(found_steps[-2]["timestamp"])
+            latency = now_us - prev_us
+            self.step_latencies.setdefault((flow_name, step_idx), []).append(latency)
+            budget = step_budgets[step_idx]
+            if budget is not None and latency >= budget:
+                self.record_timeout(flow_name, step_idx, budget, prev_us + budget, latency)
+
+        completed = step_idx + 1 == len(step_budgets)
+        if completed and flow_budget is not None:
+            start_us = self.timestamp_us(found_steps[0]["timestamp"])
+            if now_us - start_us >= flow_budget:
+                self.record_timeout(flow_name, None, flow_budget, start_us + flow_budget, now_us - start_us)
+
+        self.timer_tokens[flow_idx] += 1
+        if completed:
+            return
+        next_budget = step_budgets[step_idx + 1]
+        if next_budget is not None:
+            self.timer_wheel.schedule(now_us + next_budget, (flow_idx, step_idx + 1), self.timer_tokens[flow_idx])
+        # 流程整体定时器不随步骤进展作废，到期时流程未完成即超时
+        if step_idx == 0 and flow_budget is not None:
+            self.timer_wheel.schedule(now_us + flow_budget, (flow_idx, None))
+
+    def expire_timers(self, now_us):
+        """推进时间轮，记录截止时间已过仍未进展（步骤定时器）或未完成（流程定时器）的流程"""
+        for deadline, (flow_idx, step_idx), token in self.timer_wheel.advance(now_us):
+            flow_name = self.flow_names[flow_idx]
+            if self.flow_status[flow_name]["completed"]:
                 continue
-            if len(flow_status[flow_name]["found_steps"]) > 0:
+            if step_idx is None:
+                self.record_timeout(flow_name, None, self.flow_budgets[flow_idx], deadline)
+            elif token == self.timer_tokens[flow_idx]:
+                self.record_timeout(flow_name, step_idx, self.step_budgets[flow_idx][step_idx], deadline)
+
+    def record_timeout(self, flow_name, step_idx, budget, deadline, elapsed=None, timeout_records=None):
+        """记录超时（step_idx为None表示流程整体超时），步骤迟到时补充实际耗时
+        timeout_records: 写入的超时记录，默认为当前分析器的记录（多UE拆分时传入会话自己的记录）
+        """
+        if timeout_records is None:
+            timeout_records = self.timeout_records
+        record = timeout_records.get((flow_name, step_idx))
+        if record is None:
+            record = timeout_records[(flow_name, step_idx)] = {
+                "flow_name": flow_name,
+                "scope": "flow" if step_idx is None else "step",
+                "step": None if step_idx is None else self.flow_definitions[flow_name]["steps"][step_idx]["msg"],
+                "budget_ms": budget / 1000,
+                "elapsed_ms": None,
+                "deadline": deadline,
+            }
+        if elapsed is not None:
+            record["elapsed_ms"] = elapsed / 1000
+
+    def within_budget(self, flow_idx, flow_name, step_count, timeout_records=None):
+        """进行中的流程是否仍在时延预算内（等待的步骤或整个流程配置了预算且尚未超时），未配置预算时返回None"""
+        if timeout_records is None:
+            timeout_records = self.timeout_records
+        next_budget = self.step_budgets[flow_idx][step_count]
+        flow_budget = self.flow_budgets[flow_idx]
+        if next_budget is None and flow_budget is None:
+            return None
+        if next_budget is not None and (flow_name, step_count) in timeout_records:
+            return False
+        return (flow_name, None) not in timeout_records
+
+    def finish_analysis(self):
+        """日志输入结束，更新激活流程状态"""
+        flow_status = self.flow_status
+        for flow_idx, flow_name in enumerate(self.flow_names):
+            if self.done_mask >> flow_idx & 1:
+                continue
+            found_steps = flow_status[flow_name]["found_steps"]
+            if len(found_steps) > 0:
                 self.active_flows[flow_name] = {
-                    "progress": flow_status[flow_name]["found_steps"],
+                    "progress": found_steps,
                     "total_steps": len(self.flow_definitions[flow_name]["steps"])
                 }
+                within_budget = self.within_budget(flow_idx, flow_name, len(found_steps))
+                if within_budget is not None:
+                    self.active_flows[flow_name]["within_budget"] = within_budget
 
-    def generate_analysis_report(self):
-        """生成分析报告"""
+    def generate_analysis_report(self, completed_flows=None, active_flows=None):
+        """生成分析报告（默认使用当前分析器的状态，也可传入其他会话的状态）
+        超时记录与步骤时延分布只属于当前分析器的状态，传入其他会话的状态时为空
+        """
+        own_state = completed_flows is None and active_flows is None
+        if completed_flows is None:
+            completed_flows = self.completed_flows
+        if active_flows is None:
+            active_flows = self.active_flows
+        if len(self.flow_names) != len(self.flow_definitions):
+            self.compile_flows()
+        done_mask = self.names_to_mask(completed_flows)
         report = {
             "summary": {
                 "total_flows": len(self.flow_definitions),
-                "completed": len(self.completed_flows),
-                "in_progress": len(self.active_flows),
-                "not_started": len(self.flow_definitions) - len(self.completed_flows) - len(self.active_flows)
+                "completed": len(completed_flows),
+                "in_progress": len(active_flows),
+                "not_started": len(self.flow_definitions) - len(completed_flows) - len(active_flows)
             },
             "completed_flows": [],
             "in_progress_flows": [],
-            "problematic_flows": []
+            "problematic_flows": [],
+            "timeout_flows": [],
+            "step_latencies": {}
         }
 
             # 已完成流程详情
-        for flow_name in self.completed_flows:
+        for flow_name in completed_flows:
                 report["completed_flows"].append({
                     "flow_name": flow_name,
                     "steps": self.flow_definitions[flow_name]["steps"],
@@ -244,7 +532,7 @@ class ProtocolAnalyzer:
                 })
 
             # 进行中流程详情
-        for flow_name, progress in self.active_flows.items():
+        for flow_name, progress in active_flows.items():
                 flow_info = {
                     "flow_name": flow_name,
                     "completed_steps": len(progress["progress"]),
@@ -252,6 +540,8 @@ class ProtocolAnalyzer:
                     "last_step_time": progress["progress"][-1]["timestamp"] if progress["progress"] else None,
                     "missing_steps": []
                 }
+                if "within_budget" in progress:
+                    flow_info["within_budget"] = progress["within_budget"]
                 
                 # 找出缺失的步骤
                 expected_steps = self.flow_definitions[flow_name]["steps"]
@@ -262,11 +552,11 @@ class ProtocolAnalyzer:
                 report["in_progress_flows"].append(flow_info)
 
             # 问题流程检测（前置条件满足但未启动）
-        for flow_name in self.flow_definitions:
-                if flow_name in self.completed_flows or flow_name in self.active_flows:
+        for flow_idx, flow_name in enumerate(self.flow_names):
+                if done_mask >> flow_idx & 1 or flow_name in active_flows:
                     continue
                     
-                prerequisites_met = all(p in self.completed_flows for p in self.flow_definitions[flow_name]["prerequisites"])
+                prerequisites_met = done_mask & self.flow_prereq_masks[flow_idx] == self.flow_prereq_masks[flow_idx]
                 if prerequisites_met:
                     report["problematic_flows"].append({
                         "flow_name": flow_name,
@@ -274,29 +564,86 @@ class ProtocolAnalyzer:
                         "missing_initial_step": self.flow_definitions[flow_name]["steps"][0]
                     })
 
+            # 超时流程与步骤时延分布
+        if own_state:
+            for record in self.timeout_records.values():
+                report["timeout_flows"].append(dict(record, deadline=self.format_time(record["deadline"])))
+            for (flow_name, step_idx), samples in sorted(self.step_latencies.items(),
+                                                         key=lambda item: (self.flow_names.index(item[0][0]), item[0][1])):
+                step = self.flow_definitions[flow_name]["steps"][step_idx]
+                summary = {"step": step["msg"]}
+                summary.update(self.latency_summary(samples))
+                if step.get("timeout") is not None:
+                    summary["budget_ms"] = step["timeout"] * 1000
+                report["step_latencies"].setdefault(flow_name, []).append(summary)
+
         return report
 
+    @staticmethod
+    def latency_summary(samples_us):
+        """时延样本（整数微秒）的分布摘要（毫秒），分位数取最近秩"""
+        ordered = sorted(samples_us)
+        count = len(ordered)
+
+        def percentile(q):
+            return ordered[max(0, math.ceil(q * count) - 1)] / 1000
+
+        return {
+            "count": count,
+            "min_ms": ordered[0] / 1000,
+            "p50_ms": percentile(0.5),
+            "p90_ms": percentile(0.9),
+            "max_ms": ordered[-1] / 1000,
+        }
+
+    @staticmethod
+    def format_time(timestamp):
+        """时间戳转为ISO格式字符串，兼容datetime和整数微秒两种表示"""
+        if timestamp is None:
+            return None
+        if isinstance(timestamp, int):
+            timestamp = from_us(timestamp)
+        return timestamp.isoformat()
+
     def print_first_error(self, report, flow_order):
-        """定位并返回第一个未完成的流程信息"""
+        """定位并返回第一个未完成（或完成但超出时延预算）的流程信息"""
+        # 每个流程取最先记录的超时
+        timeouts = {}
+        for record in report.get("timeout_flows", []):
+            timeouts.setdefault(record["flow_name"], record)
+
         for flow_name in flow_order:
-            # 检查是否已完成
+            timeout = timeouts.get(flow_name)
+            timeout_details = None
+            if timeout is not None:
+                timeout_details = {key: timeout[key] for key in ("scope", "step", "budget_ms", "elapsed_ms", "deadline")}
+
+            # 检查是否已完成（完成但超时的流程视为异常）
             if any(f["flow_name"] == flow_name for f in report["completed_flows"]):
-                continue
+                if timeout is None:
+                    continue
+                return {
+                    "blocking_flow": flow_name,
+                    "status": "timeout",
+                    "status_details": timeout_details
+                }
             
             error_info = {
                 "blocking_flow": flow_name,
                 "status_details": {}
             }
             
-            # 检查进行中状态
+            # 检查进行中状态（日志结束时仍在时延预算内的流程无法判定为中断）
             in_progress = next((f for f in report["in_progress_flows"] if f["flow_name"] == flow_name), None)
             if in_progress:
-                error_info["status"] = "in_progress"
+                error_info["status"] = "pending" if in_progress.get("within_budget") else "in_progress"
                 error_info["status_details"] = {
                     "progress": f"{in_progress['completed_steps']}/{in_progress['total_steps']}",
                     "missing_steps": [s["msg"] for s in in_progress["missing_steps"]],
-                    "last_step_time": in_progress["last_step_time"].isoformat() if in_progress["last_step_time"] else None
+                    "last_step_time": self.format_time(in_progress["last_step_time"])
                 }
+                if timeout_details is not None:
+                    error_info["status_details"]["timeout"] = timeout_details
                 return error_info
             
             # 检查问题流程
@@ -335,8 +682,7 @@ def result_out():
     f_path = filedialog.askopenfilename(title="选择日志文件", filetypes=[("Text files", "*.txt")])
     print(f"选择的文件: {f_path}")
 
-    logs = analyzer.parse_log(f_path)
-    analyzer.analyze_flow_completeness(logs)
+    analyzer.analyze_log_stream(f_path)
     report = analyzer.generate_analysis_report()
     flow_order = list(analyzer.flow_definitions.keys())
     result = analyzer.print_first_error(report, flow_order)
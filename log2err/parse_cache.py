@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+解析结果缓存
+将 ProtocolAnalyzer.iter_log 的解析结果以列式二进制格式保存，
+列为 seq / 时间戳(整数微秒) / 协议id / 方向id / 消息id，字符串表单独保存在文件尾部，
+缓存以文件内容哈希 + 解析器版本为键，再次分析同一文件时直接内存映射读取，无需重新解析文本
+"""
+import os
+import sys
+import json
+import mmap
+import struct
+import hashlib
+import tempfile
+from array import array
+
+from logany import ProtocolAnalyzer
+from timestamp_decoder import from_us
+
+# 文件头：魔数、解析器版本、字节序、保留、条目数、字符串表偏移
+_MAGIC = b"9005LOGC"
+_HEADER = struct.Struct("<8sIBxxxQQ")
+# 列定义：(列名, array类型码)，按元素宽度从大到小排列保证对齐
+_COLUMNS = (("seq", "q"), ("timestamp", "q"), ("message_id", "I"), ("protocol_id", "H"), ("direction_id", "H"))
+_BYTE_ORDER = 0 if sys.byteorder == "little" else 1
+
+
+def file_digest(file_path, chunk_size=1 << 20):
+    """计算日志文件内容的哈希"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CachedLog:
+    """内存映射的缓存日志，各列以 memoryview 暴露，可像 iter_log 一样迭代出日志条目"""
+
+    def __init__(self, path):
+        self.path = path
+        self.columns = {}
+        self._mmap = None
+        self._file = open(path, 'rb')
+        # 打开后的任何失败（空文件无法映射、截断、字符串表损坏）都释放已打开的资源
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, _, _, self.count, strings_offset = _HEADER.unpack_from(self._mmap, 0)
+            if magic != _MAGIC:
+                raise ValueError(f"不是有效的日志缓存文件: {path}")
+            # 截断或未写完的文件：各列长度与字符串表偏移对不上时不做类型转换
+            columns_end = _HEADER.size + self.count * sum(array(typecode).itemsize for _, typecode in _COLUMNS)
+            if strings_offset != columns_end or strings_offset > len(self._mmap):
+                raise ValueError(f"日志缓存文件不完整: {path}")
+
+            offset = _HEADER.size
+            view = memoryview(self._mmap)
+            try:
+                for name, typecode in _COLUMNS:
+                    size = self.count * array(typecode).itemsize
+                    self.columns[name] = view[offset:offset + size].cast(typecode)
+                    offset += size
+            finally:
+                view.release()
+
+            tables = json.loads(self._mmap[strings_offset:].decode('utf-8'))
+            self.protocols = tables["protocols"]
+            self.directions = tables["directions"]
+            self.messages = tables["messages"]
+        except BaseException:
+            self.close()
+            raise
+
+    def __len__(self):
+        return self.count
+
+    def iter_entries(self, timestamp_us: bool = False):
+        """按原顺序产出日志条目，字段与 ProtocolAnalyzer.iter_log 相同"""
+        columns = self.columns
+        protocols, directions, messages = self.protocols, self.directions, self.messages
+        for seq, timestamp, message_id, protocol_id, direction_id in zip(
+                columns["seq"], columns["timestamp"], columns["message_id"],
+                columns["protocol_id"], columns["direction_id"]):
+            yield {
+                "seq": seq,
+                "timestamp": timestamp if timestamp_us else from_us(timestamp),
+                "protocol": protocols[protocol_id],
+                "direction": directions[direction_id],
+                "message": messages[message_id]
+            }
+
+    def __iter__(self):
+        return self.iter_entries()
+
+    def close(self):
+        """释放列视图并关闭内存映射"""
+        for column in self.columns.values():
+            column.release()
+        self.columns = {}
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ParsedLogCache:
+    def __init__(self, cache_dir: str = None):
+        """
+        cache_dir: 缓存目录，默认为日志文件所在目录下的 .logcache
+        """
+        self.cache_dir = cache_dir
+
+    def cache_path(self, file_path, digest=None):
+        """缓存文件路径：<缓存目录>/<内容哈希>.v<解析器版本>.bin"""
+        cache_dir = self.cache_dir or os.path.join(os.path.dirname(os.path.abspath(file_path)), ".logcache")
+        digest = digest or file_digest(file_path)
+        return os.path.join(cache_dir, f"{digest}.v{ProtocolAnalyzer.PARSER_VERSION}.bin")
+
+    def load(self, file_path, path=None):
+        """命中缓存时返回 CachedLog，否则返回None"""
+        path = path or self.cache_path(file_path)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                _, _, byte_order, _, _ = _HEADER.unpack(f.read(_HEADER.size))
+            if byte_order != _BYTE_ORDER:
+                return None
+            return CachedLog(path)
+        except (OSError, ValueError, TypeError, KeyError, struct.error) as e:
+            print(f"缓存文件损坏，重新解析: {path} ({e})")
+            return None
+
+    def build(self, analyzer, file_path, path=None):
+        """解析日志并写入缓存，返回内存映射后的 CachedLog"""
+        path = path or self.cache_path(file_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        columns = {name: array(typecode) for name, typecode in _COLUMNS}
+        tables = {"protocols": {}, "directions": {}, "messages": {}}
+        for log_entry in analyzer.iter_log(file_path, timestamp_us=True):
+            columns["seq"].append(log_entry["seq"])
+            columns["timestamp"].append(log_entry["timestamp"])
+            # 字符串驻留：相同的协议/方向/消息只保存一次
+            columns["protocol_id"].append(tables["protocols"].setdefault(log_entry["protocol"], len(tables["protocols"])))
+            columns["direction_id"].append(tables["directions"].setdefault(log_entry["direction"], len(tables["directions"])))
+            columns["message_id"].append(tables["messages"].setdefault(log_entry["message"], len(tables["messages"])))
+
+        count = len(columns["seq"])
+        strings = json.dumps({name: list(table) for name, table in tables.items()}, ensure_ascii=False).encode('utf-8')
+        strings_offset = _HEADER.size + sum(len(column) * column.itemsize for column in columns.values())
+
+        # 先写临时文件再替换，避免中断时留下不完整的缓存；
+        # 临时文件名唯一，同一进程的多个线程同时建立同一个缓存时各写各的文件，替换是原子的
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", prefix=os.path.basename(path) + ".",
+                                        dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, analyzer.PARSER_VERSION, _BYTE_ORDER, count, strings_offset))
+                for name, _ in _COLUMNS:
+                    columns[name].tofile(f)
+                f.write(strings)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return CachedLog(path)
+
+    def open(self, analyzer, file_path):
+        """读取缓存，未命中时解析并建立缓存（内容哈希只计算一次）"""
+        path = self.cache_path(file_path)
+        return self.load(file_path, path) or self.build(analyzer, file_path, path)
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+多UE会话拆分分析
+按配置的会话字段（制表符分隔的列号）拆分交织在一起的多UE日志，
+每个会话运行独立的流程状态机，并输出逐会话的诊断结果
+分析器启用时延预算时与单UE分析相同：所有会话共用一个按日志时间推进的时间轮，超时记录按会话保存
+用法: python session_demux.py <日志文件> <会话字段列号> [输出文件]
+"""
+import sys
+import os
+import json
+from array import array
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from logany import ProtocolAnalyzer
+from timestamp_decoder import to_us
+from timer_wheel import TimerWheel
+
+
+class SessionState:
+    """单个会话的紧凑状态，10万级并发会话时每个会话只占几百字节"""
+    __slots__ = ("steps", "completed", "done", "ready", "last_ts", "first_ts", "timeouts")
+
+    def __init__(self, flow_count, ready_mask):
+        self.steps = bytearray(flow_count)      # 每个流程已匹配的步骤数
+        self.completed = bytearray()            # 按完成顺序记录的流程序号
+        self.done = 0                           # 已完成流程位集
+        self.ready = ready_mask                 # 前置条件已满足的流程位集
+        self.last_ts = None                     # 每个流程最近匹配步骤的时间戳（整数微秒），首次匹配时分配
+        self.first_ts = None                    # 每个流程第一步的时间戳，用于流程整体预算，与 last_ts 同时分配
+        self.timeouts = None                    # 超时记录 {(流程, 步骤序号或None): 记录}，首次超时时分配
+
+
+class SessionFlowAnalyzer:
+    def __init__(self, session_field: int, analyzer: ProtocolAnalyzer = None):
+        """
+        session_field: 会话字段的列号（从0开始）
+        analyzer: 提供流程定义与报告生成的分析器，默认新建
+        """
+        self.session_field = session_field
+        self.analyzer = analyzer or ProtocolAnalyzer()
+        self.sessions = {}
+        self.initial_ready = 0
+        self.timer_wheel = TimerWheel()
+
+    def start_analysis(self):
+        """编译流程定义并清空所有会话状态"""
+        self.analyzer.compile_flows()
+        self.sessions = {}
+        self.initial_ready = self.analyzer.initial_ready_mask(0)
+        self.timer_wheel.clear()
+
+    def feed(self, log_entry):
+        """输入一条带"session"字段的日志，推进对应会话的状态机"""
+        session = log_entry.get("session", "")
+        state = self.sessions.get(session)
+        if state is None:
+            state = self.sessions[session] = SessionState(len(self.analyzer.flow_names), self.initial_ready)
+
+        analyzer = self.analyzer
+        if self.timer_wheel.pending:
+            self.expire_timers(analyzer.timestamp_us(log_entry["timestamp"]))
+        candidates = analyzer.dispatch_index.get((log_entry["protocol"].lower(), log_entry["direction"].lower()))
+        if not candidates:
+            return
+        message = analyzer.normalize_message(log_entry["message"].lower())
+        steps = state.steps
+        # 与 ProtocolAnalyzer.feed 相同的匹配规则，状态换成会话内的紧凑表示
+        for flow_idx, _, total_steps, step_map in candidates:
+            current = steps[flow_idx]
+            if current == total_steps:
+                continue
+            expected = step_map.get(current)
+            if expected is None:
+                continue
+            if not state.ready >> flow_idx & 1:
+                continue
+            if not analyzer.match_tokens(message, expected[0]):
+                continue
+
+            steps[flow_idx] = current + 1
+            if state.last_ts is None:
+                state.last_ts = array('q', bytes(8 * len(steps)))
+                state.first_ts = array('q', bytes(8 * len(steps)))
+            timestamp = log_entry["timestamp"]
+            now_us = to_us(timestamp) if isinstance(timestamp, datetime) else timestamp
+            if current == 0:
+                state.first_ts[flow_idx] = now_us
+            self.track_step_timing(session, state, flow_idx, current, now_us)
+            state.last_ts[flow_idx] = now_us
+            if current + 1 == total_steps:
+                state.completed.append(flow_idx)
+                state.done, state.ready = analyzer.complete_flow(flow_idx, state.done, state.ready)
+
+    def track_step_timing(self, session, state, flow_idx, step_idx, now_us):
+        """与 ProtocolAnalyzer.track_step_timing 相同的预算检查与定时器登记
+        会话的步骤数只增不减，步骤定时器以登记时等待的步骤序号作为令牌，到期时步骤数未变即超时
+        """
+        analyzer = self.analyzer
+        step_budgets = analyzer.step_budgets[flow_idx]
+        flow_budget = analyzer.flow_budgets[flow_idx]
+        if step_idx > 0:
+            budget = step_budgets[step_idx]
+            latency = now_us - state.last_ts[flow_idx]
+            if budget is not None and latency >= budget:
+                self.record_timeout(state, flow_idx, step_idx, budget, state.last_ts[flow_idx] + budget, latency)
+
+        if step_idx + 1 == len(step_budgets):
+            if flow_budget is not None:
+                start_us = state.first_ts[flow_idx]
+                if now_us - start_us >= flow_budget:
+                    self.record_timeout(state, flow_idx, None, flow_budget, start_us + flow_budget, now_us - start_us)
+            return
+        next_budget = step_budgets[step_idx + 1]
+        if next_budget is not None:
+            self.timer_wheel.schedule(now_us + next_budget, (session, flow_idx, step_idx + 1))
+        if step_idx == 0 and flow_budget is not None:
+            self.timer_wheel.schedule(now_us + flow_budget, (session, flow_idx, None))
+
+    def expire_timers(self, now_us):
+        """推进时间轮，记录到期时仍未进展或未完成的会话流程"""
+        analyzer = self.analyzer
+        for deadline, (session, flow_idx, step_idx), _ in self.timer_wheel.advance(now_us):
+            state = self.sessions[session]
+            if state.done >> flow_idx & 1:
+                continue
+            if step_idx is None:
+                self.record_timeout(state, flow_idx, None, analyzer.flow_budgets[flow_idx], deadline)
+            elif state.steps[flow_idx] == step_idx:
+                self.record_timeout(state, flow_idx, step_idx, analyzer.step_budgets[flow_idx][step_idx], deadline)
+
+    def record_timeout(self, state, flow_idx, step_idx, budget, deadline, elapsed=None):
+        if state.timeouts is None:
+            state.timeouts = {}
+        self.analyzer.record_timeout(self.analyzer.flow_names[flow_idx], step_idx, budget, deadline, elapsed,
+                                     state.timeouts)
+
+    def analyze_log_stream(self, file_path: str) -> int:
+        """流式分析日志文件，返回处理的日志条数"""
+        count = 0
+        self.start_analysis()
+        for log_entry in self.analyzer.iter_log(file_path, timestamp_us=True, session_field=self.session_field):
+            self.feed(log_entry)
+            count += 1
+        return count
+
+    def generate_session_report(self, session):
+        """生成单个会话的分析报告，格式与 ProtocolAnalyzer.generate_analysis_report 相同
+        紧凑状态只保留每个流程最近一步的时间戳，之前步骤的时间戳为None
+        """
+        analyzer = self.analyzer
+        state = self.sessions[session]
+        completed_flows = [analyzer.flow_names[idx] for idx in state.completed]
+        active_flows = {}
+        for flow_idx, count in enumerate(state.steps):
+            if count == 0 or state.done >> flow_idx & 1:
+                continue
+            flow_name = analyzer.flow_names[flow_idx]
+            progress = [{"step": step, "timestamp": None}
+                        for step in analyzer.flow_definitions[flow_name]["steps"][:count]]
+            progress[-1]["timestamp"] = state.last_ts[flow_idx]
+            active_flows[flow_name] = {
+                "progress": progress,
+                "total_steps": analyzer.flow_totals[flow_idx]
+            }
+            within_budget = analyzer.within_budget(flow_idx, flow_name, count, state.timeouts or {})
+            if within_budget is not None:
+                active_flows[flow_name]["within_budget"] = within_budget
+        report = analyzer.generate_analysis_report(completed_flows, active_flows)
+        for record in (state.timeouts or {}).values():
+            report["timeout_flows"].append(dict(record, deadline=analyzer.format_time(record["deadline"])))
+        return report
+
+    def diagnose_session(self, session):
+        """返回单个会话的第一个未完成流程信息"""
+        report = self.generate_session_report(session)
+        return self.analyzer.print_first_error(report, self.analyzer.flow_names), report
+
+    def iter_diagnoses(self):
+        """逐会话产出 (会话, 第一个未完成流程信息, 分析报告)"""
+        for session in self.sessions:
+            first_error, report = self.diagnose_session(session)
+            yield session, first_error, report
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("用法: python session_demux.py <日志文件> <会话字段列号> [输出文件]")
+        return
+
+    from log2err_v1 import FaultDiagnosisSystem
+
+    file_path = sys.argv[1]
+    demux = SessionFlowAnalyzer(int(sys.argv[2]))
+    logs_count = demux.analyze_log_stream(file_path)
+    diagnosis_system = FaultDiagnosisSystem()
+
+    out = open(sys.argv[3], 'w', encoding='utf-8') if len(sys.argv) > 3 else sys.stdout
+    try:
+        for session, first_error, report in demux.iter_diagnoses():
+            diagnosis = diagnosis_system.generate_fault_diagnosis(first_error, report)
+            out.write(json.dumps({"session": session, "diagnosis": diagnosis}, ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"已分析日志条数: {logs_count}，会话数: {len(demux.sessions)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+时间轮定时器
+按日志时间（整数微秒）调度超时检查：截止时间落入固定宽度的槽，只有到期槽中的定时器会被检查，
+每条日志推进时间轮的开销与定时器总数无关。
+定时器不支持删除，调用方通过令牌（例如每次进展递增的代数）在到期时判断定时器是否仍然有效。
+"""
+import heapq
+
+
+class TimerWheel:
+    def __init__(self, slot_us: int = 100000):
+        """slot_us: 槽宽度（微秒），默认100毫秒"""
+        self.slot_us = slot_us
+        self.slots = {}
+        # 非空槽序号的最小堆，日志时间跳跃很大时不需要逐个扫描空槽
+        self._slot_heap = []
+        self.pending = 0
+
+    def schedule(self, deadline_us: int, key, token=None):
+        """登记一个在 deadline_us 到期的定时器"""
+        slot = deadline_us // self.slot_us
+        timers = self.slots.get(slot)
+        if timers is None:
+            timers = self.slots[slot] = []
+            heapq.heappush(self._slot_heap, slot)
+        timers.append((deadline_us, key, token))
+        self.pending += 1
+
+    def advance(self, now_us: int):
+        """推进到 now_us，按截止时间顺序返回已到期的 [(截止时间, 键, 令牌), ...]"""
+        expired = []
+        heap = self._slot_heap
+        current = now_us // self.slot_us
+        while heap and heap[0] <= current:
+            slot = heap[0]
+            timers = self.slots[slot]
+            if slot < current:
+                heapq.heappop(heap)
+                del self.slots[slot]
+                expired.extend(timers)
+                continue
+            # 当前所在的槽只取出截止时间已过的定时器
+            remaining = [timer for timer in timers if timer[0] > now_us]
+            if len(remaining) != len(timers):
+                expired.extend(timer for timer in timers if timer[0] <= now_us)
+                if remaining:
+                    self.slots[slot] = remaining
+                else:
+                    heapq.heappop(heap)
+                    del self.slots[slot]
+            break
+        self.pending -= len(expired)
+        expired.sort(key=lambda timer: timer[0])
+        return expired
+
+    def clear(self):
+        self.slots = {}
+        self._slot_heap = []
+        self.pending = 0
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+9005日志时间戳快速解析
+时间戳字段格式固定为 "09:42:30.804, 2025-04-07"，
+日期部分在一份日志中几乎不变，因此缓存日期，时间部分按固定位置切片转整数，
+避免逐行调用 datetime.strptime
+"""
+from datetime import datetime, timedelta
+
+# 与 datetime.strptime 保持一致的格式，非固定宽度的字段回退到该格式解析
+TIMESTAMP_FORMAT = "%H:%M:%S.%f %Y-%m-%d"
+
+_EPOCH = datetime(1970, 1, 1)
+_US_PER_DAY = 86400 * 1000000
+
+
+class TimestampDecoder:
+    def __init__(self):
+        # 日期缓存：上一次出现的日期字符串及其解析结果
+        self._date_str = None
+        self._date = None
+        self._date_us = 0
+
+    def _split(self, field: str):
+        """拆分时间部分和日期部分（09:42:30.804, 2025-04-07）"""
+        time_str, _, date_str = field.replace(',', '').strip().partition(' ')
+        date_str = date_str.strip()
+        if date_str != self._date_str:
+            date = datetime.strptime(date_str, "%Y-%m-%d")
+            self._date_str = date_str
+            self._date = date
+            self._date_us = (date - _EPOCH).days * _US_PER_DAY
+        return time_str
+
+    @staticmethod
+    def _time_fields(time_str: str):
+        """按固定位置切片解析 HH:MM:SS.fff，格式不符时返回 None"""
+        if len(time_str) < 10 or time_str[2] != ':' or time_str[5] != ':' or time_str[8] != '.':
+            return None
+        frac = time_str[9:]
+        if len(frac) > 6 or not frac.isdigit():
+            return None
+        return (int(time_str[0:2]), int(time_str[3:5]), int(time_str[6:8]),
+                int(frac) * 10 ** (6 - len(frac)))
+
+    def decode(self, field: str) -> datetime:
+        """解析为 datetime，结果与 datetime.strptime(..., TIMESTAMP_FORMAT) 相同"""
+        time_str = self._split(field)
+        fields = self._time_fields(time_str)
+        if fields is None:
+            return datetime.strptime(f"{time_str} {self._date_str}", TIMESTAMP_FORMAT)
+        date = self._date
+        return datetime(date.year, date.month, date.day, *fields)
+
+    def decode_us(self, field: str) -> int:
+        """解析为自1970-01-01起的整数微秒（int64），适合大批量存储与计算时延"""
+        time_str = self._split(field)
+        fields = self._time_fields(time_str)
+        if fields is None:
+            return to_us(datetime.strptime(f"{time_str} {self._date_str}", TIMESTAMP_FORMAT))
+        hour, minute, second, us = fields
+        if hour > 23 or minute > 59 or second > 59:
+            raise ValueError(f"时间戳超出范围: {time_str}")
+        return self._date_us + ((hour * 60 + minute) * 60 + second) * 1000000 + us
+
+
+def to_us(timestamp: datetime) -> int:
+    """datetime 转为整数微秒"""
+    delta = timestamp - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def from_us(timestamp_us: int) -> datetime:
+    """整数微秒转回 datetime"""
+    return _EPOCH + timedelta(microseconds=timestamp_us)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+单次读取的统一诊断流水线
+原来流程诊断（ProtocolAnalyzer 解析日志）与向量诊断（LogProcessor 清洗文本）各自打开并解码一遍文件，
+这里只读取、解码一次：每一行先解析并输入流程状态机，再交给流式文本清洗，最后合并两路诊断结果。
+文本清洗凑够向量化需要的单词数后，剩余的行只用于流程分析。
+用法: python unified_pipeline.py <日志文件...> [--no-vector] [-o 结果文件]
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from log2err_v1 import FaultDiagnosisSystem
+from timestamp_decoder import TimestampDecoder
+
+TXT2VEC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "txt2vec")
+if TXT2VEC_DIR not in sys.path:
+    sys.path.append(TXT2VEC_DIR)
+
+# text2vec_v1 顶层只导入numpy，模型与重量级依赖在第一次使用时才加载
+import text2vec_v1
+
+
+class UnifiedDiagnosisPipeline:
+    def __init__(self, use_vectors=True, top_k=3):
+        """
+        use_vectors: 是否加载向量模型与故障库进行向量诊断；为False时仍输出清洗后的文本
+        top_k: 向量检索返回的相似故障数
+        """
+        text2vec_v1.Config.SHOW_ERROR_DIALOGS = False
+        self.system = FaultDiagnosisSystem()
+        self.log_processor = text2vec_v1.LogProcessor()
+        self.use_vectors = use_vectors
+        self.top_k = top_k
+        self.vector_engine = None
+        self.fault_database = None
+        if use_vectors:
+            self.vector_engine = text2vec_v1.VectorEngine()
+            self.fault_database = text2vec_v1.FaultDatabase()
+
+    def _fan_out(self, lines, counter):
+        """逐行解析并输入流程状态机，再把原始行交给下游的文本清洗"""
+        analyzer = self.system.analyzer
+        decode = TimestampDecoder().decode
+        for line_num, line in enumerate(lines, 1):
+            log_entry = analyzer.parse_line(line, line_num, decode)
+            if log_entry is not None:
+                analyzer.feed(log_entry)
+                counter[0] += 1
+            yield line
+
+    def read_once(self, file_path, max_tokens=None):
+        """
+        读取一次文件，同时完成流程分析与文本清洗
+
+        Returns:
+            (流程诊断结果（同 FaultDiagnosisSystem.analyze_log_file）, 清洗后的文本（失败为None）)
+        """
+        analyzer = self.system.analyzer
+        analyzer.reset()
+        analyzer.start_analysis()
+        counter = [0]
+        with open(file_path, 'r', encoding='utf-8') as f:
+            lines = self._fan_out(f, counter)
+            text = self.log_processor.clean_log_text(lines, max_tokens)
+            # 文本已凑够单词数（或清洗失败）时继续消费剩余的行，完成流程分析
+            for _ in lines:
+                pass
+        analyzer.finish_analysis()
+        return self.system.summarize_analysis(counter[0]), text
+
+    def match_text(self, text):
+        """向量化清洗后的文本并在故障库中检索"""
+        if not text:
+            return {"success": False, "error": "日志文本清洗失败，可能不是9005日志格式"}
+        vector = self.vector_engine.embed_text(text)
+        matches = self.fault_database.search(vector, self.top_k) if vector is not None else []
+        if not matches:
+            return {"success": False, "error": "向量化失败或故障库为空"}
+        return {
+            "success": True,
+            "fault_type": matches[0][0],
+            "top_matches": [{"fault_type": label, "similarity": round(score, 4)} for label, score in matches],
+        }
+
+    def diagnose(self, file_path):
+        """单次读取文件，返回合并后的流程诊断与向量诊断结果"""
+        token_limit = self.vector_engine.text_token_limit() if self.use_vectors else None
+        try:
+            flow_result, text = self.read_once(file_path, token_limit)
+        except (OSError, UnicodeDecodeError) as e:
+            error = {"success": False, "error": f"读取文件失败: {e}"}
+            return {"file": file_path, "flow": error, "vector": error} if self.use_vectors \
+                else {"file": file_path, "flow": error}
+
+        result = {"file": file_path, "flow": flow_result}
+        if self.use_vectors:
+            result["vector"] = self.match_text(text)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="单次读取日志，同时进行流程诊断与向量诊断")
+    parser.add_argument("files", nargs="+", help="日志文件")
+    parser.add_argument("--no-vector", action="store_true", help="只进行流程诊断，不加载向量模型")
+    parser.add_argument("-o", "--output", help="结果文件（JSON Lines），默认输出到stdout")
+    args = parser.parse_args()
+
+    pipeline = UnifiedDiagnosisPipeline(use_vectors=not args.no_vector)
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    # 解析告警输出到stderr，避免混入结果
+    sys.stdout = sys.stderr
+    try:
+        for file_path in args.files:
+            out.write(json.dumps(pipeline.diagnose(file_path), ensure_ascii=False, default=str) + "\n")
+            out.flush()
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
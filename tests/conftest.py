@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""log2err、txt2vec 都是脚本目录，测试时与脚本运行时一样把目录加入 sys.path"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for name in ("tests", "log2err", "txt2vec"):
+    path = os.path.join(ROOT, name)
+    if path not in sys.path:
+        sys.path.insert(0, path)
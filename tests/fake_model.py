@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""不依赖 sentence_transformers 的向量化模型，向量由文本哈希确定"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+import text2vec_v1
+
+DIM = 384
+
+
+class FakeModel:
+    max_seq_length = 256
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, **kwargs):
+        self.encoded += len(sentences)
+        return np.stack([np.frombuffer(hashlib.sha512(text.encode('utf-8')).digest() * 6, dtype=np.uint8)[:DIM]
+                         .astype(np.float32) for text in sentences])
+
+
+class FakeVectorEngine(text2vec_v1.VectorEngine):
+    """加载 FakeModel 的向量化引擎，记录模型加载次数"""
+
+    def __init__(self, directory, cache=True):
+        # 与真实模型目录一样提供最大序列长度，缓存键不需要加载模型
+        with open(os.path.join(str(directory), "sentence_bert_config.json"), 'w', encoding='utf-8') as f:
+            json.dump({"max_seq_length": FakeModel.max_seq_length}, f)
+        super().__init__(str(directory), os.path.join(str(directory), "cache.sqlite") if cache else None)
+        self.loads = 0
+
+    def _load_model(self):
+        self.loads += 1
+        self._model = FakeModel()
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+流程分析基准
+data/flow_baseline.json 为原 logany.ProtocolAnalyzer（列表模式 parse_log + analyze_flow_completeness）
+对以下场景日志的分析结果，各种分析方式（流式、解析缓存、实时跟踪）都应与其一致
+"""
+import json
+import os
+
+import log_factory
+
+with open(os.path.join(os.path.dirname(__file__), "data", "flow_baseline.json"), encoding="utf-8") as f:
+    BASELINE = json.load(f)
+
+# 场景名 -> 写出日志的函数
+SCENARIOS = {
+    "complete": lambda path: log_factory.write_log(path, log_factory.MESSAGES),
+    "missing_security_mode": lambda path: log_factory.write_log(
+        path, log_factory.MESSAGES[:9] + log_factory.MESSAGES[11:]),
+    "stuck_before_sip": lambda path: log_factory.write_log(path, log_factory.MESSAGES[:26]),
+}
+SCENARIOS.update({f"random_{seed}": (lambda path, seed=seed: log_factory.random_log(path, seed))
+                  for seed in range(40)})
+
+
+def outcome(analyzer):
+    """分析结果中原实现也有的部分（去掉新增的超时与时延统计），序列化后便于与基准对比"""
+    report = analyzer.generate_analysis_report()
+    report.pop("timeout_flows", None)
+    report.pop("step_latencies", None)
+    return json.loads(json.dumps({
+        "report": report,
+        "first_error": analyzer.print_first_error(report, list(analyzer.flow_definitions)),
+        "completed_flows": analyzer.completed_flows,
+        "progress": {name: len(flow["progress"]) for name, flow in analyzer.active_flows.items()},
+    }, default=str))
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+测试用9005日志生成
+字段顺序与现网日志相同（制表符分隔）：序号、保留、时间、时间、UE、方向、协议、保留、消息、小区、保留、消息字段，
+时间格式为 "09:00:00.389, 2025-04-07"
+"""
+import random
+
+# 注册、PDU会话建立与IMS注册全过程的消息：(方向, 协议, 消息)
+MESSAGES = [
+    ("u", "nas", "Registration request"),
+    ("d", "nrrrc", "systemInformationBlockType1"),
+    ("u", "nrrrc", "rrcSetupRequest"),
+    ("d", "nrrrc", "rrcSetup"),
+    ("u", "nrrrc", "rrcSetupComplete"),
+    ("d", "nas", "Authentication request"),
+    ("u", "nas", "Authentication response"),
+    ("d", "nrrrc", "dlInformationTransfer Authentication request"),
+    ("u", "nrrrc", "ulInformationTransfer Authentication response"),
+    ("d", "nas", "Security mode command"),
+    ("u", "nas", "Security mode complete"),
+    ("d", "nrrrc", "ueCapabilityEnquiry"),
+    ("u", "nrrrc", "ueCapabilityInformation"),
+    ("d", "nrrrc", "securityModeCommand"),
+    ("u", "nrrrc", "securityModeComplete"),
+    ("d", "nrrrc", "rrcReconfiguration"),
+    ("u", "nrrrc", "rrcReconfigurationComplete"),
+    ("d", "nas", "Registration accept"),
+    ("u", "nas", "Registration complete"),
+    ("u", "nas", "PDU session establishment request"),
+    ("u", "nas", "UL NAS transport"),
+    ("d", "nrrrc", "rrcReconfiguration"),
+    ("u", "nrrrc", "rrcReconfigurationComplete"),
+    ("d", "nas", "DL NAS transport"),
+    ("d", "nas", "PDU session establishment accept"),
+    ("u", "sip", "REGISTER"),
+    ("d", "sip", "200 [REGISTER]"),
+    ("u", "sip", "SUBSCRIBE"),
+    ("d", "sip", "200 [SUBSCRIBE]"),
+    ("d", "sip", "NOTIFY"),
+    ("u", "sip", "200 [NOTIFY]"),
+]
+
+# 日志起始时间 09:00:00.000（毫秒）
+START_MS = 9 * 3600 * 1000
+
+
+def log_line(seq, t_ms, direction, protocol, message, ue=0):
+    """生成一行日志"""
+    h, rem = divmod(t_ms, 3600000)
+    m, rem = divmod(rem, 60000)
+    s, ms = divmod(rem, 1000)
+    ts = f"{h % 24:02d}:{m:02d}:{s:02d}.{ms:03d}, 2025-04-07"
+    return "\t".join([str(seq), "0", ts, ts, f"ue{ue}", direction.upper(), protocol, "x", message,
+                      f"cell {ue} extra", "f10", message.replace(' ', '_')]) + "\n"
+
+
+def write_log(path, messages, gap_ms=100, ue=0):
+    """按固定间隔写出消息序列，返回文件路径"""
+    t = START_MS
+    with open(path, 'w', encoding='utf-8') as f:
+        for seq, (direction, protocol, message) in enumerate(messages, 1):
+            t += gap_ms
+            f.write(log_line(seq, t, direction, protocol, message, ue))
+    return str(path)
+
+
+def random_log(path, seed, ues=3, max_gap_ms=3000):
+    """
+    按种子生成随机日志：大致按流程顺序、带缺失/重复/乱序消息、方向大小写混用，
+    消息随机分布在 ues 个UE上，返回文件路径
+    """
+    rnd = random.Random(seed)
+    sequence = []
+    for _ in range(rnd.randint(5, 80)):
+        if rnd.random() < 0.7:
+            sequence.append(MESSAGES[min(len(MESSAGES) - 1, int(rnd.random() * len(MESSAGES)))])
+        else:
+            sequence.append(rnd.choice(MESSAGES))
+    if rnd.random() < 0.5:
+        sequence = [m for m in MESSAGES if rnd.random() < 0.9] + sequence[:rnd.randint(0, 5)]
+
+    t = START_MS
+    with open(path, 'w', encoding='utf-8') as f:
+        for seq, (direction, protocol, message) in enumerate(sequence, 1):
+            t += rnd.randint(1, max_gap_ms)
+            if rnd.random() < 0.1:
+                direction = direction.upper()
+            f.write(log_line(seq, t, direction, protocol, message, rnd.randint(0, ues - 1)))
+    return str(path)
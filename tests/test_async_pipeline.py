@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""诊断流水线：知识图谱查询缓存由多个I/O线程共用"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from async_pipeline import FaultKnowledgeGraph
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def run(self, query, parameters):
+        with self._lock:
+            self.calls.append(parameters["name"])
+        return [{"reason": f"{parameters['name']}原因", "solutions": ["重启"]}]
+
+
+def test_lookup_from_many_threads():
+    client = FakeClient()
+    graph = FaultKnowledgeGraph(client)
+    fault_types = [f"故障{i % 5}" for i in range(200)]
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(graph.lookup, fault_types))
+    for fault_type, result in zip(fault_types, results):
+        # 同一故障类型的所有调用得到同一份缓存结果
+        assert result is graph.lookup(fault_type)
+        assert result[0]["reason"] == f"{fault_type}原因"
+    assert sorted(set(client.calls)) == [f"故障{i}" for i in range(5)]
+
+    calls = len(client.calls)
+    graph.lookup("故障0")
+    assert len(client.calls) == calls
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""常驻诊断服务：工作线程提交的向量诊断在模型线程中执行（sqlite向量缓存只能在创建它的线程中使用）"""
+import json
+import os
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import log_factory
+import text2vec_v1
+from fake_model import FakeVectorEngine
+from diagnosis_service import DiagnosisService, DiagnosisRequestHandler
+
+
+@pytest.fixture
+def fault_logs(tmp_path, monkeypatch):
+    """两种故障日志及对应的故障库，服务加载的向量模型与故障库替换为临时目录中的实现"""
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    database_path = str(tmp_path / "database.csv")
+    store_path = str(tmp_path / "vector_store")
+
+    class Engine(FakeVectorEngine):
+        def __init__(self):
+            super().__init__(model_dir)
+
+    class Database(text2vec_v1.FaultDatabase):
+        def __init__(self):
+            super().__init__(database_path, store_path)
+
+    monkeypatch.setattr(text2vec_v1.Config, "SHOW_ERROR_DIALOGS", False)
+    monkeypatch.setattr(text2vec_v1, "VectorEngine", Engine)
+    monkeypatch.setattr(text2vec_v1, "FaultDatabase", Database)
+
+    logs = {
+        "鉴权失败": log_factory.write_log(tmp_path / "auth.txt", log_factory.MESSAGES[:7]),
+        "IMS注册失败": log_factory.write_log(tmp_path / "ims.txt", log_factory.MESSAGES[:27]),
+    }
+    engine = Engine()
+    database = Database()
+    processor = text2vec_v1.LogProcessor()
+    for fault_type, path in logs.items():
+        text = processor.clean_log_file(path, engine.text_token_limit())
+        assert database.add_fault_record(engine.embed_text(text), fault_type)
+    engine.cache.close()
+    return logs
+
+
+@pytest.fixture
+def service(fault_logs):
+    service = DiagnosisService(workers=3, use_vectors=True)
+    service.start()
+    yield service
+    service.stop()
+
+
+def test_vector_diagnosis_from_worker_threads(service, fault_logs):
+    futures = [(fault_type, service.submit(path)) for _ in range(4) for fault_type, path in fault_logs.items()]
+    for fault_type, future in futures:
+        result = future.result(timeout=30)
+        assert result["vector"]["success"], result["vector"]
+        assert result["vector"]["fault_type"] == fault_type
+        assert result["flow"]
+    assert service.stats()["requests"] == {"accepted": 8, "rejected": 0, "failed": 0}
+    # 模型只在模型线程中加载一次，重复的日志命中向量缓存
+    assert service.vector_engine.loads == 1
+    cache_stats = service.model_executor.submit(service.vector_engine.cache_stats).result()
+    assert cache_stats["hits"] >= 6
+
+
+def test_http_diagnose(service, fault_logs):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DiagnosisRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/diagnose"
+    try:
+        path = fault_logs["鉴权失败"]
+        request = urllib.request.Request(url, json.dumps({"path": path}).encode('utf-8'),
+                                         {"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            assert json.load(response)["vector"]["fault_type"] == "鉴权失败"
+
+        # 直接上传日志文本，诊断后删除临时文件
+        with open(fault_logs["IMS注册失败"], 'rb') as f:
+            request = urllib.request.Request(url, f.read(), {"Content-Type": "text/plain"})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            result = json.load(response)
+        assert result["vector"]["fault_type"] == "IMS注册失败"
+        assert not os.path.exists(result["file"])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_missing_model_keeps_service_running(tmp_path, monkeypatch):
+    """向量模型不存在时服务照常启动，流程诊断正常返回，向量诊断返回错误"""
+    missing = str(tmp_path / "missing")
+
+    class Engine(text2vec_v1.VectorEngine):
+        def __init__(self):
+            super().__init__(missing, cache_path=None)
+
+    class Database(text2vec_v1.FaultDatabase):
+        def __init__(self):
+            super().__init__(str(tmp_path / "database.csv"), str(tmp_path / "vector_store"))
+
+    monkeypatch.setattr(text2vec_v1.Config, "SHOW_ERROR_DIALOGS", False)
+    monkeypatch.setattr(text2vec_v1, "VectorEngine", Engine)
+    monkeypatch.setattr(text2vec_v1, "FaultDatabase", Database)
+    service = DiagnosisService(workers=2, use_vectors=True)
+    service.start()
+    try:
+        path = log_factory.write_log(tmp_path / "auth.txt", log_factory.MESSAGES[:7])
+        result = service.submit(path).result(timeout=30)
+        assert result["flow"]
+        assert not result["vector"]["success"]
+        assert "模型加载失败" in result["vector"]["error"]
+        assert service.stats()["requests"]["failed"] == 0
+    finally:
+        service.stop()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""向量缓存：读写一致、按条目数与总大小的LRU淘汰、条目统计随写入与淘汰保持正确"""
+import sqlite3
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+DIM = 8
+
+
+def vector(i, dim=DIM):
+    return np.full(dim, i, dtype=np.float32)
+
+
+def assert_stats_match_table(cache):
+    entries, total = cache._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+    assert len(cache) == entries
+    assert cache._conn.execute("SELECT bytes FROM cache_stats").fetchone()[0] == total
+
+
+def test_round_trip(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    cache.put_many({"a": vector(1), "b": vector(2)})
+    found = cache.get_many(["a", "b", "c"])
+    np.testing.assert_array_equal(found["a"], vector(1))
+    np.testing.assert_array_equal(found["b"], vector(2))
+    assert "c" not in found
+    assert cache.stats() == {"hits": 2, "misses": 1, "hit_rate": 2 / 3, "entries": 2}
+
+    # 替换已有的键不重复计数
+    cache.put("a", vector(3, dim=2 * DIM))
+    np.testing.assert_array_equal(cache.get("a"), vector(3, dim=2 * DIM))
+    assert len(cache) == 2
+    assert_stats_match_table(cache)
+    cache.close()
+
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    assert len(cache) == 2
+    cache.clear()
+    assert len(cache) == 0
+    assert_stats_match_table(cache)
+    cache.close()
+
+
+def test_evicts_least_recently_used_by_entries(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_bytes=None, max_entries=3)
+    for i, key in enumerate("abc"):
+        cache.put(key, vector(i))
+        # 保证 last_used 严格递增
+        cache._conn.execute("UPDATE embeddings SET last_used = ? WHERE key = ?", (i, key))
+        cache._conn.commit()
+    cache.get("a")
+    cache.put_many({"d": vector(3), "e": vector(4)})
+    assert sorted(cache.get_many("abcde")) == ["a", "d", "e"]
+    assert_stats_match_table(cache)
+    cache.close()
+
+
+def test_evicts_by_total_bytes(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_bytes=10 * DIM * 4)
+    for i in range(25):
+        cache.put(str(i), vector(i))
+        assert len(cache) == min(i + 1, 10)
+    assert sorted(cache.get_many(str(i) for i in range(25)), key=int) == [str(i) for i in range(15, 25)]
+
+    # 大小不一的向量：淘汰到总大小不超过上限为止
+    cache.put("big", vector(0, dim=5 * DIM))
+    assert_stats_match_table(cache)
+    assert cache._conn.execute("SELECT bytes FROM cache_stats").fetchone()[0] <= 10 * DIM * 4
+    assert cache.get("big") is not None
+    cache.close()
+
+
+def test_counts_existing_cache_without_stats(tmp_path):
+    """旧版本没有统计表的缓存文件，打开时统计一次"""
+    path = str(tmp_path / "cache.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE embeddings ("
+                 "key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)")
+    conn.executemany("INSERT INTO embeddings VALUES (?, ?, ?, ?)",
+                     [(str(i), DIM, vector(i).tobytes(), i) for i in range(4)])
+    conn.commit()
+    conn.close()
+
+    cache = EmbeddingCache(path, max_entries=3)
+    assert len(cache) == 4
+    cache.put("new", vector(9))
+    assert sorted(cache.get_many(["0", "1", "2", "3", "new"])) == ["2", "3", "new"]
+    assert_stats_match_table(cache)
+    cache.close()
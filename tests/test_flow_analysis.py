@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""流式解析、按(协议, 方向)分派、预编译步骤与位集前置条件：分析结果与原实现一致"""
+import io
+import contextlib
+
+import pytest
+
+from flow_baseline import BASELINE, SCENARIOS, outcome
+from logany import ProtocolAnalyzer
+
+
+@pytest.fixture(params=sorted(SCENARIOS))
+def scenario(request, tmp_path):
+    name = request.param
+    return name, SCENARIOS[name](tmp_path / f"{name}.txt")
+
+
+def test_list_mode_matches_baseline(scenario):
+    name, path = scenario
+    analyzer = ProtocolAnalyzer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyzer.analyze_flow_completeness(analyzer.parse_log(path))
+    assert outcome(analyzer) == BASELINE[name]
+
+
+def test_stream_mode_matches_baseline(scenario):
+    name, path = scenario
+    analyzer = ProtocolAnalyzer()
+    assert analyzer.analyze_log_stream(path) == len(analyzer.parse_log(path))
+    assert outcome(analyzer) == BASELINE[name]
+
+
+def test_analyzer_reuse_after_reset(tmp_path):
+    """reset 后复用同一个分析器，结果与新建分析器相同"""
+    analyzer = ProtocolAnalyzer()
+    for name in ("complete", "missing_security_mode", "random_3"):
+        analyzer.reset()
+        analyzer.analyze_log_stream(SCENARIOS[name](tmp_path / f"{name}.txt"))
+        assert outcome(analyzer) == BASELINE[name]
+
+
+def test_contains_in_order():
+    analyzer = ProtocolAnalyzer()
+    assert analyzer.contains_in_order("dlinformationtransfer authentication request", "authentication request")
+    assert analyzer.contains_in_order("200 [register]", "200 [REGISTER]".lower())
+    assert not analyzer.contains_in_order("request authentication", "authentication request")
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""时延预算：默认不启用；启用后步骤或流程超出预算诊断为 timeout，日志在预算内结束诊断为 pending"""
+import io
+import json
+import contextlib
+
+import pytest
+
+import log_factory
+from logany import ProtocolAnalyzer, DEFAULT_LATENCY_BUDGETS
+from log2err_v1 import FaultDiagnosisSystem
+from session_demux import SessionFlowAnalyzer
+
+# 会话字段：第5列为UE
+SESSION_FIELD = 4
+
+
+def analyze(path, latency_budgets=DEFAULT_LATENCY_BUDGETS, stream=True):
+    analyzer = ProtocolAnalyzer(latency_budgets)
+    if stream:
+        analyzer.analyze_log_stream(path)
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):
+            analyzer.analyze_flow_completeness(analyzer.parse_log(path))
+    report = analyzer.generate_analysis_report()
+    return analyzer.print_first_error(report, list(analyzer.flow_definitions)), report
+
+
+def normalize(value):
+    return json.loads(json.dumps(value, default=str, sort_keys=True))
+
+
+@pytest.mark.parametrize("stream", [True, False])
+def test_step_budget_exceeded(stream, tmp_path):
+    """rrcSetup 的预算为2秒（T300），间隔3秒时判为超时"""
+    path = log_factory.write_log(tmp_path / "slow.txt", log_factory.MESSAGES, gap_ms=3000)
+    first_error, report = analyze(path, stream=stream)
+    assert first_error["status"] == "timeout"
+    assert first_error["blocking_flow"] == "RRC Connection Setup"
+    assert first_error["status_details"]["step"] == "rrcSetup"
+    assert first_error["status_details"]["elapsed_ms"] == 3000.0
+    assert report["timeout_flows"][0]["budget_ms"] == 2000.0
+
+
+@pytest.mark.parametrize("stream", [True, False])
+def test_log_ends_within_budget(stream, tmp_path):
+    """日志在预算内结束时流程仍在等待，不算超时"""
+    path = log_factory.write_log(tmp_path / "pending.txt", log_factory.MESSAGES[:3])
+    first_error, report = analyze(path, stream=stream)
+    assert first_error["status"] == "pending"
+    assert first_error["blocking_flow"] == "RRC Connection Setup"
+    assert report["timeout_flows"] == []
+
+
+def test_complete_within_budget(tmp_path):
+    path = log_factory.write_log(tmp_path / "ok.txt", log_factory.MESSAGES)
+    first_error, report = analyze(path)
+    assert first_error["status"] == "all_flows_completed"
+    assert report["timeout_flows"] == []
+
+
+def test_budgets_disabled_by_default(tmp_path):
+    """不启用预算时诊断结果与没有预算时相同"""
+    slow = log_factory.write_log(tmp_path / "slow.txt", log_factory.MESSAGES, gap_ms=3000)
+    assert analyze(slow, None)[0]["status"] == "all_flows_completed"
+    pending = log_factory.write_log(tmp_path / "pending.txt", log_factory.MESSAGES[:3])
+    first_error, report = analyze(pending, None)
+    assert first_error["status"] == "in_progress"
+    assert report["timeout_flows"] == []
+    assert "within_budget" not in report["in_progress_flows"][0]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert FaultDiagnosisSystem().analyze_log_file(slow)["diagnosis"]["fault_type"] == "正常"
+        budgeted = FaultDiagnosisSystem(latency_budgets=DEFAULT_LATENCY_BUDGETS).analyze_log_file(slow)
+    assert budgeted["diagnosis"]["status"] == "timeout"
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_single_session_demux_matches_analyzer(seed, tmp_path):
+    """只有一个UE时按会话拆分的超时与预算判断与整体分析相同"""
+    path = log_factory.random_log(tmp_path / "single.txt", seed, ues=1, max_gap_ms=8000)
+    first_error, report = analyze(path)
+
+    demux = SessionFlowAnalyzer(SESSION_FIELD, ProtocolAnalyzer(DEFAULT_LATENCY_BUDGETS))
+    demux.analyze_log_stream(path)
+    (session,) = demux.sessions
+    session_error, session_report = demux.diagnose_session(session)
+
+    assert normalize(session_error) == normalize(first_error)
+    assert normalize(session_report["timeout_flows"]) == normalize(report["timeout_flows"])
+    assert [(flow["flow_name"], flow.get("within_budget")) for flow in session_report["in_progress_flows"]] \
+        == [(flow["flow_name"], flow.get("within_budget")) for flow in report["in_progress_flows"]]
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""实时跟踪：按块追加的日志只处理完整的行，产出的完成事件与整体分析一致"""
+import pytest
+
+from flow_baseline import BASELINE, SCENARIOS
+from live_tail import LogTailer, LiveFlowTracker, follow
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("name", sorted(SCENARIOS))
+def test_completed_events_match_baseline(name, tmp_path):
+    path = SCENARIOS[name](tmp_path / f"{name}.txt")
+    tracker = LiveFlowTracker()
+    completed = []
+    with open(path, encoding="utf-8") as f:
+        for line_num, line in enumerate(f, 1):
+            completed += [event["flow"] for event in tracker.feed_line(line, line_num)
+                          if event["event"] == "flow_completed"]
+    assert completed == BASELINE[name]["completed_flows"]
+
+
+def test_tailer_returns_complete_lines(tmp_path):
+    """在行中间切分写入，每次只返回已写完的行；文件被截断时从头读取"""
+    path = SCENARIOS["complete"](tmp_path / "source.txt")
+    with open(path, 'rb') as f:
+        data = f.read()
+    target = tmp_path / "live.txt"
+    target.write_bytes(b"")
+    tailer = LogTailer(str(target))
+
+    lines = []
+    with open(target, 'ab') as f:
+        for start in range(0, len(data), 97):
+            f.write(data[start:start + 97])
+            f.flush()
+            new_lines, reset = tailer.read_new_lines()
+            assert not reset
+            lines += new_lines
+    assert [line for _, line in lines] == data.decode('utf-8').splitlines()
+    assert [line_num for line_num, _ in lines] == list(range(1, len(lines) + 1))
+
+    target.write_bytes(data[:200])
+    new_lines, reset = tailer.read_new_lines()
+    assert reset
+    assert new_lines[0][0] == 1
+
+
+def test_follow_exits_when_all_flows_complete(tmp_path):
+    path = SCENARIOS["complete"](tmp_path / "complete.txt")
+    events = list(follow(path, exit_on_complete=True))
+    completed = [event["flow"] for event in events if event["event"] == "flow_completed"]
+    assert completed == BASELINE["complete"]["completed_flows"]
+
+
+def test_stalled_flow_reported_once(tmp_path):
+    path = SCENARIOS["stuck_before_sip"](tmp_path / "stuck.txt")
+    clock = FakeClock()
+    tracker = LiveFlowTracker(stall_timeout=5.0, clock=clock)
+    with open(path, encoding="utf-8") as f:
+        for line_num, line in enumerate(f, 1):
+            tracker.feed_line(line, line_num)
+    assert tracker.check_stalls() == []
+    clock.now = 6.0
+    stalled = tracker.check_stalls()
+    assert [(event["flow"], event["waiting_for"]) for event in stalled] == [("SIP Registration", "200 [REGISTER]")]
+    assert tracker.check_stalls() == []
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+流式清洗与原实现的一致性
+reference_text_deal / reference_clean_log_text 为原 text2vec.text_deal 与 LogProcessor.clean_log_text 的清洗逻辑
+"""
+import random
+
+import pytest
+
+import log_factory
+from log_cleaner import iter_clean_tokens, collect_text
+
+
+def reference_text_deal(text):
+    out = []
+    for i in range(len(text) - 1):
+        text1 = text[i].split()
+        if text1[-1] != 'systemInformationBlockType':
+            out.append(text1)
+    out.append(text[-1].split())
+    outtext = []
+    for i in range(len(out) - 1):
+        text1 = out[i]
+        text2 = out[i + 1]
+        if text1[-1] != text2[-1]:
+            outtext += text1[10:]
+    outtext += out[-1][10:]
+    return ' '.join(outtext)
+
+
+def reference_clean_log_text(text_lines):
+    filtered_lines = []
+    for i in range(len(text_lines) - 1):
+        line1_parts = text_lines[i].split()
+        if line1_parts and line1_parts[-1] != 'systemInformationBlockType':
+            filtered_lines.append(line1_parts)
+    if text_lines:
+        filtered_lines.append(text_lines[-1].split())
+    processed_text = []
+    for i in range(len(filtered_lines) - 1):
+        line1 = filtered_lines[i]
+        line2 = filtered_lines[i + 1]
+        if line1 and line2 and len(line1) > 10 and len(line2) > 10:
+            if line1[-1] != line2[-1]:
+                processed_text.extend(line1[10:])
+    if filtered_lines and len(filtered_lines[-1]) > 10:
+        processed_text.extend(filtered_lines[-1][10:])
+    return ' '.join(processed_text)
+
+
+def run(function, lines):
+    """返回清洗结果，出错时返回异常类型"""
+    try:
+        return function(lines)
+    except (IndexError, ValueError):
+        return "error"
+
+
+def random_lines(rnd):
+    words = ["a", "b", "systemInformationBlockType", "x", "y"]
+    lines = []
+    for _ in range(rnd.randint(1, 12)):
+        count = rnd.choice([0, 3, 10, 11, 12, 13])
+        lines.append(" ".join(rnd.choice([f"f{rnd.randint(0, 3)}"] + words) for _ in range(count)) + "\n")
+    return lines
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_generated_logs(seed, tmp_path):
+    path = log_factory.random_log(tmp_path / "log.txt", seed)
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    assert ' '.join(iter_clean_tokens(lines)) == reference_clean_log_text(lines)
+    assert ' '.join(iter_clean_tokens(lines, check_fields=False)) == reference_text_deal(lines)
+    # 直接传入文件对象时边读边清洗
+    with open(path, encoding="utf-8") as f:
+        assert ' '.join(iter_clean_tokens(f)) == reference_clean_log_text(lines)
+
+
+def test_random_lines():
+    rnd = random.Random(0)
+    for _ in range(3000):
+        lines = random_lines(rnd)
+        assert run(lambda l: ' '.join(iter_clean_tokens(l)), lines) == run(reference_clean_log_text, lines), lines
+        assert run(lambda l: ' '.join(iter_clean_tokens(l, check_fields=False)), lines) \
+            == run(reference_text_deal, lines), lines
+
+
+@pytest.mark.parametrize("lines", [
+    ["f0 " * 12 + "a\n", "\n", "f1 " * 12 + "b\n"],
+    ["f0 " * 12 + "a\n", "\n"],
+])
+def test_text_deal_blank_line_error(lines):
+    """与 text_deal 一样，空行报错而不是跳过"""
+    assert run(reference_text_deal, lines) == "error"
+    with pytest.raises(ValueError):
+        list(iter_clean_tokens(lines, check_fields=False))
+    # clean_log_text 跳过空行
+    assert ' '.join(iter_clean_tokens(lines)) == reference_clean_log_text(lines)
+
+
+def test_collect_text_stops_at_limit():
+    consumed = []
+
+    def tokens():
+        for idx in range(100):
+            consumed.append(idx)
+            yield str(idx)
+
+    assert collect_text(tokens(), 5) == "0 1 2 3 4"
+    assert len(consumed) == 5
+    assert collect_text(iter(["a", "b"])) == "a b"
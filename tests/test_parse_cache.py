@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""解析缓存：读写一致、按内容失效、损坏时回退解析、多线程同时建立"""
+import os
+import threading
+
+import pytest
+
+import log_factory
+import parse_cache
+from flow_baseline import BASELINE, SCENARIOS, outcome
+from logany import ProtocolAnalyzer
+from parse_cache import CachedLog, ParsedLogCache
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    return log_factory.random_log(tmp_path / "log.txt", seed=7)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ParsedLogCache(str(tmp_path / "cache"))
+
+
+def test_round_trip(log_file, cache):
+    analyzer = ProtocolAnalyzer()
+    for timestamp_us in (False, True):
+        expected = list(analyzer.iter_log(log_file, timestamp_us))
+        with cache.open(analyzer, log_file) as cached:
+            assert len(cached) == len(expected)
+            assert list(cached.iter_entries(timestamp_us)) == expected
+    assert cache.load(log_file) is not None
+
+
+@pytest.mark.parametrize("name", ["complete", "missing_security_mode", "random_0", "random_5", "random_11"])
+def test_cached_analysis_matches_baseline(name, tmp_path, cache):
+    path = SCENARIOS[name](tmp_path / f"{name}.txt")
+    analyzer = ProtocolAnalyzer()
+    # 第一次建立缓存，第二次命中缓存
+    for _ in range(2):
+        analyzer.reset()
+        with cache.open(analyzer, path) as cached:
+            analyzer.analyze_entries(cached.iter_entries())
+        assert outcome(analyzer) == BASELINE[name]
+    assert len(os.listdir(cache.cache_dir)) == 1
+
+
+def test_invalidated_by_content(log_file, cache):
+    path = cache.cache_path(log_file)
+    with open(log_file, 'a', encoding='utf-8') as f:
+        f.write(log_factory.log_line(999, log_factory.START_MS, "u", "nas", "Registration request"))
+    assert cache.cache_path(log_file) != path
+
+
+def test_truncated_file_falls_back(log_file, cache):
+    """缓存文件被截断时不命中，重新解析并覆盖"""
+    analyzer = ProtocolAnalyzer()
+    cache.open(analyzer, log_file).close()
+    path = cache.cache_path(log_file)
+    with open(path, 'rb') as f:
+        data = f.read()
+    expected = list(analyzer.iter_log(log_file))
+
+    for size in (0, 10, 40, 100, len(data) // 2, len(data) - 1):
+        with open(path, 'wb') as f:
+            f.write(data[:size])
+        assert cache.load(log_file) is None
+        with cache.open(analyzer, log_file) as cached:
+            assert list(cached.iter_entries()) == expected
+
+
+@pytest.mark.parametrize("damage", ["empty", "strings"])
+def test_failed_open_releases_file(damage, log_file, cache, monkeypatch):
+    """打开失败时关闭文件与内存映射（空文件无法映射、字符串表损坏）"""
+    cache.open(ProtocolAnalyzer(), log_file).close()
+    path = cache.cache_path(log_file)
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(b"" if damage == "empty" else data[:-1] + b"\xff")
+
+    opened = []
+
+    def tracking_open(*args, **kwargs):
+        f = open(*args, **kwargs)
+        opened.append(f)
+        return f
+
+    monkeypatch.setattr(parse_cache, "open", tracking_open, raising=False)
+    with pytest.raises(ValueError):
+        CachedLog(path)
+    assert cache.load(log_file) is None
+    assert opened and all(f.closed for f in opened)
+
+
+def test_concurrent_builds(log_file, cache):
+    """同一进程的多个线程同时建立同一个缓存，临时文件互不覆盖"""
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def build():
+        analyzer = ProtocolAnalyzer()
+        barrier.wait()
+        try:
+            for _ in range(5):
+                cache.build(analyzer, log_file).close()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=build) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(cache.cache_dir) == [os.path.basename(cache.cache_path(log_file))]
+    with cache.load(log_file) as cached:
+        assert list(cached.iter_entries()) == list(ProtocolAnalyzer().iter_log(log_file))
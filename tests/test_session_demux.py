@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""多UE会话拆分：每个会话的诊断与单独分析该UE的日志相同"""
+import json
+
+import pytest
+
+import log_factory
+from logany import ProtocolAnalyzer
+from session_demux import SessionFlowAnalyzer
+
+# 会话字段：第5列为UE
+SESSION_FIELD = 4
+
+
+def diagnose(path):
+    analyzer = ProtocolAnalyzer()
+    analyzer.analyze_log_stream(path)
+    report = analyzer.generate_analysis_report()
+    return analyzer.print_first_error(report, list(analyzer.flow_definitions)), report
+
+
+def summary(first_error, report):
+    """诊断结果与各流程进度（会话的紧凑状态不保留中间步骤的时间戳，时间戳为整数微秒）"""
+    return json.loads(json.dumps({
+        "first_error": first_error,
+        "summary": report["summary"],
+        "completed": [flow["flow_name"] for flow in report["completed_flows"]],
+        "in_progress": [(flow["flow_name"], flow["completed_steps"],
+                         ProtocolAnalyzer.format_time(flow["last_step_time"]))
+                        for flow in report["in_progress_flows"]],
+        "problematic": [flow["flow_name"] for flow in report["problematic_flows"]],
+    }, default=str))
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_sessions_match_per_ue_logs(seed, tmp_path):
+    path = log_factory.random_log(tmp_path / "multi.txt", seed, ues=3)
+    demux = SessionFlowAnalyzer(SESSION_FIELD)
+    demux.analyze_log_stream(path)
+
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    for session, first_error, report in demux.iter_diagnoses():
+        single_path = tmp_path / f"{session}.txt"
+        single_path.write_text("".join(line for line in lines if line.split("\t")[SESSION_FIELD] == session),
+                               encoding="utf-8")
+        assert summary(first_error, report) == summary(*diagnose(single_path)), session
+    assert set(demux.sessions) == {line.split("\t")[SESSION_FIELD] for line in lines}
+
+
+def test_interleaved_sessions(tmp_path):
+    """两个UE的完整流程交织写入，一个UE在鉴权后中断"""
+    path = tmp_path / "interleaved.txt"
+    t = log_factory.START_MS
+    with open(path, 'w', encoding='utf-8') as f:
+        for seq, message in enumerate(log_factory.MESSAGES):
+            for ue in (0, 1):
+                if ue == 1 and seq > 6:
+                    continue
+                t += 10
+                f.write(log_factory.log_line(2 * seq + ue + 1, t, *message, ue=ue))
+
+    demux = SessionFlowAnalyzer(SESSION_FIELD)
+    demux.analyze_log_stream(str(path))
+    results = {session: first_error for session, first_error, _ in demux.iter_diagnoses()}
+    assert results["ue0"]["status"] == "all_flows_completed"
+    assert results["ue1"]["status"] == "problematic"
+    assert results["ue1"]["blocking_flow"] == "RRC Authentication"
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""向量化引擎：缓存命中与空输入都不加载模型，模型加载失败时抛出异常而不退出进程"""
+import numpy as np
+import pytest
+
+import text2vec_v1
+from fake_model import FakeVectorEngine
+
+
+def test_cache_hit_skips_model(tmp_path):
+    texts = ["registration request rrcSetup", "pdu session accept", "registration request rrcSetup"]
+    engine = FakeVectorEngine(tmp_path)
+    first = engine.encode_batch(texts)
+    assert engine.loads == 1
+    assert engine.model.encoded == 2  # 重复文本只编码一次
+    np.testing.assert_array_equal(first[0], first[2])
+    engine.cache.close()
+
+    # 新引擎命中缓存：不加载模型，结果与第一次相同
+    engine = FakeVectorEngine(tmp_path)
+    np.testing.assert_array_equal(engine.encode_batch(texts), first)
+    np.testing.assert_array_equal(engine.text_to_vector(texts[1]), first[1])
+    assert engine.loads == 0
+    assert engine.cache_stats()["misses"] == 0
+
+    # 只有未命中的文本进入模型
+    engine.encode_batch(texts + ["sip register"])
+    assert engine.loads == 1
+    assert engine.model.encoded == 1
+    engine.cache.close()
+
+
+def test_encode_batch_empty_input_skips_model(tmp_path):
+    engine = FakeVectorEngine(tmp_path, cache=False)
+    assert engine.encode_batch([]).shape == (0, 0)
+    assert engine.loads == 0
+
+
+def test_missing_model_raises_instead_of_exiting(tmp_path, monkeypatch):
+    monkeypatch.setattr(text2vec_v1.Config, "SHOW_ERROR_DIALOGS", False)
+    engine = text2vec_v1.VectorEngine(str(tmp_path / "missing"), cache_path=None)
+    with pytest.raises(RuntimeError, match="模型加载失败"):
+        engine.model
+    # 编码接口照常返回None，由调用方处理
+    assert engine.text_to_vector("registration request") is None
+    assert engine.encode_batch(["registration request"]) is None
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""向量库：读写一致、按已提交记录数修复中断的追加、旧格式转换"""
+import json
+import os
+
+import numpy as np
+
+from vector_store import VectorStore
+
+DIM = 16
+
+
+def normalized(vectors):
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_round_trip(tmp_path):
+    store = VectorStore(str(tmp_path / "store"))
+    assert len(store) == 0 and store.dim is None
+    vectors = np.random.default_rng(0).normal(size=(5, DIM)).astype(np.float32)
+    store.append(vectors[:3], ["a", "b", "a"])
+    store.append(vectors[3:], ["c", "b"])
+    matrix, labels = store.load()
+    assert labels == ["a", "b", "a", "c", "b"]
+    np.testing.assert_allclose(matrix, normalized(vectors), rtol=1e-6)
+    assert len(store) == 5 and store.dim == DIM
+    # 重复的标签只在字符串表中出现一次
+    with open(store.labels_path, encoding='utf-8') as f:
+        assert json.load(f) == ["a", "b", "c"]
+
+    # 另一个实例追加后，原实例看到新的记录数
+    VectorStore(store.store_path).append(vectors[0], ["d"])
+    assert len(store) == 6
+    assert store.load()[1][-1] == "d"
+
+
+def test_repairs_interrupted_append(tmp_path):
+    """上次追加写完部分列数据后中断，meta.json 未提交，读取与下次追加都以已提交的记录数为准"""
+    store = VectorStore(str(tmp_path / "store"))
+    vectors = np.eye(4, DIM, dtype=np.float32)
+    store.append(vectors[:2], ["a", "b"])
+    with open(store.vectors_path, 'ab') as f:
+        vectors[2].tofile(f)
+        vectors[2][:7].tofile(f)
+    with open(store.label_ids_path, 'ab') as f:
+        np.array([5], dtype=np.int32).tofile(f)
+    matrix, labels = store.load()
+    assert labels == ["a", "b"]
+    assert len(matrix) == 2
+
+    store.append(vectors[3], ["d"])
+    matrix, labels = store.load()
+    assert labels == ["a", "b", "d"]
+    np.testing.assert_array_equal(matrix[2], vectors[3])
+    assert os.path.getsize(store.vectors_path) == 3 * DIM * 4
+    assert os.path.getsize(store.label_ids_path) == 3 * 4
+
+
+def test_upgrades_legacy_labels(tmp_path):
+    """旧版本每行一个JSON标签、meta.json 没有记录数，首次打开时转换，末尾的半行标签丢弃"""
+    path = tmp_path / "store"
+    path.mkdir()
+    vectors = normalized(np.random.default_rng(1).normal(size=(3, DIM)).astype(np.float32))
+    vectors.tofile(str(path / "vectors.f32"))
+    (path / "labels.jsonl").write_text('"a"\n"b"\n"a', encoding='utf-8')
+    (path / "meta.json").write_text(json.dumps({"dim": DIM, "dtype": "float32", "normalized": True}),
+                                    encoding='utf-8')
+
+    store = VectorStore(str(path))
+    matrix, labels = store.load()
+    assert labels == ["a", "b"]
+    np.testing.assert_array_equal(matrix, vectors[:2])
+    assert not (path / "labels.jsonl").exists()
+    assert json.loads((path / "meta.json").read_text(encoding='utf-8'))["count"] == 2
+
+    store.append(vectors[2], ["c"])
+    assert VectorStore(str(path)).load()[1] == ["a", "b", "c"]
+
+
+def test_clear(tmp_path):
+    store = VectorStore(str(tmp_path / "store"))
+    store.append(np.ones((2, DIM), dtype=np.float32), ["a", "b"])
+    store.clear()
+    assert not store.exists() and len(store) == 0
+    store.append(np.ones((1, DIM), dtype=np.float32), ["c"])
+    assert store.load()[1] == ["c"]
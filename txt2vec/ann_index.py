@@ -0,0 +1,293 @@
+"""
+故障库近似最近邻索引（IVF-flat，纯NumPy实现）
+用球面k-means把归一化向量划分到 nlist 个倒排表，检索时只扫描与查询最接近的 nprobe 个倒排表：
+    nlist   倒排表数量，越大每个表越短、单次检索越快，但训练越慢
+    nprobe  检索时扫描的倒排表数量，越大召回率越高、延迟越高
+索引保存在向量库目录中，与向量按行号对应：
+    ivf_centroids.npy  聚类中心
+    ivf_assign.i32     每行向量所属的倒排表编号，新增记录只在末尾追加
+
+用法:
+    python ann_index.py build <存储目录> [nlist]
+    python ann_index.py bench <存储目录> [nprobe ...]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from vector_store import VectorStore
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    取相似度最高的前k个下标，按相似度降序排列（相同分数保持原顺序）
+
+    Args:
+        scores: 相似度数组
+        top_k: 返回的个数
+
+    Returns:
+        下标数组
+    """
+    top_k = min(top_k, len(scores))
+    if top_k == 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, top_k - 1)[:top_k]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+class IVFFlatIndex:
+    """倒排表索引，倒排表中只保存行号，向量本身仍从向量库的内存映射矩阵读取"""
+
+    CENTROIDS_FILE = 'ivf_centroids.npy'
+    ASSIGN_FILE = 'ivf_assign.i32'
+
+    # 批量计算归属时每块的行数，限制中间结果的内存占用
+    CHUNK_ROWS = 65536
+
+    def __init__(self, centroids: np.ndarray, assign: np.ndarray, index_path: Optional[str] = None):
+        """
+        Args:
+            centroids: 归一化的聚类中心，形状为 (nlist, dim)
+            assign: 每行向量所属的倒排表编号
+            index_path: 索引目录，设置后新增记录的归属会追加写入磁盘
+        """
+        self.logger = logging.getLogger(__name__)
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.index_path = index_path
+        self.count = 0
+        self.lists = [np.empty(0, dtype=np.int64) for _ in range(len(self.centroids))]
+        self._extend_lists(np.asarray(assign, dtype=np.int32))
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @staticmethod
+    def default_nlist(count: int) -> int:
+        """默认倒排表数量：约为记录数的平方根"""
+        return max(1, int(np.sqrt(count)))
+
+    @classmethod
+    def train(cls, matrix: np.ndarray, nlist: Optional[int] = None, iterations: int = 10,
+              sample_size: Optional[int] = None, seed: int = 0) -> 'IVFFlatIndex':
+        """
+        在归一化向量矩阵上训练聚类中心并建立倒排表
+
+        Args:
+            matrix: 归一化的向量矩阵（可为内存映射）
+            nlist: 倒排表数量，默认为 default_nlist
+            iterations: k-means迭代次数
+            sample_size: 训练采样行数，默认为每个倒排表64行
+            seed: 随机种子
+
+        Returns:
+            建好的索引
+        """
+        count = len(matrix)
+        if count == 0:
+            raise ValueError("故障库为空，无法建立索引")
+        nlist = min(nlist or cls.default_nlist(count), count)
+        sample_size = min(count, sample_size or 64 * nlist)
+
+        rng = np.random.default_rng(seed)
+        sample_ids = np.sort(rng.choice(count, sample_size, replace=False))
+        sample = np.asarray(matrix[sample_ids], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = cls._nearest(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            sizes = np.bincount(labels, minlength=nlist)
+            # 空的聚类重新随机取一个样本作为中心
+            empty = np.flatnonzero(sizes == 0)
+            sums[empty] = sample[rng.choice(sample_size, len(empty))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        index = cls(centroids, np.empty(0, dtype=np.int32))
+        index.add(matrix)
+        return index
+
+    @classmethod
+    def _nearest(cls, vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """分块计算每行向量最接近的聚类中心编号"""
+        result = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), cls.CHUNK_ROWS):
+            chunk = np.asarray(vectors[start:start + cls.CHUNK_ROWS], dtype=np.float32)
+            result[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+        return result
+
+    def _extend_lists(self, assign: np.ndarray) -> None:
+        """把编号从 self.count 开始的一批归属加入倒排表"""
+        if len(assign) == 0:
+            return
+        ids = np.arange(self.count, self.count + len(assign), dtype=np.int64)
+        order = np.argsort(assign, kind='stable')
+        bounds = np.searchsorted(assign[order], np.arange(self.nlist + 1))
+        for list_id in np.flatnonzero(np.diff(bounds)):
+            new_ids = ids[order[bounds[list_id]:bounds[list_id + 1]]]
+            self.lists[list_id] = np.concatenate([self.lists[list_id], new_ids])
+        self.count += len(assign)
+
+    def add(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        增量加入归一化向量，行号依次接在已有记录之后
+
+        Args:
+            vectors: 单个向量或 (n, dim) 矩阵
+
+        Returns:
+            各向量所属的倒排表编号
+        """
+        if np.ndim(vectors) == 1:
+            vectors = np.asarray(vectors, dtype=np.float32).reshape(1, -1)
+        assign = self._nearest(vectors, self.centroids)
+        self._extend_lists(assign)
+        if self.index_path:
+            with open(os.path.join(self.index_path, self.ASSIGN_FILE), 'ab') as f:
+                assign.tofile(f)
+        return assign
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, top_k: int = 3,
+               nprobe: int = 8) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        近似检索
+
+        Args:
+            matrix: 与索引行号对应的归一化向量矩阵
+            query: 归一化的查询向量
+            top_k: 返回的结果数
+            nprobe: 扫描的倒排表数量
+
+        Returns:
+            (行号数组, 相似度数组)，按相似度降序；候选不足时返回的结果少于top_k
+        """
+        query = np.asarray(query, dtype=np.float32).ravel()
+        probe = top_k_indices(self.centroids @ query, nprobe)
+        candidates = np.concatenate([self.lists[list_id] for list_id in probe])
+        if len(candidates) == 0:
+            return candidates, np.empty(0, dtype=np.float32)
+        # 按行号排序后读取，内存映射矩阵上顺序访问更快
+        candidates.sort()
+        scores = np.asarray(matrix[candidates]) @ query
+        top = top_k_indices(scores, top_k)
+        return candidates[top], scores[top]
+
+    def save(self, index_path: str) -> None:
+        """保存索引，之后的增量加入会追加写入该目录"""
+        os.makedirs(index_path, exist_ok=True)
+        assign = np.empty(self.count, dtype=np.int32)
+        for list_id, ids in enumerate(self.lists):
+            assign[ids] = list_id
+        tmp_path = os.path.join(index_path, f"{self.ASSIGN_FILE}.{os.getpid()}.tmp")
+        assign.tofile(tmp_path)
+        np.save(os.path.join(index_path, self.CENTROIDS_FILE), self.centroids)
+        os.replace(tmp_path, os.path.join(index_path, self.ASSIGN_FILE))
+        self.index_path = index_path
+
+    @classmethod
+    def exists(cls, index_path: str) -> bool:
+        return (os.path.exists(os.path.join(index_path, cls.CENTROIDS_FILE))
+                and os.path.exists(os.path.join(index_path, cls.ASSIGN_FILE)))
+
+    @classmethod
+    def load(cls, index_path: str) -> 'IVFFlatIndex':
+        """读取已保存的索引"""
+        centroids = np.load(os.path.join(index_path, cls.CENTROIDS_FILE))
+        assign = np.fromfile(os.path.join(index_path, cls.ASSIGN_FILE), dtype=np.int32)
+        return cls(centroids, assign, index_path)
+
+    @classmethod
+    def open(cls, index_path: str, matrix: np.ndarray) -> Optional['IVFFlatIndex']:
+        """
+        读取索引并与向量库对齐：向量库中有未建索引的新行时补充归属，
+        索引行数多于向量库（例如向量库被重建）时视为失效
+
+        Args:
+            index_path: 索引目录
+            matrix: 向量库矩阵
+
+        Returns:
+            索引，不存在或已失效时返回None
+        """
+        if not cls.exists(index_path):
+            return None
+        index = cls.load(index_path)
+        if index.count > len(matrix) or index.centroids.shape[1] != matrix.shape[1]:
+            index.logger.warning(f"近似检索索引与向量库不一致，需要重建: {index_path}")
+            return None
+        if index.count < len(matrix):
+            index.add(matrix[index.count:])
+        return index
+
+
+def evaluate(matrix: np.ndarray, index: IVFFlatIndex, nprobes: List[int],
+             queries: int = 200, top_k: int = 10, seed: int = 0) -> List[dict]:
+    """
+    以精确检索为基准评估不同 nprobe 下的召回率与延迟
+    查询向量取库中随机记录加少量噪声
+
+    Returns:
+        每个nprobe一项: {"nprobe", "recall", "ann_ms", "exact_ms"}
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.asarray(matrix[np.sort(rng.choice(len(matrix), queries, replace=len(matrix) < queries))])
+    noise = rng.standard_normal(rows.shape).astype(np.float32) * 0.02
+    query_set = rows + noise
+    query_set /= np.linalg.norm(query_set, axis=1, keepdims=True)
+
+    start = time.perf_counter()
+    truth = [set(top_k_indices(matrix @ query, top_k).tolist()) for query in query_set]
+    exact_ms = (time.perf_counter() - start) * 1000 / queries
+
+    results = []
+    for nprobe in nprobes:
+        hits = 0
+        start = time.perf_counter()
+        found = [index.search(matrix, query, top_k, nprobe)[0] for query in query_set]
+        ann_ms = (time.perf_counter() - start) * 1000 / queries
+        for ids, expected in zip(found, truth):
+            hits += len(expected.intersection(ids.tolist()))
+        results.append({"nprobe": nprobe, "recall": hits / (queries * top_k),
+                        "ann_ms": ann_ms, "exact_ms": exact_ms})
+    return results
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if len(sys.argv) < 3 or sys.argv[1] not in ('build', 'bench'):
+        print("用法: python ann_index.py build <存储目录> [nlist]")
+        print("      python ann_index.py bench <存储目录> [nprobe ...]")
+        return
+
+    store = VectorStore(sys.argv[2])
+    matrix, _ = store.load()
+    if sys.argv[1] == 'build':
+        nlist = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        start = time.perf_counter()
+        index = IVFFlatIndex.train(matrix, nlist)
+        index.save(store.store_path)
+        print(f"索引建立完成: {len(matrix)} 条记录, nlist={index.nlist}, 耗时 {time.perf_counter() - start:.1f} 秒")
+        return
+
+    index = IVFFlatIndex.open(store.store_path, matrix)
+    if index is None:
+        print("索引不存在，请先执行 build")
+        return
+    nprobes = [int(arg) for arg in sys.argv[3:]] or [1, 4, 8, 16, 32]
+    print(f"记录数: {len(matrix)}, nlist={index.nlist}")
+    for result in evaluate(matrix, index, nprobes):
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
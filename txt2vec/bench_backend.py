@@ -0,0 +1,147 @@
+"""
+向量化后端对比基准
+对同一组日志分别用各后端（见 Config.EMBEDDING_BACKEND）向量化，以第一个后端为基准报告：
+    吞吐量       不使用向量缓存，预热后重复编码全部文本，取中位耗时
+    向量差异     与基准向量的余弦相似度（平均 / 最小）
+    故障库检索   用各后端的查询向量检索现有故障库（由基准模型生成），第1名故障类型与基准一致的比例、
+                 第1名相似度的平均变化
+    标签准确率   日志按子目录名作为故障类型时，每个日志最相近的其他日志类型相同的比例
+用法: python bench_backend.py <日志目录> [--backends torch onnx onnx-int8] [--repeat 3] [-o 结果.json]
+"""
+
+import sys
+import json
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+import numpy as np
+
+import text2vec_v1
+from text2vec_v1 import Config, LogProcessor, VectorEngine, FaultDatabase
+
+
+def load_texts(directory):
+    """清洗目录中的全部日志，返回 (文本列表, 相对路径列表, 标签列表)，标签为所在子目录名"""
+    processor = LogProcessor()
+    token_limit = VectorEngine(cache_path=None).text_token_limit()
+    texts, names, labels = [], [], []
+    for path in sorted(Path(directory).rglob('*')):
+        if not path.is_file() or path.suffix.lower() not in ('.txt', '.log'):
+            continue
+        text = processor.clean_log_file(str(path), token_limit)
+        if text:
+            relative = path.relative_to(directory)
+            texts.append(text)
+            names.append(str(relative))
+            labels.append(str(relative.parent) if len(relative.parts) > 1 else None)
+    return texts, names, labels
+
+
+def measure_backend(backend, texts, repeat):
+    """返回 (向量矩阵, 模型加载耗时, 每次编码全部文本的耗时列表)"""
+    engine = VectorEngine(cache_path=None, backend=backend)
+    start = time.perf_counter()
+    engine.model
+    engine.encode_batch(texts[:Config.ENCODE_BATCH_SIZE])
+    load_seconds = time.perf_counter() - start
+    timings = []
+    vectors = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        vectors = engine.encode_batch(texts)
+        timings.append(time.perf_counter() - start)
+    return VectorEngine.normalize(vectors), load_seconds, timings
+
+
+def nearest_label_accuracy(vectors, labels):
+    """每个带标签的日志最相近的其他带标签日志类型相同的比例，标签少于2种时返回None"""
+    rows = [idx for idx, label in enumerate(labels) if label is not None]
+    if len(set(labels[idx] for idx in rows)) < 2:
+        return None
+    matrix = vectors[rows]
+    similarity = matrix @ matrix.T
+    np.fill_diagonal(similarity, -np.inf)
+    nearest = similarity.argmax(axis=1)
+    return float(np.mean([labels[rows[i]] == labels[rows[j]] for i, j in enumerate(nearest)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比各向量化后端的吞吐量与精度")
+    parser.add_argument("directory", help="日志目录（递归查找.txt/.log，子目录名作为故障类型）")
+    parser.add_argument("--backends", nargs="+", choices=VectorEngine.BACKENDS,
+                        default=['torch', 'onnx', 'onnx-int8'], help="参与对比的后端，第一个作为基准")
+    parser.add_argument("--repeat", type=int, default=3, help="重复编码次数")
+    parser.add_argument("-o", "--output", help="结果输出为JSON")
+    args = parser.parse_args()
+
+    text2vec_v1.Config.SHOW_ERROR_DIALOGS = False
+    texts, names, labels = load_texts(args.directory)
+    if not texts:
+        print(f"目录中没有可用的日志: {args.directory}")
+        sys.exit(1)
+    print(f"日志数: {len(texts)}，后端: {', '.join(args.backends)}，重复 {args.repeat} 次")
+
+    fault_matrix, fault_types = FaultDatabase().load_fault_matrix()
+    results = {}
+    reference = None
+    reference_top = None
+    for backend in args.backends:
+        vectors, load_seconds, timings = measure_backend(backend, texts, args.repeat)
+        seconds = statistics.median(timings)
+        row = {
+            "load_seconds": round(load_seconds, 3),
+            "encode_seconds": round(seconds, 3),
+            "texts_per_second": round(len(texts) / seconds, 2),
+            "label_accuracy": nearest_label_accuracy(vectors, labels),
+        }
+        if reference is None:
+            reference = vectors
+        else:
+            cosine = np.sum(vectors * reference, axis=1)
+            row["cosine_mean"] = float(cosine.mean())
+            row["cosine_min"] = float(cosine.min())
+            row["cosine_min_file"] = names[int(cosine.argmin())]
+        if fault_types:
+            scores = vectors @ fault_matrix.T
+            top = scores.argmax(axis=1)
+            top_similarity = scores[np.arange(len(top)), top]
+            if reference_top is None:
+                reference_top = (top, top_similarity)
+            else:
+                delta = np.abs(top_similarity - reference_top[1])
+                row["fault_top1_agreement"] = float(np.mean(
+                    [fault_types[a] == fault_types[b] for a, b in zip(top, reference_top[0])]))
+                row["fault_similarity_delta_mean"] = float(delta.mean())
+                row["fault_similarity_delta_max"] = float(delta.max())
+        results[backend] = row
+
+    speed = results[args.backends[0]]["texts_per_second"]
+    print("\n" + "=" * 60)
+    for backend in args.backends:
+        row = results[backend]
+        print(f"[{backend}]")
+        print(f"  模型加载: {row['load_seconds']:.2f}秒  编码: {row['encode_seconds']:.2f}秒  "
+              f"吞吐量: {row['texts_per_second']:.1f} 条/秒 ({row['texts_per_second'] / speed:.2f}x)")
+        if "cosine_mean" in row:
+            print(f"  与基准向量的余弦相似度: 平均 {row['cosine_mean']:.5f}  最小 {row['cosine_min']:.5f} "
+                  f"({row['cosine_min_file']})")
+        if "fault_top1_agreement" in row:
+            print(f"  故障库第1名与基准一致: {row['fault_top1_agreement']:.2%}  第1名相似度变化: "
+                  f"平均 {row['fault_similarity_delta_mean']:.5f}  最大 {row['fault_similarity_delta_max']:.5f}")
+        if row["label_accuracy"] is not None:
+            print(f"  最近邻标签准确率: {row['label_accuracy']:.2%}")
+    if not fault_types:
+        print("故障库为空，跳过故障库检索对比")
+    print("=" * 60)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"texts": len(texts), "reference": args.backends[0], "backends": results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
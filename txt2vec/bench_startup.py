@@ -0,0 +1,69 @@
+"""
+启动耗时基准测试
+在新的Python进程中分别测量各入口模块的导入耗时与进程总耗时（含解释器启动），
+并测量重量级依赖单独导入的耗时作为对照，每项重复多次取中位数
+用法: python bench_startup.py [重复次数]
+"""
+
+import os
+import sys
+import time
+import statistics
+import subprocess
+
+# (名称, 在子进程中执行的语句)
+CASES = [
+    ("import text2vec", "import text2vec"),
+    ("import text2vec_v1", "import text2vec_v1"),
+    ("text2vec_v1 系统信息", "import text2vec_v1; text2vec_v1.show_system_info()"),
+    ("对照: import sentence_transformers", "import sentence_transformers"),
+    ("对照: import sklearn.metrics", "import sklearn.metrics.pairwise"),
+    ("对照: import pandas", "import pandas"),
+]
+
+# 子进程中测量语句耗时并输出到最后一行
+TEMPLATE = (
+    "import time; _start = time.perf_counter()\n"
+    "{statement}\n"
+    "print(); print(time.perf_counter() - _start)"
+)
+
+
+def run_case(statement, repeat):
+    """
+    重复运行一条语句
+
+    Returns:
+        (语句耗时列表, 进程总耗时列表)，语句执行失败时返回None
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    inner, total = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", TEMPLATE.format(statement=statement)],
+                                cwd=here, capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            return None
+        inner.append(float(result.stdout.strip().splitlines()[-1]))
+        total.append(elapsed)
+    return inner, total
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"Python: {sys.executable}，每项重复 {repeat} 次，取中位数")
+    print("-" * 70)
+    print(f"{'项目':<36}{'语句耗时':>14}{'进程总耗时':>14}")
+    for name, statement in CASES:
+        result = run_case(statement, repeat)
+        if result is None:
+            print(f"{name:<36}{'不可用':>14}")
+            continue
+        inner, total = result
+        print(f"{name:<36}{statistics.median(inner) * 1000:>12.0f}ms{statistics.median(total) * 1000:>12.0f}ms")
+    print("-" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+文本向量持久化缓存
+以 hash(清洗后的文本, 模型标识, max_seq_length) 为键，把模型输出的向量保存在本地SQLite文件中，
+同一份日志（例如每次对比使用的正常基线日志）再次分析时无需重新经过模型编码。
+缓存总大小或条目数超过上限时按最近最少使用（LRU）淘汰。
+条目数与向量总字节数保存在 cache_stats 表的一行中，随写入和淘汰在同一事务内更新，
+写入时无需统计全表。
+"""
+
+import os
+import math
+import time
+import sqlite3
+import hashlib
+import logging
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """基于SQLite的向量缓存，带命中/未命中计数"""
+
+    def __init__(self, cache_path: str, max_bytes: Optional[int] = 256 * 1024 * 1024,
+                 max_entries: Optional[int] = None):
+        """
+        Args:
+            cache_path: 缓存数据库文件路径
+            max_bytes: 向量数据总字节数上限，None表示不限制
+            max_entries: 条目数上限，None表示不限制
+        """
+        self.logger = logging.getLogger(__name__)
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        cache_dir = os.path.dirname(os.path.abspath(cache_path))
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(cache_path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_stats ("
+            "id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL, bytes INTEGER NOT NULL)"
+        )
+        # 没有统计行的旧缓存文件统计一次全表
+        if self._conn.execute("SELECT 1 FROM cache_stats WHERE id = 0").fetchone() is None:
+            self._conn.execute(
+                "INSERT INTO cache_stats (id, entries, bytes) "
+                "SELECT 0, COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(text: str, model_id: str, max_seq_length: Optional[int]) -> str:
+        """
+        生成缓存键
+
+        Args:
+            text: 清洗后的文本
+            model_id: 模型标识（模型路径或名称）
+            max_seq_length: 模型的最大序列长度，影响截断结果
+
+        Returns:
+            十六进制哈希字符串
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (model_id, str(max_seq_length), text):
+            data = part.encode('utf-8')
+            # 写入长度前缀，避免不同字段拼接后产生相同的字节序列
+            digest.update(len(data).to_bytes(8, 'little'))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """
+        批量查询，命中的条目刷新最近使用时间
+
+        Args:
+            keys: 缓存键
+
+        Returns:
+            {键: float32向量}，只包含命中的键
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        # 分批查询，避免超出SQLite的参数个数限制
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32).copy()
+        if found:
+            now = time.time()
+            self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                   [(now, key) for key in found])
+            self._conn.commit()
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """查询单个键，未命中返回None"""
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        """
+        批量写入并按上限淘汰
+
+        Args:
+            items: {键: 向量}
+        """
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            vector = np.ascontiguousarray(vector, dtype=np.float32).ravel()
+            rows.append((key, len(vector), vector.tobytes(), now))
+
+        # 立即取得写锁，其他进程不会在读取统计与写回之间修改缓存
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            entries, total = self._conn.execute("SELECT entries, bytes FROM cache_stats WHERE id = 0").fetchone()
+            # 被替换的旧条目不再计入
+            keys = list(items)
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                replaced, replaced_bytes = self._conn.execute(
+                    f"SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings "
+                    f"WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchone()
+                entries -= replaced
+                total -= replaced_bytes
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dim, vector, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            entries += len(rows)
+            total += sum(len(row[2]) for row in rows)
+            entries, total = self._evict(entries, total)
+            self._conn.execute("UPDATE cache_stats SET entries = ?, bytes = ? WHERE id = 0", (entries, total))
+            self._conn.commit()
+        except BaseException:
+            self._conn.rollback()
+            raise
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        """写入单个向量"""
+        self.put_many({key: vector})
+
+    def _evict(self, entries: int, total: int) -> tuple:
+        """
+        超过条目数或总大小上限时，从最久未使用的条目开始删除
+
+        Args:
+            entries: 当前条目数
+            total: 当前向量总字节数
+
+        Returns:
+            淘汰后的 (条目数, 向量总字节数)
+        """
+        removed = 0
+        while entries > 0:
+            excess_entries = entries - self.max_entries if self.max_entries is not None else 0
+            excess_bytes = total - self.max_bytes if self.max_bytes is not None else 0
+            if excess_entries <= 0 and excess_bytes <= 0:
+                break
+            # 按平均条目大小估算需要删除的条数，向量维度不一致时不足的部分下一轮再删
+            count = max(excess_entries, math.ceil(excess_bytes / (total / entries)) if excess_bytes > 0 else 0)
+            oldest = "SELECT key FROM embeddings ORDER BY last_used LIMIT ?"
+            deleted, deleted_bytes = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE key IN ({oldest})", (count,)
+            ).fetchone()
+            self._conn.execute(f"DELETE FROM embeddings WHERE key IN ({oldest})", (count,))
+            entries -= deleted
+            total -= deleted_bytes
+            removed += deleted
+        if removed:
+            self.logger.debug(f"向量缓存淘汰 {removed} 条记录")
+        return entries, total
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT entries FROM cache_stats WHERE id = 0").fetchone()[0]
+
+    def stats(self) -> dict:
+        """命中/未命中统计"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+    def clear(self) -> None:
+        """清空缓存和计数"""
+        self._conn.execute("DELETE FROM embeddings")
+        self._conn.execute("UPDATE cache_stats SET entries = 0, bytes = 0 WHERE id = 0")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,80 @@
+"""
+9005日志文本流式清洗
+逐行读取一次即可产出清洗后的单词，规则与原 text_deal / clean_log_text 相同：
+    1. 去掉最后一个字段为 systemInformationBlockType 的行（最后一行始终保留）
+    2. 相邻保留行最后一个字段相同时只保留后一行，每行取第11个字段之后的内容
+只需暂存上一行原始文本与上一条保留行的字段，内存占用与文件大小无关；
+配合 collect_text 的单词数上限，向量化只需要前若干单词时可以提前结束读取。
+"""
+
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+
+# 需要过滤的系统消息行（最后一个字段）
+SIB_MARKER = 'systemInformationBlockType'
+
+# 每行从第11个字段开始为有效内容
+CONTENT_START = 10
+
+
+def iter_clean_tokens(lines: Iterable[str], check_fields: bool = True) -> Iterator[str]:
+    """
+    单次遍历清洗日志行，逐个产出单词
+
+    Args:
+        lines: 日志行（列表或打开的文件对象）
+        check_fields: 为True时与 LogProcessor.clean_log_text 一致，相邻两行都超过10个字段才比较，空行跳过；
+                      为False时与 text_deal 一致，不检查字段数，遇到空行（最后一行为空且前面有保留行时也一样）
+                      抛出 ValueError，与原实现在同样的位置出错
+
+    Yields:
+        清洗后的单词，依次用空格连接即为原来的清洗结果
+    """
+    pending = None   # 上一行原始文本，读到下一行后才能确定它不是最后一行
+    previous = None  # 上一条保留行的字段
+    for line in lines:
+        if pending is not None:
+            parts = pending.split()
+            if not parts and not check_fields:
+                raise ValueError("日志中存在空行")
+            # 非最后一行：空行与系统消息行直接丢弃
+            if parts and parts[-1] != SIB_MARKER:
+                if previous is not None:
+                    yield from _changed_fields(previous, parts, check_fields)
+                previous = parts
+        pending = line
+
+    if pending is None:
+        return
+    last = pending.split()
+    if not last and not check_fields and previous is not None:
+        raise ValueError("日志中存在空行")
+    if previous is not None:
+        yield from _changed_fields(previous, last, check_fields)
+    if len(last) > CONTENT_START:
+        yield from last[CONTENT_START:]
+
+
+def _changed_fields(current: List[str], following: List[str], check_fields: bool) -> List[str]:
+    """当前行与下一条保留行的最后一个字段不同时返回当前行的有效内容"""
+    if not following:
+        return []
+    if check_fields and (len(current) <= CONTENT_START or len(following) <= CONTENT_START):
+        return []
+    return current[CONTENT_START:] if current[-1] != following[-1] else []
+
+
+def collect_text(tokens: Iterable[str], max_tokens: Optional[int] = None) -> str:
+    """
+    把单词写入有界缓冲区并拼接为文本
+
+    Args:
+        tokens: 单词序列（通常为 iter_clean_tokens 的生成器）
+        max_tokens: 最多保留的单词数，达到后停止消费生成器（即停止读取文件）；None表示不限制
+
+    Returns:
+        空格连接的文本
+    """
+    if max_tokens is not None:
+        tokens = islice(tokens, max_tokens)
+    return ' '.join(tokens)
@@ -0,0 +1,222 @@
+"""
+正常日志画像
+用大量已知正常的日志建立基线，代替与单个正常日志对比加固定阈值的做法：
+    向量矩阵     所有基线日志的归一化向量，保存在 VectorStore 中（标签为来源文件名）
+    统计信息     中心向量、各维均值与标准差，以及每条基线日志留一法的kNN相似度分布
+检测时一次矩阵乘法得到待检测向量与全部基线的相似度：
+    kNN相似度    与最相近的k条基线的平均余弦相似度，低于基线自身分布的低分位数即判为异常
+    马氏距离     按各维标准差标准化后的距离（对角协方差），作为偏离程度的参考
+文件结构:
+    vectors.f32 / label_ids.i32 / labels.json / meta.json   同 vector_store.py
+    profile_stats.npz                                        统计信息
+
+用法:
+    python normal_profile.py build <正常日志目录> [画像目录]
+    python normal_profile.py score <待检测日志...> [--profile 画像目录]
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from typing import Dict, List
+
+import numpy as np
+
+from vector_store import VectorStore
+
+
+class NormalProfile:
+    """由正常日志向量构成的基线画像"""
+
+    STATS_FILE = 'profile_stats.npz'
+
+    # 计算留一法kNN相似度时每块的行数，限制相似度矩阵的内存
+    BLOCK_ROWS = 1024
+
+    def __init__(self, profile_path: str):
+        """
+        Args:
+            profile_path: 画像目录
+        """
+        self.logger = logging.getLogger(__name__)
+        self.profile_path = profile_path
+        self.store = VectorStore(profile_path)
+        self.stats_path = os.path.join(profile_path, self.STATS_FILE)
+        self.matrix = None
+        self.labels = []
+        self.k = 0
+        self.centroid = None
+        self.mean = None
+        self.std = None
+        self.baseline_knn = None
+        self.baseline_mahalanobis = None
+
+    def exists(self) -> bool:
+        return self.store.exists() and os.path.exists(self.stats_path)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = vectors.reshape(-1, vectors.shape[-1])
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    @staticmethod
+    def _top_k_mean(similarity: np.ndarray, k: int) -> np.ndarray:
+        """每行最大的k个相似度的平均值"""
+        if k >= similarity.shape[1]:
+            return similarity.mean(axis=1)
+        return np.partition(similarity, -k, axis=1)[:, -k:].mean(axis=1)
+
+    def _leave_one_out_knn(self, matrix: np.ndarray, k: int) -> np.ndarray:
+        """每条基线与其余基线的kNN相似度，分块计算"""
+        scores = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), self.BLOCK_ROWS):
+            block = matrix[start:start + self.BLOCK_ROWS] @ matrix.T
+            rows = np.arange(len(block))
+            block[rows, start + rows] = -np.inf
+            scores[start:start + len(block)] = self._top_k_mean(block, k)
+        return scores
+
+    def _mahalanobis(self, vectors: np.ndarray) -> np.ndarray:
+        """对角协方差的马氏距离（按维数取均方根，与维数无关）"""
+        z = (vectors - self.mean) / self.std
+        return np.sqrt((z * z).mean(axis=1))
+
+    def build(self, vectors: np.ndarray, labels: List[str], k: int = 5) -> None:
+        """
+        用正常日志向量建立画像，覆盖已有画像
+
+        Args:
+            vectors: 形状为 (n, dim) 的向量矩阵，n 至少为2
+            labels: 与向量一一对应的来源名称
+            k: kNN相似度使用的近邻数
+        """
+        matrix = self.normalize(vectors)
+        if len(matrix) < 2:
+            raise ValueError("建立正常画像至少需要2条正常日志")
+
+        self.store.clear()
+        if os.path.exists(self.stats_path):
+            os.remove(self.stats_path)
+        self.store.append(matrix, labels)
+
+        self.matrix = matrix
+        self.labels = [str(label) for label in labels]
+        self.k = min(k, len(matrix) - 1)
+        centroid = matrix.mean(axis=0)
+        self.centroid = centroid / (np.linalg.norm(centroid) or 1.0)
+        self.mean = centroid
+        # 样本较少时部分维度方差接近0，加上平均方差的一部分避免个别维度放大距离
+        variance = matrix.var(axis=0)
+        self.std = np.sqrt(variance + 0.1 * variance.mean() + 1e-12).astype(np.float32)
+        self.baseline_knn = np.sort(self._leave_one_out_knn(matrix, self.k))
+        self.baseline_mahalanobis = np.sort(self._mahalanobis(matrix))
+
+        np.savez(self.stats_path, k=self.k, centroid=self.centroid, mean=self.mean, std=self.std,
+                 baseline_knn=self.baseline_knn, baseline_mahalanobis=self.baseline_mahalanobis)
+        self.logger.info(f"正常画像建立完成，基线日志数: {len(matrix)}，k={self.k}")
+
+    def load(self) -> bool:
+        """加载画像（向量矩阵内存映射），不存在时返回False"""
+        if not self.exists():
+            return False
+        self.matrix, self.labels = self.store.load()
+        with np.load(self.stats_path) as stats:
+            self.k = int(stats['k'])
+            self.centroid = stats['centroid']
+            self.mean = stats['mean']
+            self.std = stats['std']
+            self.baseline_knn = stats['baseline_knn']
+            self.baseline_mahalanobis = stats['baseline_mahalanobis']
+        return True
+
+    def knn_threshold(self, quantile: float) -> float:
+        """基线留一法kNN相似度的低分位数，低于该值判为异常"""
+        return float(np.quantile(self.baseline_knn, quantile))
+
+    def score(self, vectors: np.ndarray, quantile: float = 0.01) -> Dict[str, np.ndarray]:
+        """
+        批量计算待检测向量相对正常画像的偏离程度
+
+        Args:
+            vectors: 单个向量或形状为 (m, dim) 的矩阵
+            quantile: 判定异常的基线kNN相似度分位数
+
+        Returns:
+            各项指标数组（长度为m）:
+                knn_similarity          与最相近k条基线的平均相似度
+                knn_percentile          基线中kNN相似度不高于该值的比例，越小越异常
+                centroid_similarity     与中心向量的相似度
+                nearest                 最相近基线的下标
+                mahalanobis             对角马氏距离
+                mahalanobis_percentile  基线中马氏距离不低于该值的比例，越小越异常
+                is_anomaly              kNN相似度是否低于阈值
+        """
+        queries = self.normalize(vectors)
+        similarity = queries @ self.matrix.T
+        knn = self._top_k_mean(similarity, self.k)
+        mahalanobis = self._mahalanobis(queries)
+        count = len(self.baseline_knn)
+        return {
+            "knn_similarity": knn,
+            "knn_percentile": np.searchsorted(self.baseline_knn, knn, side='right') / count,
+            "centroid_similarity": queries @ self.centroid,
+            "nearest": similarity.argmax(axis=1),
+            "mahalanobis": mahalanobis,
+            "mahalanobis_percentile": 1 - np.searchsorted(self.baseline_mahalanobis, mahalanobis) / count,
+            "is_anomaly": knn < self.knn_threshold(quantile),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="正常日志画像的建立与检测")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_parser = sub.add_parser("build", help="用目录中的正常日志建立画像")
+    build_parser.add_argument("directory", help="正常日志目录（递归查找.txt/.log文件）")
+    build_parser.add_argument("profile", nargs="?", help="画像目录，默认为 Config.NORMAL_PROFILE_PATH")
+    build_parser.add_argument("-k", type=int, default=None, help="kNN近邻数，默认为 Config.PROFILE_K")
+    score_parser = sub.add_parser("score", help="检测日志相对画像的异常程度")
+    score_parser.add_argument("files", nargs="+", help="待检测日志")
+    score_parser.add_argument("--profile", help="画像目录，默认为 Config.NORMAL_PROFILE_PATH")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    # 向量化依赖模型，只在命令行使用时导入
+    import text2vec_v1
+    text2vec_v1.Config.SHOW_ERROR_DIALOGS = False
+    detector = text2vec_v1.AnomalyDetector()
+
+    if args.command == "build":
+        profile = NormalProfile(args.profile or text2vec_v1.Config.NORMAL_PROFILE_PATH)
+        count = detector.build_normal_profile(args.directory, profile, args.k)
+        print(f"正常画像已建立: {profile.profile_path}，基线日志数 {count}")
+        return
+
+    profile = NormalProfile(args.profile or text2vec_v1.Config.NORMAL_PROFILE_PATH)
+    if not profile.load():
+        print(f"画像不存在: {profile.profile_path}")
+        sys.exit(1)
+    start = time.perf_counter()
+    vectors, paths = detector.vectorize_files(args.files)
+    if vectors is None:
+        print("没有可检测的日志")
+        sys.exit(1)
+    encoded = time.perf_counter()
+    scores = profile.score(vectors, text2vec_v1.Config.PROFILE_QUANTILE)
+    scored = time.perf_counter()
+    for idx, path in enumerate(paths):
+        flag = "异常" if scores["is_anomaly"][idx] else "正常"
+        print(f"{flag}  kNN相似度 {scores['knn_similarity'][idx]:.4f} (基线分位 {scores['knn_percentile'][idx]:.3f})  "
+              f"马氏距离 {scores['mahalanobis'][idx]:.3f}  最相近: {profile.labels[scores['nearest'][idx]]}  {path}")
+    print(f"向量化 {encoded - start:.2f}秒，与 {len(profile)} 条基线比对 {(scored - encoded) * 1000:.1f}毫秒")
+
+
+if __name__ == "__main__":
+    main()
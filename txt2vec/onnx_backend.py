@@ -0,0 +1,214 @@
+"""
+ONNX Runtime 向量化后端
+把 Sentence Transformer 模型目录中的 Transformer 导出为ONNX，并可动态量化为int8（权重int8，激活按批动态量化），
+在没有GPU的机器上用 ONNX Runtime 推理代替fp32的PyTorch模型。
+OnnxSentenceEncoder 提供 VectorEngine 使用的 SentenceTransformer 接口子集（encode / max_seq_length / tokenizer），
+池化与归一化方式从模型目录的 1_Pooling/config.json 与 modules.json 读取，与原模型一致。
+导出需要 torch 与 transformers，之后推理只需要 onnxruntime 与 transformers 的分词器。
+文件结构:
+    model.onnx        fp32模型
+    model_int8.onnx   动态int8量化模型
+导出与量化先写入同目录下的临时文件，完成后原子替换，中断或并发导出不会留下不完整的模型文件。
+
+用法:
+    python onnx_backend.py export [--model 模型目录] [--output 输出目录] [--no-quantize]
+"""
+
+import os
+import json
+import logging
+import argparse
+import tempfile
+from contextlib import contextmanager
+from typing import List, Optional, Union
+
+import numpy as np
+
+FP32_FILE = 'model.onnx'
+INT8_FILE = 'model_int8.onnx'
+
+# 导出时的输入与输出名称
+INPUT_NAMES = ['input_ids', 'attention_mask', 'token_type_ids']
+OUTPUT_NAME = 'last_hidden_state'
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _atomic_output(path: str):
+    """提供同目录下的临时文件路径，代码块正常结束后原子替换为path，异常时删除临时文件"""
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', prefix=name + '.', dir=directory or '.')
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def export_onnx(model_path: str, output_dir: str, opset: int = 14) -> str:
+    """
+    把模型目录中的Transformer导出为fp32 ONNX模型
+
+    Args:
+        model_path: Sentence Transformer模型目录（含config.json与权重）
+        output_dir: 输出目录
+        opset: ONNX算子集版本
+
+    Returns:
+        导出的模型路径
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, FP32_FILE)
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModel.from_pretrained(model_path).eval()
+    sample = tokenizer(["fault detection sample", "sample"], padding=True, return_tensors='pt')
+    input_names = [name for name in INPUT_NAMES if name in sample]
+
+    class Wrapper(torch.nn.Module):
+        """按输入名称传参并只输出最后一层隐藏状态，不依赖 forward 的参数顺序"""
+
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes[OUTPUT_NAME] = {0: 'batch', 1: 'sequence'}
+    with torch.no_grad(), _atomic_output(output_path) as tmp_path:
+        torch.onnx.export(Wrapper(), tuple(sample[name] for name in input_names), tmp_path,
+                          input_names=input_names, output_names=[OUTPUT_NAME],
+                          dynamic_axes=dynamic_axes, opset_version=opset, dynamo=False)
+    logger.info(f"ONNX模型导出完成: {output_path}")
+    return output_path
+
+
+def quantize_onnx(fp32_path: str, int8_path: str) -> str:
+    """
+    动态int8量化：MatMul等算子的权重量化为int8，激活在推理时按批量化
+
+    Returns:
+        量化后的模型路径
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    with _atomic_output(int8_path) as tmp_path:
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+    logger.info(f"int8量化完成: {int8_path}")
+    return int8_path
+
+
+def ensure_onnx_model(model_path: str, onnx_dir: str, quantized: bool = True) -> str:
+    """返回ONNX模型路径，不存在时导出（及量化）"""
+    fp32_path = os.path.join(onnx_dir, FP32_FILE)
+    int8_path = os.path.join(onnx_dir, INT8_FILE)
+    if not os.path.exists(fp32_path):
+        export_onnx(model_path, onnx_dir)
+    if quantized and not os.path.exists(int8_path):
+        quantize_onnx(fp32_path, int8_path)
+    return int8_path if quantized else fp32_path
+
+
+class OnnxSentenceEncoder:
+    """用 ONNX Runtime 推理的句向量模型"""
+
+    def __init__(self, model_path: str, onnx_dir: str, quantized: bool = True,
+                 num_threads: Optional[int] = None):
+        """
+        Args:
+            model_path: Sentence Transformer模型目录（读取分词器与池化配置）
+            onnx_dir: ONNX模型目录，模型不存在时从 model_path 导出
+            quantized: 是否使用int8量化模型
+            num_threads: 推理线程数，None时由 ONNX Runtime 决定
+        """
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        self.model_path = model_path
+        self.onnx_path = ensure_onnx_model(model_path, onnx_dir, quantized)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.max_seq_length = self._read_json('sentence_bert_config.json').get('max_seq_length')
+        pooling = self._read_json(os.path.join('1_Pooling', 'config.json'))
+        self.pooling = 'cls' if pooling.get('pooling_mode_cls_token') else 'mean'
+        modules = self._read_json('modules.json') or []
+        self.normalize_embeddings = any(module.get('type', '').endswith('Normalize') for module in modules)
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(self.onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = [item.name for item in self.session.get_inputs()]
+
+    def _read_json(self, name: str):
+        path = os.path.join(self.model_path, name)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(texts, padding=True, truncation=self.max_seq_length is not None,
+                                 max_length=self.max_seq_length, return_tensors='np')
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        hidden = self.session.run([OUTPUT_NAME], feeds)[0]
+        if self.pooling == 'cls':
+            vectors = hidden[:, 0]
+        else:
+            mask = encoded['attention_mask'][..., None].astype(np.float32)
+            vectors = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return vectors.astype(np.float32)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        """
+        与 SentenceTransformer.encode 相同：输入单个文本返回一维向量，输入列表返回矩阵
+        文本按长度排序后分批推理，减少填充
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        order = np.argsort([-len(text) for text in texts], kind='stable')
+        result = None
+        for start in range(0, len(texts), batch_size):
+            batch_ids = order[start:start + batch_size]
+            vectors = self._encode_batch([texts[idx] for idx in batch_ids])
+            if result is None:
+                result = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            result[batch_ids] = vectors
+        return result[0] if single else result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出ONNX模型并进行int8量化")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_parser = sub.add_parser("export", help="导出（并量化）模型")
+    export_parser.add_argument("--model", help="模型目录，默认为 Config.MODEL_PATH")
+    export_parser.add_argument("--output", help="输出目录，默认为 Config.ONNX_MODEL_DIR")
+    export_parser.add_argument("--no-quantize", action="store_true", help="只导出fp32模型")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from text2vec_v1 import Config
+    model_path = args.model or Config.MODEL_PATH
+    output_dir = args.output or Config.ONNX_MODEL_DIR
+    fp32_path = export_onnx(model_path, output_dir)
+    print(f"fp32模型: {fp32_path} ({os.path.getsize(fp32_path) / 1024 / 1024:.1f} MB)")
+    if not args.no_quantize:
+        int8_path = quantize_onnx(fp32_path, os.path.join(output_dir, INT8_FILE))
+        print(f"int8模型: {int8_path} ({os.path.getsize(int8_path) / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,22 @@
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-import tkinter as tk
-from tkinter import filedialog
 import sys
 import csv
 import numpy as np
-import pandas as pd
 import re
+from log_cleaner import iter_clean_tokens
 
+# sentence_transformers、sklearn、pandas、tkinter 导入较慢，在第一次使用时才导入，
+# 模型也在第一次向量化时才加载（见 get_model）
 database_path = r'XW\FaultDetection\txt2vec\error_database\database.csv'
+# text2vec_v1 使用的二进制向量库（Config.VECTOR_STORE_PATH）
+# 已迁移时 csv_reader 以向量库为准（包括 text2vec_v1 新增的记录），vec_save 的新记录同时写入CSV与向量库
+store_path = r'XW\FaultDetection\txt2vec\error_database\vector_store'
+model_path = r'XW\FaultDetection\txt2vec\hugface-model\models--sentence-transformers--all-MiniLM-L6-v2\snapshots\c9745ed1d9f207416be6d2e6f8de32d1f16199bf'
+# model_path = r'XW\code\txt2vec\hugface-model\qwen'
+model = None
+# 故障库缓存：csv_reader 读取的 (向量列表, 错误类型列表) 与对应的归一化矩阵，vec_save 追加记录后清空，
+# 向量库记录数变化（其他程序追加了记录）时也重新读取
+_fault_records = None
+_fault_matrix = None
 # 核心功能
 # Anomaly_Detection：通过和正常值的对比进行异常检测
 # vec_save：保存日志向量
@@ -22,6 +30,8 @@ database_path = r'XW\FaultDetection\txt2vec\error_database\database.csv'
 # 文件选择
 # title：选择文件窗口提示
 def open_file(title='选择您需要的文件'):
+    import tkinter as tk
+    from tkinter import filedialog
     root = tk.Tk()
     root.withdraw() # 隐藏主窗口
     f_path = filedialog.askopenfilename(title=title, filetypes=[("Text files", "*.txt")])
@@ -34,23 +44,11 @@ def open_file(title='选择您需要的文件'):
 # 日志文件清洗
 # text：需要清洗的日志文本
 def text_deal(text):
-    # 日志文本清洗，针对9005日志文本
+    # 日志文本清洗，针对9005日志文本，单次遍历不生成中间列表
     try:
-        out = []
-        for i in range(len(text)-1):
-            text1 = text[i].split()
-            text2 = text[i+1].split()
-            if text1[-1] != 'systemInformationBlockType':
-                out.append(text1)
-        out.append(text[-1].split())
-        outtext = []
-        for i in range(len(out)-1):
-            text1 = out[i]
-            text2 = out[i+1]
-            if text1[-1] != text2[-1]:
-                outtext += text1[10:]
-        outtext += out[-1][10:]
-        outtext = ' '.join(outtext)
+        if not text:
+            raise ValueError
+        outtext = ' '.join(iter_clean_tokens(text, check_fields=False))
     except:
         print('您选择的不是9005日志')
         sys.exit(1)
@@ -59,7 +57,15 @@ def text_deal(text):
 # 文本转向量
 # text：需要转向量的文本
 def get_vec(text):
-    return model.encode([text], convert_to_numpy=True)
+    return get_model().encode([text], convert_to_numpy=True)
+
+# 模型加载，第一次调用时加载后复用
+def get_model():
+    global model
+    if model is None:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_path)
+    return model
 
 # 获取日志向量
 def get_logvec():
@@ -70,6 +76,7 @@ def get_logvec():
 
 # 相似度计算
 def vec_similar(vector1, vector2):
+    from sklearn.metrics.pairwise import cosine_similarity
     similarity = cosine_similarity(vector1.reshape(1, -1), vector2.reshape(1, -1))[0][0]
     return similarity
 
@@ -83,6 +90,7 @@ def Anomaly_Detection():
     vector1 = get_vec(text1)
     vector2 = get_vec(text2)
 
+    from sklearn.metrics.pairwise import cosine_similarity
     similarity = cosine_similarity(vector1, vector2)[0][0]
 
     print("\n" + "="*40)
@@ -100,6 +108,8 @@ def Anomaly_Detection():
 # 下面是一系列的故障数据库建立逻辑
 # 首先是打开存放故障日志向量和对应类型的故障数据库，这里使用csv文件代替数据库
 def open_csvfile():
+    import tkinter as tk
+    from tkinter import filedialog
     root = tk.Tk()
     root.withdraw() # 隐藏主窗口
     f_path = filedialog.askopenfilename(title='选择存放故障数据的故障数据库', filetypes=[("CSV files", "*.csv")])
@@ -117,14 +127,36 @@ def vec_save():
     err_type = input('请输入错误类型：')
     writer.writerow([err_vec, err_type])
     csv_file.close()
+    invalidate_fault_cache()
+    from vector_store import VectorStore
+    store = VectorStore(store_path)
+    if store.exists():
+        store.append(err_vec, [err_type])
+
+# 清空故障库缓存，下次 csv_reader / error_type 重新读取
+def invalidate_fault_cache():
+    global _fault_records, _fault_matrix
+    _fault_records = None
+    _fault_matrix = None
 
-# 读取CSV文件
+# 读取故障库，第一次调用后复用结果
+# 向量库已建立时读取向量库（返回内存映射的向量矩阵与错误类型列表），否则读取CSV文件
 def csv_reader():
+    global _fault_records
+    from vector_store import VectorStore
+    store = VectorStore(store_path)
+    if store.exists():
+        if _fault_records is None or len(_fault_records[1]) != len(store):
+            _fault_records = store.load()
+        return _fault_records
+    if _fault_records is not None:
+        return _fault_records
     # csv_filepath = open_csvfile()
     csv_filepath = database_path
     # 读取CSV文件，不指定header以确保我们能获取到第一行
     vectors = []
     errors = []
+    import pandas as pd
     dfs = pd.read_csv(csv_filepath, header=None)
     for i in range(len(dfs)):
         vector_string = dfs.iloc[i, 0]
@@ -137,7 +169,8 @@ def csv_reader():
         vector = np.array([float(val) for val in values])
         vectors.append(vector)
         errors.append(dfs.iloc[i, 1])
-    return vectors, errors
+    _fault_records = (vectors, errors)
+    return _fault_records
 
 # 下面是一些和返回故障类型相关的逻辑
 # 返回相似度矩阵，针对故障数据库数据，返回故障数据库中的元素的相似度矩阵
@@ -153,14 +186,23 @@ def similar_matrix(vectors):
         similar.append(similar_i)
     return similar
 
+# 将故障库向量转为按行归一化的float32矩阵
+def fault_matrix(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
 # 计算当前日志和故障数据库中日志的相似度，返回最疑似的可能
+# 一次矩阵-向量乘积得到全部相似度
 def error_type(log_vec, vectors, errs):
-    similar = []
-    for i in range(len(vectors)):
-        similar.append(vec_similar(log_vec, vectors[i]))
+    global _fault_matrix
+    # 同一份故障库向量只转换一次矩阵
+    if _fault_matrix is None or _fault_matrix[0] is not vectors or len(_fault_matrix[1]) != len(vectors):
+        _fault_matrix = (vectors, fault_matrix(vectors))
+    matrix = _fault_matrix[1]
+    query = np.asarray(log_vec, dtype=np.float32).ravel()
+    norm = np.linalg.norm(query)
+    similar = matrix @ (query / norm if norm else query)
     idx = np.argmax(similar)
     return errs[idx]
-
-# 模型加载
-model = SentenceTransformer(r'XW\FaultDetection\txt2vec\hugface-model\models--sentence-transformers--all-MiniLM-L6-v2\snapshots\c9745ed1d9f207416be6d2e6f8de32d1f16199bf')
-# model = SentenceTransformer(r'XW\code\txt2vec\hugface-model\qwen')
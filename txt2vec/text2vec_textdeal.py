@@ -3,6 +3,7 @@ from sklearn.metrics.pairwise import cosine_similarity
 import tkinter as tk
 from tkinter import filedialog
 import sys
+from log_cleaner import iter_clean_tokens
 
 def text_deal():
     root = tk.Tk()
@@ -53,23 +54,11 @@ def open_file(title='选择您需要的文件'):
 #     return outtext
 
 def text_deal2(text):
-    # 日志文本清洗，针对9005日志文本
+    # 日志文本清洗，针对9005日志文本，单次遍历不生成中间列表
     try:
-        out = []
-        for i in range(len(text)-1):
-            text1 = text[i].split()
-            text2 = text[i+1].split()
-            if text1[-1] != 'systemInformationBlockType':
-                out.append(text1)
-        out.append(text[-1].split())
-        outtext = []
-        for i in range(len(out)-1):
-            text1 = out[i]
-            text2 = out[i+1]
-            if text1[-1] != text2[-1]:
-                outtext += text1[10:]
-        outtext += out[-1][10:]
-        outtext = ' '.join(outtext)
+        if not text:
+            raise ValueError
+        outtext = ' '.join(iter_clean_tokens(text, check_fields=False))
     except:
         print('您选择的不是9005日志')
         sys.exit(1)
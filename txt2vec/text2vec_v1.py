@@ -7,17 +7,30 @@ import os
 import csv
 import re
 import sys
+import json
 import time
 import logging
 from typing import List, Tuple, Optional, Union
 from pathlib import Path
 
 import numpy as np
-import pandas as pd
-import tkinter as tk
-from tkinter import filedialog, messagebox
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+
+from vector_store import VectorStore
+from ann_index import IVFFlatIndex, top_k_indices
+from embedding_cache import EmbeddingCache
+from log_cleaner import iter_clean_tokens, collect_text
+from normal_profile import NormalProfile
+
+# pandas、tkinter、sklearn、sentence_transformers 导入较慢，均在第一次使用时才导入，
+# 不需要向量化的操作（查看系统信息、读取故障库等）可以快速启动
+
+
+def show_error(title: str, message: str) -> None:
+    """弹出错误对话框，Config.SHOW_ERROR_DIALOGS 为False时（无界面的服务进程）只记录日志"""
+    if not Config.SHOW_ERROR_DIALOGS:
+        return
+    from tkinter import messagebox
+    messagebox.showerror(title, message)
 
 
 class Config:
@@ -29,9 +42,46 @@ class Config:
     # 数据库路径
     DATABASE_PATH = r'XW\FaultDetection\txt2vec\error_database\database.csv'
     
+    # 二进制向量库路径（首次使用时自动从 DATABASE_PATH 的CSV迁移）
+    VECTOR_STORE_PATH = r'XW\FaultDetection\txt2vec\error_database\vector_store'
+    
+    # 近似检索配置：记录数达到 ANN_MIN_RECORDS 后启用IVF索引，索引保存在向量库目录中
+    ANN_MIN_RECORDS = 100000
+    ANN_NLIST = None  # 倒排表数量，None时取记录数的平方根
+    ANN_NPROBE = 16   # 每次检索扫描的倒排表数量，越大召回率越高、延迟越高
+    
+    # 批量向量化时每批的文本数
+    ENCODE_BATCH_SIZE = 32
+    
+    # 文本向量缓存（设为None关闭），超过大小上限时按LRU淘汰
+    EMBEDDING_CACHE_PATH = r'XW\FaultDetection\txt2vec\error_database\embedding_cache.sqlite'
+    EMBEDDING_CACHE_MAX_BYTES = 256 * 1024 * 1024
+    
+    # 长日志分块向量化：按模型最大序列长度切分窗口分别编码后池化，避免超出部分被截断丢弃
+    # 故障库向量与查询向量需使用同一模式生成，切换后应重建故障库
+    CHUNKED_EMBEDDING = False
+    CHUNK_OVERLAP = 32        # 相邻窗口重叠的token数
+    CHUNK_POOLING = 'mean'    # 'mean'（按token数加权平均）或 'attention'（注意力加权）
+    
+    # 向量化后端: 'torch'（sentence_transformers fp32）、'onnx'（ONNX Runtime fp32）或 'onnx-int8'（动态int8量化）
+    # ONNX模型首次使用时从 MODEL_PATH 导出到 ONNX_MODEL_DIR，之后推理不需要torch
+    # 故障库向量由fp32模型生成，切换到int8前可用 bench_backend.py 评估检索结果的差异
+    EMBEDDING_BACKEND = 'torch'
+    ONNX_MODEL_DIR = r'XW\FaultDetection\txt2vec\hugface-model\onnx'
+    ONNX_NUM_THREADS = None   # ONNX Runtime 推理线程数，None时自动选择
+    
     # 异常检测阈值
     ANOMALY_THRESHOLD = 0.8
     
+    # 正常日志画像：由大量正常日志建立基线，与最相近 PROFILE_K 条基线的平均相似度
+    # 低于基线自身分布的 PROFILE_QUANTILE 分位数时判为异常
+    NORMAL_PROFILE_PATH = r'XW\FaultDetection\txt2vec\error_database\normal_profile'
+    PROFILE_K = 5
+    PROFILE_QUANTILE = 0.01
+    
+    # 出错时是否弹出对话框（错误信息始终写入日志）
+    SHOW_ERROR_DIALOGS = True
+    
     # 日志配置
     LOG_LEVEL = logging.INFO
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -58,6 +108,9 @@ class LogProcessor:
             file_types = [("Text files", "*.txt"), ("All files", "*.*")]
         
         try:
+            import tkinter as tk
+            from tkinter import filedialog
+            
             root = tk.Tk()
             root.withdraw()  # 隐藏主窗口
             file_path = filedialog.askopenfilename(title=title, filetypes=file_types)
@@ -71,7 +124,7 @@ class LogProcessor:
             
         except Exception as e:
             self.logger.error(f"文件选择失败: {e}")
-            messagebox.showerror("错误", f"文件选择失败: {e}")
+            show_error("错误", f"文件选择失败: {e}")
             return None
     
     def read_log_file(self, file_path: str) -> Optional[List[str]]:
@@ -103,56 +156,27 @@ class LogProcessor:
                 return lines
             except Exception as e:
                 self.logger.error(f"读取文件失败 (编码问题): {e}")
-                messagebox.showerror("错误", f"文件编码不支持: {e}")
+                show_error("错误", f"文件编码不支持: {e}")
                 return None
         except Exception as e:
             self.logger.error(f"读取文件失败: {e}")
-            messagebox.showerror("错误", f"读取文件失败: {e}")
+            show_error("错误", f"读取文件失败: {e}")
             return None
     
-    def clean_log_text(self, text_lines: List[str]) -> Optional[str]:
+    def clean_log_text(self, text_lines: List[str], max_tokens: Optional[int] = None) -> Optional[str]:
         """
         清洗日志文本（针对9005日志格式）
         
         Args:
-            text_lines: 原始日志行列表
+            text_lines: 原始日志行列表（也可以是打开的文件等任意行迭代器）
+            max_tokens: 最多保留的单词数，None表示不限制
             
         Returns:
             清洗后的文本字符串，失败返回None
         """
         try:
-            if not text_lines:
-                raise ValueError("输入的日志文本为空")
-            
-            # 第一步：过滤掉包含 'systemInformationBlockType' 的行
-            filtered_lines = []
-            for i in range(len(text_lines) - 1):
-                line1_parts = text_lines[i].split()
-                line2_parts = text_lines[i + 1].split()
-                
-                if line1_parts and line1_parts[-1] != 'systemInformationBlockType':
-                    filtered_lines.append(line1_parts)
-            
-            # 添加最后一行
-            if text_lines:
-                filtered_lines.append(text_lines[-1].split())
-            
-            # 第二步：提取有效内容（从第11个字段开始）
-            processed_text = []
-            for i in range(len(filtered_lines) - 1):
-                line1 = filtered_lines[i]
-                line2 = filtered_lines[i + 1]
-                
-                # 检查最后一个字段是否不同
-                if line1 and line2 and len(line1) > 10 and len(line2) > 10:
-                    if line1[-1] != line2[-1]:
-                        processed_text.extend(line1[10:])
-            
-            # 添加最后一行的内容
-            if filtered_lines and len(filtered_lines[-1]) > 10:
-                processed_text.extend(filtered_lines[-1][10:])
-            
-            result = ' '.join(processed_text)
+            # 单次遍历完成系统消息过滤与相邻重复行去除，不生成中间列表
+            result = collect_text(iter_clean_tokens(text_lines), max_tokens)
             
             if not result.strip():
                 raise ValueError("处理后的文本为空，可能不是有效的9005日志格式")
@@ -160,41 +184,105 @@ class LogProcessor:
             self.logger.info(f"日志清洗完成，输出长度: {len(result)}")
             return result
             
+        except UnicodeDecodeError:
+            # 直接传入文件对象时由调用方更换编码重试
+            raise
         except Exception as e:
             self.logger.error(f"日志清洗失败: {e}")
-            messagebox.showerror("错误", f"日志清洗失败，可能不是9005日志格式: {e}")
+            show_error("错误", f"日志清洗失败，可能不是9005日志格式: {e}")
+            return None
+    
+    def clean_log_file(self, file_path: str, max_tokens: Optional[int] = None) -> Optional[str]:
+        """
+        边读取边清洗日志文件，不把整个文件读入内存
+        指定 max_tokens 时凑够单词数即停止读取（整体编码时模型只使用前 max_seq_length 个token）
+        
+        Args:
+            file_path: 文件路径
+            max_tokens: 最多保留的单词数，None表示读取整个文件
+            
+        Returns:
+            清洗后的文本字符串，失败返回None
+        """
+        if not os.path.exists(file_path):
+            self.logger.error(f"读取文件失败: 文件不存在: {file_path}")
+            show_error("错误", f"读取文件失败: 文件不存在: {file_path}")
             return None
+        
+        for encoding in ('utf-8', 'gbk'):
+            try:
+                with open(file_path, 'r', encoding=encoding) as f:
+                    return self.clean_log_text(f, max_tokens)
+            except UnicodeDecodeError:
+                continue
+            except OSError as e:
+                self.logger.error(f"读取文件失败: {e}")
+                show_error("错误", f"读取文件失败: {e}")
+                return None
+        
+        self.logger.error("读取文件失败 (编码问题)")
+        show_error("错误", "文件编码不支持")
+        return None
 
 
 class VectorEngine:
     """向量化引擎，负责文本向量化和相似度计算"""
     
-    def __init__(self, model_path: str = Config.MODEL_PATH):
+    BACKENDS = ('torch', 'onnx', 'onnx-int8')
+    
+    def __init__(self, model_path: str = Config.MODEL_PATH,
+                 cache_path: Optional[str] = Config.EMBEDDING_CACHE_PATH,
+                 backend: Optional[str] = None, device: Optional[str] = None):
         """
         初始化向量化引擎
         
         Args:
             model_path: 模型路径
+            cache_path: 向量缓存文件路径，为None时不使用缓存
+            backend: 向量化后端，见 Config.EMBEDDING_BACKEND，None时使用配置值
+            device: torch后端的运行设备（如 'cuda'、'cpu'），None时由 SentenceTransformer 自动选择
         """
         self.logger = logging.getLogger(__name__)
-        self.model = None
+        self._model = None
         self.model_path = model_path
-        self._load_model()
+        self.device = device
+        self.backend = backend or Config.EMBEDDING_BACKEND
+        if self.backend not in self.BACKENDS:
+            raise ValueError(f"未知的向量化后端: {self.backend}")
+        self.cache = EmbeddingCache(cache_path, Config.EMBEDDING_CACHE_MAX_BYTES) if cache_path else None
+    
+    @property
+    def model(self):
+        """Sentence Transformer模型，第一次需要编码时才加载"""
+        if self._model is None:
+            self._load_model()
+        return self._model
     
     def _load_model(self) -> None:
-        """加载Sentence Transformer模型"""
+        """
+        加载Sentence Transformer模型（或对应的ONNX模型）
+        
+        Raises:
+            RuntimeError: 模型不存在或加载失败，由调用方决定提示方式（不退出进程，服务可以继续运行）
+        """
         try:
             if not os.path.exists(self.model_path):
                 raise FileNotFoundError(f"模型路径不存在: {self.model_path}")
             
-            self.logger.info("正在加载模型...")
-            self.model = SentenceTransformer(self.model_path)
+            self.logger.info(f"正在加载模型（{self.backend}）...")
+            if self.backend == 'torch':
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_path, device=self.device)
+            else:
+                from onnx_backend import OnnxSentenceEncoder
+                self._model = OnnxSentenceEncoder(self.model_path, Config.ONNX_MODEL_DIR,
+                                                  quantized=self.backend == 'onnx-int8',
+                                                  num_threads=Config.ONNX_NUM_THREADS)
             self.logger.info("模型加载成功")
             
         except Exception as e:
             self.logger.error(f"模型加载失败: {e}")
-            messagebox.showerror("错误", f"模型加载失败: {e}")
-            sys.exit(1)
+            raise RuntimeError(f"模型加载失败: {e}") from e
     
     def text_to_vector(self, text: str) -> Optional[np.ndarray]:
         """
@@ -210,18 +298,245 @@ class VectorEngine:
             if not text.strip():
                 raise ValueError("输入文本为空")
             
-            if self.model is None:
-                raise RuntimeError("模型未正确加载")
-            
-            vector = self.model.encode([text], convert_to_numpy=True)[0]
+            # 先查缓存，命中时不加载模型
+            key = self._cache_key(text)
+            vector = self.cache.get(key) if self.cache is not None else None
+            if vector is None:
+                if self.model is None:
+                    raise RuntimeError("模型未正确加载")
+                vector = self.model.encode([text], convert_to_numpy=True)[0]
+                if self.cache is not None:
+                    self.cache.put(key, vector)
             self.logger.debug(f"文本向量化完成，维度: {vector.shape}")
             return vector
             
         except Exception as e:
             self.logger.error(f"文本向量化失败: {e}")
-            messagebox.showerror("错误", f"文本向量化失败: {e}")
+            show_error("错误", f"文本向量化失败: {e}")
             return None
     
+    def _max_seq_length(self) -> Optional[int]:
+        """
+        模型的最大序列长度
+        模型未加载时从模型目录的 sentence_bert_config.json 读取，缓存命中时无需加载模型
+        """
+        if self._model is None:
+            config_path = os.path.join(self.model_path, 'sentence_bert_config.json')
+            if os.path.exists(config_path):
+                with open(config_path, 'r', encoding='utf-8') as f:
+                    return json.load(f).get('max_seq_length')
+        return getattr(self.model, 'max_seq_length', None)
+    
+    def text_token_limit(self) -> Optional[int]:
+        """
+        清洗文本时需要保留的单词数
+        整体编码时模型只使用前 max_seq_length 个token，每个单词至少对应一个token，
+        保留前 max_seq_length 个单词即可得到相同的向量；分块编码需要全文，返回None
+        """
+        if Config.CHUNKED_EMBEDDING:
+            return None
+        return self._max_seq_length()
+    
+    def _cache_key(self, text: str) -> str:
+        """缓存键：清洗后的文本 + 模型路径（非torch后端附加后端名称） + 最大序列长度"""
+        model_id = os.path.normpath(self.model_path)
+        if self.backend != 'torch':
+            model_id += f'#{self.backend}'
+        return EmbeddingCache.make_key(text, model_id, self._max_seq_length())
+    
+    def cache_stats(self) -> Optional[dict]:
+        """向量缓存的命中/未命中统计，未使用缓存时返回None"""
+        return self.cache.stats() if self.cache is not None else None
+    
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        """
+        计算各文本截断到 max_seq_length 后的token数，模型没有分词器时按空白分词估算
+        
+        Args:
+            texts: 文本列表
+            
+        Returns:
+            token数列表
+        """
+        max_length = getattr(self.model, 'max_seq_length', None)
+        tokenizer = getattr(self.model, 'tokenizer', None)
+        if tokenizer is not None:
+            encoded = tokenizer(texts, truncation=max_length is not None, max_length=max_length)
+            return [len(ids) for ids in encoded['input_ids']]
+        lengths = [len(text.split()) for text in texts]
+        return [min(length, max_length) for length in lengths] if max_length else lengths
+    
+    def encode_batch(self, texts: List[str], batch_size: int = Config.ENCODE_BATCH_SIZE) -> Optional[np.ndarray]:
+        """
+        批量将文本转换为向量
+        先查询向量缓存，只对未命中的文本按token数排序后分批编码，
+        同一批内的文本长度接近，减少填充带来的无效计算
+        
+        Args:
+            texts: 清洗后的文本列表
+            batch_size: 每批的文本数
+            
+        Returns:
+            形状为 (文本数, 维度) 的C连续float32矩阵，行顺序与输入一致，失败返回None
+        """
+        try:
+            if any(not text.strip() for text in texts):
+                raise ValueError("输入文本中存在空文本")
+            
+            if not texts:
+                return np.empty((0, 0), dtype=np.float32)
+            
+            keys = [self._cache_key(text) for text in texts]
+            cached = self.cache.get_many(keys) if self.cache is not None else {}
+            matrix = None
+            if cached:
+                dim = len(next(iter(cached.values())))
+                matrix = np.empty((len(texts), dim), dtype=np.float32)
+                for idx, key in enumerate(keys):
+                    if key in cached:
+                        matrix[idx] = cached[key]
+            
+            # 相同文本只编码一次
+            pending = {}
+            for idx, key in enumerate(keys):
+                if key not in cached:
+                    pending.setdefault(key, []).append(idx)
+            if not pending:
+                self.logger.info(f"批量向量化完成，共 {len(texts)} 条文本，全部命中缓存")
+                return matrix
+            
+            # 只有存在未命中的文本时才加载模型
+            if self.model is None:
+                raise RuntimeError("模型未正确加载")
+            
+            first_ids = [rows[0] for rows in pending.values()]
+            lengths = self._token_lengths([texts[idx] for idx in first_ids])
+            order = [first_ids[i] for i in np.argsort(lengths, kind='stable')]
+            
+            encoded = {}
+            for start in range(0, len(order), batch_size):
+                batch_ids = order[start:start + batch_size]
+                vectors = self.model.encode([texts[idx] for idx in batch_ids],
+                                            batch_size=len(batch_ids), convert_to_numpy=True)
+                if matrix is None:
+                    matrix = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+                for idx, vector in zip(batch_ids, vectors):
+                    matrix[pending[keys[idx]]] = vector
+                    encoded[keys[idx]] = vector
+            
+            if self.cache is not None:
+                self.cache.put_many(encoded)
+            self.logger.info(f"批量向量化完成，共 {len(texts)} 条文本，维度: {matrix.shape[1]}")
+            return matrix
+            
+        except Exception as e:
+            self.logger.error(f"批量向量化失败: {e}")
+            show_error("错误", f"批量向量化失败: {e}")
+            return None
+    
+    def split_into_chunks(self, text: str, max_tokens: Optional[int] = None,
+                          overlap: int = Config.CHUNK_OVERLAP) -> List[Tuple[str, int]]:
+        """
+        按token数把文本切分为相互重叠的窗口
+        有快速分词器时按token偏移切分原文，否则按空白分词近似
+        
+        Args:
+            text: 清洗后的文本
+            max_tokens: 每个窗口的token数，默认为最大序列长度减去首尾特殊token
+            overlap: 相邻窗口重叠的token数
+            
+        Returns:
+            (窗口文本, token数) 列表
+        """
+        if max_tokens is None:
+            max_tokens = (self._max_seq_length() or 256) - 2
+        step = max(1, max_tokens - overlap)
+        
+        tokenizer = getattr(self.model, 'tokenizer', None)
+        if tokenizer is not None and getattr(tokenizer, 'is_fast', False):
+            offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True,
+                                truncation=False)['offset_mapping']
+            spans = [(offsets[start][0], offsets[min(start + max_tokens, len(offsets)) - 1][1],
+                      min(max_tokens, len(offsets) - start))
+                     for start in range(0, max(1, len(offsets) - overlap), step)]
+            return [(text[begin:end], count) for begin, end, count in spans if count > 0]
+        
+        words = text.split()
+        return [(' '.join(words[start:start + max_tokens]), len(words[start:start + max_tokens]))
+                for start in range(0, max(1, len(words) - overlap), step)]
+    
+    @staticmethod
+    def pool_chunks(chunk_vectors: np.ndarray, token_counts: Optional[List[int]] = None,
+                    method: str = Config.CHUNK_POOLING, temperature: float = 0.1) -> np.ndarray:
+        """
+        把各窗口的向量池化为一个向量
+        
+        Args:
+            chunk_vectors: 形状为 (窗口数, 维度) 的向量矩阵
+            token_counts: 各窗口的token数，mean 模式下作为权重
+            method: 'mean' 按token数加权平均；'attention' 以平均向量为查询，
+                    按 softmax(相似度 / temperature) 加权，偏向与整体内容一致的窗口
+            temperature: attention 模式的温度
+            
+        Returns:
+            归一化的float32向量
+        """
+        vectors = VectorEngine.normalize(chunk_vectors)
+        if method == 'mean':
+            weights = np.ones(len(vectors), dtype=np.float32) if token_counts is None \
+                else np.asarray(token_counts, dtype=np.float32)
+        elif method == 'attention':
+            query = VectorEngine.normalize(vectors.mean(axis=0))
+            scores = vectors @ query / temperature
+            weights = np.exp(scores - scores.max())
+        else:
+            raise ValueError(f"未知的池化方式: {method}")
+        return VectorEngine.normalize(weights @ vectors / weights.sum())
+    
+    def encode_chunked(self, text: str, pooling: str = Config.CHUNK_POOLING) -> Optional[Tuple[np.ndarray, List[str], np.ndarray]]:
+        """
+        分块向量化长文本：切分窗口、批量编码后池化
+        
+        Args:
+            text: 清洗后的文本
+            pooling: 池化方式，见 pool_chunks
+            
+        Returns:
+            (池化后的向量, 窗口文本列表, 各窗口向量矩阵)，失败返回None
+        """
+        if not text.strip():
+            self.logger.error("文本向量化失败: 输入文本为空")
+            return None
+        chunks = self.split_into_chunks(text)
+        chunk_vectors = self.encode_batch([chunk for chunk, _ in chunks])
+        if chunk_vectors is None:
+            return None
+        pooled = self.pool_chunks(chunk_vectors, [count for _, count in chunks], pooling)
+        self.logger.debug(f"分块向量化完成，窗口数: {len(chunks)}")
+        return pooled, [chunk for chunk, _ in chunks], chunk_vectors
+    
+    def embed_text(self, text: str) -> Optional[np.ndarray]:
+        """按 Config.CHUNKED_EMBEDDING 选择整体编码或分块编码，返回文本向量"""
+        if Config.CHUNKED_EMBEDDING:
+            result = self.encode_chunked(text)
+            return result[0] if result is not None else None
+        return self.text_to_vector(text)
+    
+    @staticmethod
+    def chunk_similarity(reference_vectors: np.ndarray, test_vectors: np.ndarray) -> np.ndarray:
+        """
+        局部相似度：待检测日志每个窗口与参考日志所有窗口的最大余弦相似度
+        
+        Args:
+            reference_vectors: 参考日志的窗口向量矩阵
+            test_vectors: 待检测日志的窗口向量矩阵
+            
+        Returns:
+            长度为待检测窗口数的相似度数组，值越低说明该段内容在参考日志中越少见
+        """
+        similarity = VectorEngine.normalize(test_vectors) @ VectorEngine.normalize(reference_vectors).T
+        return similarity.max(axis=1)
+    
     def calculate_similarity(self, vector1: np.ndarray, vector2: np.ndarray) -> float:
         """
         计算两个向量的余弦相似度
@@ -234,6 +549,8 @@ class VectorEngine:
             余弦相似度值
         """
         try:
+            from sklearn.metrics.pairwise import cosine_similarity
+            
             similarity = cosine_similarity(
                 vector1.reshape(1, -1), 
                 vector2.reshape(1, -1)
@@ -243,25 +560,53 @@ class VectorEngine:
         except Exception as e:
             self.logger.error(f"相似度计算失败: {e}")
             return 0.0
+    
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        """
+        按行L2归一化为float32，归一化后余弦相似度即为点积
+        
+        Args:
+            vectors: 单个向量或向量矩阵
+            
+        Returns:
+            归一化后的float32数组，零向量保持为零
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
 
 
 class FaultDatabase:
     """故障数据库管理器"""
     
-    def __init__(self, database_path: str = Config.DATABASE_PATH):
+    def __init__(self, database_path: str = Config.DATABASE_PATH,
+                 store_path: Optional[str] = Config.VECTOR_STORE_PATH):
         """
         初始化故障数据库
         
         Args:
-            database_path: 数据库文件路径
+            database_path: 旧的CSV数据库文件路径
+            store_path: 二进制向量库目录，为None时沿用CSV存储
         """
         self.logger = logging.getLogger(__name__)
         self.database_path = database_path
+        self.store = VectorStore(store_path) if store_path else None
+        # 预归一化的故障向量矩阵及对应类型，首次检索时加载
+        self._matrix = None
+        self.ann_index = None
+        self._labels = None
         self._ensure_database_exists()
     
     def _ensure_database_exists(self) -> None:
-        """确保数据库文件存在"""
+        """确保数据库文件存在，使用二进制向量库时从已有的CSV一次性迁移"""
         try:
+            if self.store is not None:
+                if not self.store.exists() and os.path.exists(self.database_path):
+                    self.store.migrate_from_csv(self.database_path)
+                return
+            
             database_dir = os.path.dirname(self.database_path)
             if database_dir and not os.path.exists(database_dir):
                 os.makedirs(database_dir, exist_ok=True)
@@ -276,7 +621,7 @@ class FaultDatabase:
                 
         except Exception as e:
             self.logger.error(f"数据库初始化失败: {e}")
-            messagebox.showerror("错误", f"数据库初始化失败: {e}")
+            show_error("错误", f"数据库初始化失败: {e}")
     
     def add_fault_record(self, vector: np.ndarray, error_type: str) -> bool:
         """
@@ -290,18 +635,34 @@ class FaultDatabase:
             是否添加成功
         """
         try:
+            if self.store is not None:
+                self.store.append(vector, [error_type])
+                # 已加载时重新映射扩展后的矩阵，标签直接追加
+                if self._matrix is not None:
+                    self._labels.append(error_type)
+                    self._matrix = self.store.open_matrix(len(self._labels))
+                    if self.ann_index is not None:
+                        self.ann_index.add(self._matrix[-1])
+                self.logger.info(f"成功添加故障记录: {error_type}")
+                return True
+            
             with open(self.database_path, 'a', newline='', encoding='utf-8-sig') as f:
                 writer = csv.writer(f)
                 # 将向量转换为字符串格式
                 vector_str = ' '.join(map(str, vector))
                 writer.writerow([vector_str, error_type])
             
+            # 已加载的矩阵同步追加，无需重新读取数据库
+            if self._matrix is not None:
+                self._matrix = np.vstack([self._matrix, VectorEngine.normalize(vector).reshape(1, -1)])
+                self._labels.append(error_type)
+            
             self.logger.info(f"成功添加故障记录: {error_type}")
             return True
             
         except Exception as e:
             self.logger.error(f"添加故障记录失败: {e}")
-            messagebox.showerror("错误", f"添加故障记录失败: {e}")
+            show_error("错误", f"添加故障记录失败: {e}")
             return False
     
     def load_fault_records(self) -> Tuple[List[np.ndarray], List[str]]:
@@ -315,10 +676,17 @@ class FaultDatabase:
         error_types = []
         
         try:
+            if self.store is not None:
+                matrix, error_types = self.store.load()
+                self.logger.info(f"成功加载 {len(error_types)} 条故障记录")
+                return list(matrix), error_types
+            
             if not os.path.exists(self.database_path):
                 self.logger.warning("数据库文件不存在")
                 return vectors, error_types
             
+            import pandas as pd
+            
             df = pd.read_csv(self.database_path, header=None)
             
             for i in range(len(df)):
@@ -348,8 +716,88 @@ class FaultDatabase:
             
         except Exception as e:
             self.logger.error(f"加载故障记录失败: {e}")
-            messagebox.showerror("错误", f"加载故障记录失败: {e}")
+            show_error("错误", f"加载故障记录失败: {e}")
             return [], []
+    
+    def load_fault_matrix(self) -> Tuple[np.ndarray, List[str]]:
+        """
+        加载故障库为预归一化的float32矩阵（结果缓存，后续检索直接复用）
+        二进制向量库中的向量写入时已归一化，直接内存映射，无需解析和复制
+        
+        Returns:
+            (形状为 (记录数, 维度) 的矩阵, 错误类型列表)
+        """
+        if self._matrix is None and self.store is not None:
+            self._matrix, self._labels = self.store.load()
+        elif self._matrix is None:
+            vectors, error_types = self.load_fault_records()
+            if vectors:
+                self._matrix = VectorEngine.normalize(np.vstack(vectors))
+            else:
+                self._matrix = np.empty((0, 0), dtype=np.float32)
+            self._labels = list(error_types)
+        return self._matrix, self._labels
+    
+    def build_ann_index(self, nlist: Optional[int] = Config.ANN_NLIST) -> Optional[IVFFlatIndex]:
+        """
+        训练近似检索索引并保存到向量库目录（已有索引会被替换）
+        
+        Args:
+            nlist: 倒排表数量
+            
+        Returns:
+            建好的索引，未使用向量库或故障库为空时返回None
+        """
+        matrix, labels = self.load_fault_matrix()
+        if self.store is None or len(labels) == 0:
+            return None
+        self.logger.info(f"正在为 {len(labels)} 条故障记录建立近似检索索引...")
+        self.ann_index = IVFFlatIndex.train(matrix, nlist)
+        self.ann_index.save(self.store.store_path)
+        self.logger.info(f"近似检索索引建立完成，倒排表数量: {self.ann_index.nlist}")
+        return self.ann_index
+    
+    def get_ann_index(self) -> Optional[IVFFlatIndex]:
+        """
+        获取近似检索索引：记录数未达到 Config.ANN_MIN_RECORDS 时返回None（使用精确检索），
+        否则读取已保存的索引，不存在或失效时自动建立
+        """
+        if self.ann_index is not None:
+            return self.ann_index
+        matrix, labels = self.load_fault_matrix()
+        if self.store is None or len(labels) < Config.ANN_MIN_RECORDS:
+            return None
+        self.ann_index = IVFFlatIndex.open(self.store.store_path, matrix)
+        return self.ann_index or self.build_ann_index()
+    
+    def search(self, query_vector: np.ndarray, top_k: int = 3, exact: bool = False) -> List[Tuple[str, float]]:
+        """
+        在故障库中检索与查询向量最相似的记录
+        大库使用IVF近似检索，小库、exact=True 或近似检索候选不足时，
+        一次矩阵-向量乘积得到全部余弦相似度，再用 argpartition 取前k个
+        
+        Args:
+            query_vector: 查询向量
+            top_k: 返回的结果数
+            exact: 是否强制精确检索
+            
+        Returns:
+            按相似度降序排列的 (错误类型, 相似度) 列表
+        """
+        matrix, labels = self.load_fault_matrix()
+        if len(labels) == 0:
+            return []
+        
+        query = VectorEngine.normalize(query_vector).ravel()
+        index = None if exact else self.get_ann_index()
+        if index is not None:
+            ids, scores = index.search(matrix, query, top_k, Config.ANN_NPROBE)
+            if len(ids) >= min(top_k, len(labels)):
+                return [(labels[idx], float(score)) for idx, score in zip(ids, scores)]
+        
+        scores = matrix @ query
+        top = top_k_indices(scores, top_k)
+        return [(labels[idx], float(scores[idx])) for idx in top]
 
 
 class AnomalyDetector:
@@ -379,30 +827,32 @@ class AnomalyDetector:
             if not test_file:
                 return
             
-            # 读取和处理正常日志
-            normal_lines = self.log_processor.read_log_file(normal_file)
-            if not normal_lines:
-                return
-            
-            normal_text = self.log_processor.clean_log_text(normal_lines)
+            # 读取和处理正常日志与待检测日志
+            token_limit = self.vector_engine.text_token_limit()
+            normal_text = self.log_processor.clean_log_file(normal_file, token_limit)
             if not normal_text:
                 return
             
-            # 读取和处理待检测日志
-            test_lines = self.log_processor.read_log_file(test_file)
-            if not test_lines:
-                return
-            
-            test_text = self.log_processor.clean_log_text(test_lines)
+            test_text = self.log_processor.clean_log_file(test_file, token_limit)
             if not test_text:
                 return
             
             # 向量化
-            normal_vector = self.vector_engine.text_to_vector(normal_text)
-            test_vector = self.vector_engine.text_to_vector(test_text)
-            
-            if normal_vector is None or test_vector is None:
-                return
+            local_similarity = None
+            if Config.CHUNKED_EMBEDDING:
+                normal_result = self.vector_engine.encode_chunked(normal_text)
+                test_result = self.vector_engine.encode_chunked(test_text)
+                if normal_result is None or test_result is None:
+                    return
+                normal_vector, test_vector = normal_result[0], test_result[0]
+                test_chunks = test_result[1]
+                local_similarity = self.vector_engine.chunk_similarity(normal_result[2], test_result[2])
+            else:
+                # 两份日志一次编码
+                vectors = self.vector_engine.encode_batch([normal_text, test_text])
+                if vectors is None:
+                    return
+                normal_vector, test_vector = vectors
             
             # 计算相似度
             similarity = self.vector_engine.calculate_similarity(normal_vector, test_vector)
@@ -419,11 +869,143 @@ class AnomalyDetector:
                 print("✅ 检测结果: 待检测文件正常")
                 print("未发现明显异常。")
             
+            if local_similarity is not None:
+                # 局部相似度最低的片段，帮助定位差异位置
+                print("-" * 50)
+                print(f"待检测日志共 {len(test_chunks)} 个片段，局部相似度最低的片段：")
+                for idx in np.argsort(local_similarity, kind='stable')[:3]:
+                    print(f"  片段 {idx + 1} (相似度 {local_similarity[idx]:.4f}): {test_chunks[idx][:100]}")
+            
+            print("="*50)
+            
+            cache_stats = self.vector_engine.cache_stats()
+            if cache_stats:
+                self.logger.info(f"向量缓存命中: {cache_stats['hits']}，未命中: {cache_stats['misses']}")
+            
+        except Exception as e:
+            self.logger.error(f"异常检测失败: {e}")
+            show_error("错误", f"异常检测失败: {e}")
+    
+    def build_normal_profile(self, directory: str, profile: Optional[NormalProfile] = None,
+                             k: Optional[int] = None) -> int:
+        """
+        向量化目录中的全部正常日志并建立正常画像
+        
+        Args:
+            directory: 正常日志目录（递归查找.txt/.log文件）
+            profile: 画像，默认使用 Config.NORMAL_PROFILE_PATH
+            k: kNN近邻数，默认为 Config.PROFILE_K
+            
+        Returns:
+            基线日志数
+        """
+        profile = profile or NormalProfile(Config.NORMAL_PROFILE_PATH)
+        file_paths = sorted(str(path) for path in Path(directory).rglob('*')
+                            if path.is_file() and path.suffix.lower() in ('.txt', '.log'))
+        vectors, valid_paths = self.vectorize_files(file_paths)
+        if vectors is None:
+            raise ValueError(f"目录中没有可用的正常日志: {directory}")
+        profile.build(vectors, [os.path.relpath(path, directory) for path in valid_paths],
+                      Config.PROFILE_K if k is None else k)
+        return len(valid_paths)
+    
+    def setup_normal_profile(self) -> None:
+        """选择正常日志目录并建立正常画像"""
+        try:
+            print("\n" + "="*50)
+            print("建立正常日志画像")
+            print("="*50)
+            
+            import tkinter as tk
+            from tkinter import filedialog
+            root = tk.Tk()
+            root.withdraw()
+            directory = filedialog.askdirectory(title='选择正常日志目录')
+            if not directory:
+                return
+            
+            count = self.build_normal_profile(directory)
+            print(f"✅ 正常画像已建立，基线日志数: {count}")
+            print(f"画像路径: {Config.NORMAL_PROFILE_PATH}")
+            print("="*50)
+            
+        except Exception as e:
+            self.logger.error(f"建立正常画像失败: {e}")
+            show_error("错误", f"建立正常画像失败: {e}")
+    
+    def detect_anomaly_by_profile(self) -> None:
+        """与正常日志画像中的全部基线对比进行异常检测"""
+        try:
+            print("\n" + "="*50)
+            print("异常检测 - 与正常日志画像对比")
+            print("="*50)
+            
+            profile = NormalProfile(Config.NORMAL_PROFILE_PATH)
+            if not profile.load():
+                print("❌ 正常画像不存在，请先建立正常日志画像")
+                return
+            print(f"正常画像中共有 {len(profile)} 条基线日志")
+            
+            test_file = self.log_processor.select_file('选择待检测日志文件')
+            if not test_file:
+                return
+            
+            test_text = self.log_processor.clean_log_file(test_file, self.vector_engine.text_token_limit())
+            if not test_text:
+                return
+            
+            test_vector = self.vector_engine.embed_text(test_text)
+            if test_vector is None:
+                return
+            
+            scores = profile.score(test_vector, Config.PROFILE_QUANTILE)
+            threshold = profile.knn_threshold(Config.PROFILE_QUANTILE)
+            
+            # 显示结果
+            print(f"\nkNN相似度 (k={profile.k}): {scores['knn_similarity'][0]:.4f}")
+            print(f"异常阈值 (基线{Config.PROFILE_QUANTILE:.0%}分位): {threshold:.4f}")
+            print(f"基线中相似度不高于该值的比例: {scores['knn_percentile'][0]:.3f}")
+            print(f"与中心向量的相似度: {scores['centroid_similarity'][0]:.4f}")
+            print(f"马氏距离: {scores['mahalanobis'][0]:.3f} (基线中不低于该值的比例: {scores['mahalanobis_percentile'][0]:.3f})")
+            print(f"最相近的正常日志: {profile.labels[scores['nearest'][0]]}")
+            print("-" * 50)
+            
+            if scores['is_anomaly'][0]:
+                print("🚨 检测结果: 待检测文件可能存在异常！")
+                print("建议进一步检查日志内容。")
+            else:
+                print("✅ 检测结果: 待检测文件正常")
+                print("未发现明显异常。")
             print("="*50)
             
         except Exception as e:
             self.logger.error(f"异常检测失败: {e}")
-            messagebox.showerror("错误", f"异常检测失败: {e}")
+            show_error("错误", f"异常检测失败: {e}")
+    
+    def vectorize_files(self, file_paths: List[str],
+                        batch_size: int = Config.ENCODE_BATCH_SIZE) -> Tuple[Optional[np.ndarray], List[str]]:
+        """
+        批量读取、清洗并向量化多个日志文件
+        
+        Args:
+            file_paths: 日志文件路径列表
+            batch_size: 每批编码的文本数
+            
+        Returns:
+            (向量矩阵, 成功处理的文件路径列表)，矩阵行与路径一一对应，读取或清洗失败的文件被跳过
+        """
+        texts = []
+        valid_paths = []
+        token_limit = self.vector_engine.text_token_limit()
+        for file_path in file_paths:
+            text = self.log_processor.clean_log_file(file_path, token_limit)
+            if text:
+                texts.append(text)
+                valid_paths.append(file_path)
+        
+        if not texts:
+            return None, []
+        return self.vector_engine.encode_batch(texts, batch_size), valid_paths
     
     def identify_fault_type(self) -> None:
         """通过故障库识别故障类型"""
@@ -432,14 +1014,14 @@ class AnomalyDetector:
             print("故障类型识别")
             print("="*50)
             
-            # 加载故障库
-            vectors, error_types = self.fault_database.load_fault_records()
+            # 加载故障库（预归一化矩阵）
+            _, error_types = self.fault_database.load_fault_matrix()
             
-            if not vectors:
+            if not error_types:
                 print("❌ 故障库为空，请先添加故障记录。")
                 return
             
-            print(f"故障库中共有 {len(vectors)} 条记录")
+            print(f"故障库中共有 {len(error_types)} 条记录")
             
             # 选择待检测文件
             test_file = self.log_processor.select_file('选择待检测日志文件')
@@ -447,46 +1029,34 @@ class AnomalyDetector:
                 return
             
             # 读取和处理日志
-            test_lines = self.log_processor.read_log_file(test_file)
-            if not test_lines:
-                return
-            
-            test_text = self.log_processor.clean_log_text(test_lines)
+            test_text = self.log_processor.clean_log_file(test_file, self.vector_engine.text_token_limit())
             if not test_text:
                 return
             
             # 向量化
-            test_vector = self.vector_engine.text_to_vector(test_text)
+            test_vector = self.vector_engine.embed_text(test_text)
             if test_vector is None:
                 return
             
-            # 计算与故障库中每个记录的相似度
-            similarities = []
-            for fault_vector in vectors:
-                similarity = self.vector_engine.calculate_similarity(test_vector, fault_vector)
-                similarities.append(similarity)
-            
-            # 找到最相似的故障类型
-            max_similarity_idx = np.argmax(similarities)
-            predicted_fault = error_types[max_similarity_idx]
-            max_similarity = similarities[max_similarity_idx]
+            # 一次矩阵运算计算与故障库全部记录的相似度，取前3
+            top_matches = self.fault_database.search(test_vector, top_k=3)
+            predicted_fault, max_similarity = top_matches[0]
             
             # 显示结果
             print(f"\n预测的故障类型: {predicted_fault}")
             print(f"最高相似度: {max_similarity:.4f}")
             
             # 显示前3个最相似的结果
-            sorted_indices = np.argsort(similarities)[::-1]
             print("\n相似度排名前3的故障类型:")
             print("-" * 30)
-            for i, idx in enumerate(sorted_indices[:3]):
-                print(f"{i+1}. {error_types[idx]} (相似度: {similarities[idx]:.4f})")
+            for i, (fault_type, similarity) in enumerate(top_matches):
+                print(f"{i+1}. {fault_type} (相似度: {similarity:.4f})")
             
             print("="*50)
             
         except Exception as e:
             self.logger.error(f"故障类型识别失败: {e}")
-            messagebox.showerror("错误", f"故障类型识别失败: {e}")
+            show_error("错误", f"故障类型识别失败: {e}")
     
     def add_fault_to_database(self) -> None:
         """添加新的故障记录到数据库"""
@@ -501,16 +1071,12 @@ class AnomalyDetector:
                 return
             
             # 读取和处理故障日志
-            fault_lines = self.log_processor.read_log_file(fault_file)
-            if not fault_lines:
-                return
-            
-            fault_text = self.log_processor.clean_log_text(fault_lines)
+            fault_text = self.log_processor.clean_log_file(fault_file, self.vector_engine.text_token_limit())
             if not fault_text:
                 return
             
             # 向量化
-            fault_vector = self.vector_engine.text_to_vector(fault_text)
+            fault_vector = self.vector_engine.embed_text(fault_text)
             if fault_vector is None:
                 return
             
@@ -538,7 +1104,7 @@ class AnomalyDetector:
             
         except Exception as e:
             self.logger.error(f"添加故障记录失败: {e}")
-            messagebox.showerror("错误", f"添加故障记录失败: {e}")
+            show_error("错误", f"添加故障记录失败: {e}")
 
 
 def setup_logging():
@@ -562,9 +1128,11 @@ def show_menu() -> str:
     print("2. 故障类型识别 (与故障库对比)")
     print("3. 添加故障记录到数据库")
     print("4. 查看系统信息")
+    print("5. 异常检测 (与正常日志画像对比)")
+    print("6. 建立正常日志画像")
     print("0. 退出程序")
     print("="*50)
-    return input("请选择功能 (0-4): ").strip()
+    return input("请选择功能 (0-6): ").strip()
 
 
 def show_system_info():
@@ -573,18 +1141,38 @@ def show_system_info():
     print("系统信息")
     print("="*50)
     print(f"模型路径: {Config.MODEL_PATH}")
+    print(f"向量化后端: {Config.EMBEDDING_BACKEND}")
     print(f"数据库路径: {Config.DATABASE_PATH}")
     print(f"异常检测阈值: {Config.ANOMALY_THRESHOLD}")
     
+    profile = NormalProfile(Config.NORMAL_PROFILE_PATH)
+    if profile.exists():
+        print(f"正常画像基线日志数: {len(profile.store)}")
+    
     # 检查文件是否存在
     model_exists = os.path.exists(Config.MODEL_PATH)
+    store = VectorStore(Config.VECTOR_STORE_PATH)
     db_exists = os.path.exists(Config.DATABASE_PATH)
     
     print(f"模型状态: {'✅ 存在' if model_exists else '❌ 不存在'}")
+    
+    if Config.EMBEDDING_CACHE_PATH and os.path.exists(Config.EMBEDDING_CACHE_PATH):
+        cache = EmbeddingCache(Config.EMBEDDING_CACHE_PATH, Config.EMBEDDING_CACHE_MAX_BYTES)
+        print(f"向量缓存条目数: {len(cache)}")
+        cache.close()
+    
+    if store.exists():
+        print(f"向量库路径: {Config.VECTOR_STORE_PATH}")
+        print(f"故障记录数量: {len(store)}")
+        print("="*50)
+        return
+    
     print(f"数据库状态: {'✅ 存在' if db_exists else '❌ 不存在'}")
     
     if db_exists:
         try:
+            import pandas as pd
+            
             df = pd.read_csv(Config.DATABASE_PATH)
             record_count = len(df) - 1 if len(df) > 0 else 0  # 减去标题行
             print(f"故障记录数量: {record_count}")
@@ -622,6 +1210,10 @@ def main():
                 detector.add_fault_to_database()
             elif choice == '4':
                 show_system_info()
+            elif choice == '5':
+                detector.detect_anomaly_by_profile()
+            elif choice == '6':
+                detector.setup_normal_profile()
             else:
                 print("\n❌ 无效的选择，请重新输入！")
                 continue
@@ -1,15 +1,31 @@
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 import tkinter as tk
 from tkinter import filedialog
-import torch
 import os
+import sys
+
+from text2vec_v1 import VectorEngine
+
+# 模型来源：cache_folder 下的 all-MiniLM-L6-v2（Hugging Face 缓存目录结构），本地没有时下载到该目录
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+MODEL_CACHE_FOLDER = r"D:\wby\projectfiles\XW\code\txt2vec\hugface-model"
 
-def get_file_vector(file_path):
-    """读取文件并生成向量"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        text = f.read().split()
-    return model.encode([text], convert_to_numpy=True)
+def get_model_path():
+    """cache_folder 中模型快照的本地路径"""
+    from huggingface_hub import snapshot_download
+    return snapshot_download(MODEL_NAME, cache_dir=MODEL_CACHE_FOLDER)
+
+def get_file_vectors(file_paths):
+    """读取多个文件并通过 VectorEngine.encode_batch 批量生成向量（查询向量缓存、相同文本只编码一次、按token数排序分批）"""
+    texts = []
+    for file_path in file_paths:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            texts.append(' '.join(f.read().split()))
+    vectors = engine.encode_batch(texts)
+    if vectors is None:
+        print("向量化失败，程序退出")
+        sys.exit()
+    return [vector.reshape(1, -1) for vector in vectors]
 
 # 初始化GUI
 root = tk.Tk()
@@ -25,19 +41,16 @@ for i in range(4):
     )
     if not file:
         print("未选择文件，程序退出")
-        exit()
+        sys.exit()
     print(f"选择的文件: {file}")
     files.append(file)
 
 for idx, path in enumerate(files, 1):
     print(f"[文件{idx}] {os.path.basename(path)}")
 
-# 加载模型（放在文件选择之后以避免不必要的加载）
-model = SentenceTransformer(
-    'all-MiniLM-L6-v2',
-    device='cuda' if torch.cuda.is_available() else 'cpu',
-    cache_folder=r"D:\wby\projectfiles\XW\code\txt2vec\hugface-model"
-)
+# 向量化引擎（模型在第一次有未命中缓存的文本时才加载），有GPU时使用GPU
+import torch
+engine = VectorEngine(get_model_path(), device='cuda' if torch.cuda.is_available() else 'cpu')
 
 # model = SentenceTransformer(
 #     'all-mpnet-base-v2',
@@ -46,7 +59,7 @@ model = SentenceTransformer(
 # )
 
 # 生成所有文件的向量
-vectors = [get_file_vector(file) for file in files]
+vectors = get_file_vectors(files)
 
 # 计算每个文件与其它文件的相似度
 similarity_matrix = []
@@ -0,0 +1,215 @@
+"""
+多文件异常检测（txt2vec_v3 的推广）
+v3 固定选择4个文件，逐对调用 cosine_similarity 计算相似度矩阵。这里对一个目录中的全部日志：
+    1. 清洗后一次批量向量化（AnomalyDetector.vectorize_files）
+    2. 归一化向量矩阵与自身相乘得到相似度（Gram）矩阵，float32，按行分块计算，
+       每块只保留每行的平均/中位相似度与k个最近邻，内存占用为 块行数 x 文件数
+    3. 按平均相似度、中位相似度或局部离群因子（LOF）排序，最异常的文件排在最前
+数千个日志可以一次处理。
+
+用法:
+    python txt2vec_v4.py [日志目录] [--method mean|median|lof] [-k 近邻数] [--top N] [-o 结果.csv]
+不指定目录时弹出目录选择对话框。
+"""
+
+import os
+import csv
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+# 每块计算的相似度矩阵行数
+BLOCK_ROWS = 1024
+
+# 排序方式: 名称 -> (说明, 分数越大越异常)
+METHODS = {
+    "mean": ("平均相似度", False),
+    "median": ("中位相似度", False),
+    "lof": ("局部离群因子", True),
+}
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def similarity_statistics(vectors: np.ndarray, k: int = 10, block_rows: int = BLOCK_ROWS) -> Dict[str, np.ndarray]:
+    """
+    分块计算相似度矩阵，返回每个文件与其余文件的统计量（排除自身）
+
+    Args:
+        vectors: 形状为 (n, dim) 的向量矩阵，n 至少为2
+        k: 保留的最近邻数（LOF使用）
+        block_rows: 每块的行数
+
+    Returns:
+        mean          与其余文件的平均相似度
+        median        与其余文件的中位相似度
+        knn_index     形状 (n, k) 的最近邻下标，按相似度从高到低
+        knn_distance  形状 (n, k) 的最近邻余弦距离（1 - 相似度）
+    """
+    matrix = normalize(vectors)
+    n = len(matrix)
+    k = min(k, n - 1)
+    others = n - 1
+    mean = np.empty(n, dtype=np.float32)
+    median = np.empty(n, dtype=np.float32)
+    knn_index = np.empty((n, k), dtype=np.int64)
+    knn_similarity = np.empty((n, k), dtype=np.float32)
+
+    for start in range(0, n, block_rows):
+        block = matrix[start:start + block_rows] @ matrix.T
+        rows = np.arange(len(block))
+        diagonal = start + rows
+        # 自身相似度不参与统计：求和时减去，排序时置为最大值使其落在每行末尾
+        mean[start:start + len(block)] = (block.sum(axis=1) - block[rows, diagonal]) / others
+        block[rows, diagonal] = np.inf
+
+        top = np.argpartition(block, -(k + 1), axis=1)[:, -(k + 1):]
+        top_similarity = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_similarity, axis=1)[:, 1:]
+        knn_index[start:start + len(block)] = np.take_along_axis(top, order, axis=1)
+        knn_similarity[start:start + len(block)] = np.take_along_axis(top_similarity, order, axis=1)
+
+        # 前 n-1 个元素即其余文件，中位数只需要部分排序
+        middle = [(others - 1) // 2, others // 2]
+        block = np.partition(block, middle, axis=1)
+        median[start:start + len(block)] = block[:, middle].mean(axis=1)
+
+    return {
+        "mean": mean,
+        "median": median,
+        "knn_index": knn_index,
+        "knn_distance": np.maximum(1.0 - knn_similarity, 0.0),
+    }
+
+
+def local_outlier_factor(knn_index: np.ndarray, knn_distance: np.ndarray) -> np.ndarray:
+    """
+    由k近邻计算局部离群因子，约等于1为正常，明显大于1说明所在区域比邻居稀疏
+
+    Args:
+        knn_index: 形状 (n, k) 的最近邻下标
+        knn_distance: 形状 (n, k) 的最近邻距离，按从近到远排列
+    """
+    k_distance = knn_distance[:, -1]
+    reach_distance = np.maximum(knn_distance, k_distance[knn_index])
+    # 与 sklearn 相同加上极小值，避免重复日志距离为0时除零
+    lrd = 1.0 / (reach_distance.mean(axis=1) + 1e-10)
+    return lrd[knn_index].mean(axis=1) / lrd
+
+
+def rank_outliers(vectors: np.ndarray, method: str = "mean", k: int = 10,
+                  block_rows: int = BLOCK_ROWS) -> List[Dict]:
+    """
+    对文件按异常程度排序
+
+    Returns:
+        按异常程度从高到低排列的 [{"index", "mean", "median", "lof", "score", "outlier"}, ...]
+        outlier 表示分数偏离全体中位数超过3倍MAD（LOF另要求大于1.5）
+    """
+    if method not in METHODS:
+        raise ValueError(f"未知的排序方式: {method}")
+    if len(vectors) < 2:
+        raise ValueError("至少需要2个日志文件")
+
+    stats = similarity_statistics(vectors, k, block_rows)
+    lof = local_outlier_factor(stats["knn_index"], stats["knn_distance"])
+    scores = lof if method == "lof" else stats[method]
+    higher_is_outlier = METHODS[method][1]
+
+    center = np.median(scores)
+    mad = np.median(np.abs(scores - center)) * 1.4826 + 1e-6
+    deviation = (scores - center) / mad if higher_is_outlier else (center - scores) / mad
+    outlier = deviation > 3.0
+    if method == "lof":
+        outlier &= scores > 1.5
+
+    order = np.argsort(-scores if higher_is_outlier else scores, kind="stable")
+    return [{
+        "index": int(idx),
+        "mean": float(stats["mean"][idx]),
+        "median": float(stats["median"][idx]),
+        "lof": float(lof[idx]),
+        "score": float(scores[idx]),
+        "outlier": bool(outlier[idx]),
+    } for idx in order]
+
+
+def find_log_files(directory: str) -> List[str]:
+    """递归查找目录中的.txt/.log文件"""
+    return sorted(str(path) for path in Path(directory).rglob('*')
+                  if path.is_file() and path.suffix.lower() in ('.txt', '.log'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="找出目录中与其他日志差异最大的日志")
+    parser.add_argument("directory", nargs="?", help="日志目录，不指定时弹出选择对话框")
+    parser.add_argument("--method", choices=sorted(METHODS), default="mean", help="排序方式，默认为平均相似度")
+    parser.add_argument("-k", type=int, default=10, help="LOF近邻数")
+    parser.add_argument("--top", type=int, default=10, help="显示最异常的前N个文件")
+    parser.add_argument("--block-rows", type=int, default=BLOCK_ROWS, help="相似度矩阵每块的行数")
+    parser.add_argument("-o", "--output", help="完整排序结果输出为CSV")
+    args = parser.parse_args()
+
+    directory = args.directory
+    if not directory:
+        import tkinter as tk
+        from tkinter import filedialog
+        root = tk.Tk()
+        root.withdraw()
+        directory = filedialog.askdirectory(title="选择日志目录")
+        root.destroy()
+        if not directory:
+            print("未选择目录，程序退出")
+            return
+
+    files = find_log_files(directory)
+    if len(files) < 2:
+        print(f"目录中的日志文件少于2个: {directory}")
+        return
+
+    # 加载模型放在文件查找之后以避免不必要的加载
+    import text2vec_v1
+    text2vec_v1.Config.SHOW_ERROR_DIALOGS = False
+    detector = text2vec_v1.AnomalyDetector()
+
+    start = time.perf_counter()
+    vectors, paths = detector.vectorize_files(files)
+    encoded = time.perf_counter()
+    if vectors is None or len(paths) < 2:
+        print("可向量化的日志文件少于2个")
+        return
+    ranking = rank_outliers(vectors, args.method, args.k, args.block_rows)
+    ranked = time.perf_counter()
+
+    label, _ = METHODS[args.method]
+    print("\n" + "=" * 60)
+    print(f"共 {len(paths)} 个日志（跳过 {len(files) - len(paths)} 个），按{label}排序，最异常的前 {args.top} 个：")
+    for rank, row in enumerate(ranking[:args.top], 1):
+        status = "★异常文件★" if row["outlier"] else "正常文件"
+        print(f"{rank:>4}. [{status}] {os.path.relpath(paths[row['index']], directory)}")
+        print(f"      平均相似度: {row['mean']:.4f}  中位相似度: {row['median']:.4f}  LOF: {row['lof']:.3f}")
+    outliers = sum(row["outlier"] for row in ranking)
+    print("=" * 60)
+    print(f"判为异常的文件: {outliers} 个")
+    print(f"向量化 {encoded - start:.2f}秒，相似度矩阵与排序 {(ranked - encoded) * 1000:.1f}毫秒")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["rank", "file", "mean_similarity", "median_similarity", "lof", "outlier"])
+            for rank, row in enumerate(ranking, 1):
+                writer.writerow([rank, paths[row["index"]], f"{row['mean']:.6f}", f"{row['median']:.6f}",
+                                 f"{row['lof']:.6f}", int(row["outlier"])])
+        print(f"完整结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+故障向量二进制存储
+替代 database.csv 的文本浮点格式：
+    vectors.f32     行优先的float32原始矩阵（已按行L2归一化），可直接内存映射
+    label_ids.i32   每行一个int32标签编号，与矩阵同一行对应，可直接内存映射
+    labels.json     标签字符串表（JSON列表），编号为表中的下标
+    meta.json       向量维度与已提交的记录数
+追加记录时只在两个列文件末尾写入，最后原子替换 meta.json 提交新的记录数；
+中断的写入只会在列文件末尾留下多余的部分，读取时按记录数忽略，下次追加前截掉
+
+用法（一次性迁移）: python vector_store.py migrate <database.csv> <存储目录>
+"""
+
+import os
+import re
+import csv
+import sys
+import json
+import logging
+import tempfile
+from typing import List, Tuple, Iterable, Optional
+
+import numpy as np
+
+
+class VectorStore:
+    """内存映射的float32向量库"""
+
+    VECTORS_FILE = 'vectors.f32'
+    LABEL_IDS_FILE = 'label_ids.i32'
+    LABELS_FILE = 'labels.json'
+    META_FILE = 'meta.json'
+    # 旧版本每行一个JSON标签的文件，打开时自动转换
+    LEGACY_LABELS_FILE = 'labels.jsonl'
+    FORMAT_VERSION = 2
+
+    def __init__(self, store_path: str):
+        """
+        Args:
+            store_path: 存储目录
+        """
+        self.logger = logging.getLogger(__name__)
+        self.store_path = store_path
+        self.vectors_path = os.path.join(store_path, self.VECTORS_FILE)
+        self.label_ids_path = os.path.join(store_path, self.LABEL_IDS_FILE)
+        self.labels_path = os.path.join(store_path, self.LABELS_FILE)
+        self.meta_path = os.path.join(store_path, self.META_FILE)
+        # meta.json 的内容，首次使用时读取，本实例追加后直接更新
+        self._meta = None
+
+    def exists(self) -> bool:
+        """存储是否已建立"""
+        return os.path.exists(self.meta_path)
+
+    def _read_meta(self, refresh: bool = False) -> dict:
+        """读取 meta.json（refresh为False时使用已读取的内容），旧版本存储先转换为当前格式"""
+        if self._meta is None or refresh:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version', 1) < self.FORMAT_VERSION:
+                meta = self._upgrade(meta)
+            self._meta = meta
+        return self._meta
+
+    def _write_json(self, path: str, data) -> None:
+        """写入临时文件后原子替换，读取方不会看到写了一半的文件"""
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.store_path)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _commit(self, meta: dict) -> None:
+        self._write_json(self.meta_path, meta)
+        self._meta = meta
+
+    @property
+    def dim(self) -> Optional[int]:
+        """向量维度，存储未建立时为None"""
+        return self._read_meta()['dim'] if self.exists() else None
+
+    def create(self, dim: int) -> None:
+        """
+        建立空存储
+
+        Args:
+            dim: 向量维度
+        """
+        os.makedirs(self.store_path, exist_ok=True)
+        open(self.vectors_path, 'wb').close()
+        open(self.label_ids_path, 'wb').close()
+        self._write_json(self.labels_path, [])
+        self._commit({'version': self.FORMAT_VERSION, 'dim': int(dim), 'dtype': 'float32',
+                      'normalized': True, 'count': 0})
+
+    def clear(self) -> None:
+        """删除存储的全部文件"""
+        for path in (self.meta_path, self.vectors_path, self.label_ids_path, self.labels_path,
+                     os.path.join(self.store_path, self.LEGACY_LABELS_FILE)):
+            if os.path.exists(path):
+                os.remove(path)
+        self._meta = None
+
+    def _read_label_table(self) -> List[str]:
+        with open(self.labels_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def append(self, vectors: np.ndarray, labels: Iterable[str]) -> int:
+        """
+        追加记录（向量写入前按行归一化）
+
+        Args:
+            vectors: 单个向量或形状为 (n, dim) 的矩阵
+            labels: 与向量一一对应的故障类型
+
+        Returns:
+            追加的记录数
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = vectors.reshape(-1, vectors.shape[-1])
+        labels = [str(label) for label in labels]
+        if len(labels) != len(vectors):
+            raise ValueError(f"向量数 {len(vectors)} 与标签数 {len(labels)} 不一致")
+
+        if not self.exists():
+            self.create(vectors.shape[1])
+        # 其他进程可能已追加记录，以磁盘上的记录数为准
+        meta = dict(self._read_meta(refresh=True))
+        if vectors.shape[1] != meta['dim']:
+            raise ValueError(f"向量维度 {vectors.shape[1]} 与存储维度 {meta['dim']} 不一致")
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        count = meta['count']
+        self._discard_uncommitted(count, meta['dim'])
+
+        # 新标签先加入字符串表，之后写入的编号才有对应的标签
+        table = self._read_label_table()
+        label_ids = {label: idx for idx, label in enumerate(table)}
+        size = len(table)
+        ids = np.array([label_ids.setdefault(label, len(label_ids)) for label in labels], dtype=np.int32)
+        if len(label_ids) != size:
+            self._write_json(self.labels_path, list(label_ids))
+
+        with open(self.vectors_path, 'ab') as f:
+            (vectors / norms).astype(np.float32).tofile(f)
+        with open(self.label_ids_path, 'ab') as f:
+            ids.tofile(f)
+        meta['count'] = count + len(labels)
+        self._commit(meta)
+        return len(labels)
+
+    def _discard_uncommitted(self, count: int, dim: int) -> None:
+        """截掉上次中断的追加在列文件末尾留下的、未提交到 meta.json 的部分"""
+        for path, row_bytes in ((self.vectors_path, 4 * dim), (self.label_ids_path, 4)):
+            if os.path.getsize(path) > count * row_bytes:
+                self.logger.warning(f"向量库存在未完成的写入，已截断到 {count} 条记录: {path}")
+                with open(path, 'rb+') as f:
+                    f.truncate(count * row_bytes)
+
+    def _upgrade(self, meta: dict) -> dict:
+        """把旧版本的 labels.jsonl 转为标签编号列与字符串表，记录数取向量与标签中较少的一方"""
+        legacy_path = os.path.join(self.store_path, self.LEGACY_LABELS_FILE)
+        labels = []
+        if os.path.exists(legacy_path):
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                # 中断写入可能留下没有换行符的半行标签，不读取
+                labels = [json.loads(line) for line in f if line.endswith('\n') and line.strip()]
+        count = min(len(labels), os.path.getsize(self.vectors_path) // (4 * meta['dim']))
+        label_ids = {}
+        ids = np.array([label_ids.setdefault(label, len(label_ids)) for label in labels[:count]], dtype=np.int32)
+        ids.tofile(self.label_ids_path)
+        self._write_json(self.labels_path, list(label_ids))
+        meta = dict(meta, version=self.FORMAT_VERSION, count=count)
+        self._discard_uncommitted(count, meta['dim'])
+        self._write_json(self.meta_path, meta)
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+        self.logger.info(f"向量库已转换为标签编号格式，共 {count} 条记录: {self.store_path}")
+        return meta
+
+    def load(self) -> Tuple[np.ndarray, List[str]]:
+        """
+        内存映射加载全部已提交的记录
+
+        Returns:
+            (只读的 (n, dim) float32 矩阵, 故障类型列表)
+        """
+        if not self.exists():
+            return np.empty((0, 0), dtype=np.float32), []
+
+        count = self._read_meta(refresh=True)['count']
+        table = np.array(self._read_label_table(), dtype=object)
+        ids = np.fromfile(self.label_ids_path, dtype=np.int32, count=count)
+        return self.open_matrix(count), table[ids].tolist()
+
+    def open_matrix(self, count: int) -> np.ndarray:
+        """
+        内存映射前count行向量
+
+        Args:
+            count: 行数
+
+        Returns:
+            只读的 (count, dim) float32 矩阵
+        """
+        dim = self.dim
+        if count == 0:
+            return np.empty((0, dim), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(count, dim))
+
+    def __len__(self) -> int:
+        return self._read_meta(refresh=True)['count'] if self.exists() else 0
+
+    def migrate_from_csv(self, csv_path: str) -> int:
+        """
+        从旧的 database.csv 一次性迁移
+
+        Args:
+            csv_path: CSV故障库路径
+
+        Returns:
+            迁移的记录数
+        """
+        vectors, labels = read_csv_records(csv_path)
+        if not vectors:
+            self.logger.warning(f"CSV故障库中没有可迁移的记录: {csv_path}")
+            return 0
+        count = self.append(np.vstack(vectors), labels)
+        self.logger.info(f"已从 {csv_path} 迁移 {count} 条故障记录到 {self.store_path}")
+        return count
+
+
+def read_csv_records(csv_path: str) -> Tuple[List[np.ndarray], List[str]]:
+    """
+    读取旧CSV故障库，解析规则与 FaultDatabase.load_fault_records 相同
+    兼容 add_fault_record 写入的空格分隔格式和 vec_save 写入的numpy数组格式
+
+    Args:
+        csv_path: CSV故障库路径
+
+    Returns:
+        (向量列表, 错误类型列表)
+    """
+    logger = logging.getLogger(__name__)
+    vectors = []
+    labels = []
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        for i, row in enumerate(csv.reader(f)):
+            if len(row) < 2:
+                continue
+            # 跳过标题行
+            if i == 0 and row[1] == 'error_type':
+                continue
+            try:
+                cleaned_text = row[0].strip('"\' []')
+                cleaned_text = re.sub(r'\s+', ' ', cleaned_text)
+                vector = np.array(cleaned_text.split(), dtype=np.float32)
+                if vector.size == 0:
+                    raise ValueError("空向量")
+            except ValueError as ve:
+                logger.warning(f"跳过无效的向量记录 (行 {i}): {ve}")
+                continue
+            vectors.append(vector)
+            labels.append(row[1])
+    return vectors, labels
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if len(sys.argv) != 4 or sys.argv[1] != 'migrate':
+        print("用法: python vector_store.py migrate <database.csv> <存储目录>")
+        return
+    store = VectorStore(sys.argv[3])
+    if store.exists():
+        print(f"存储目录已存在故障库，未执行迁移: {sys.argv[3]}")
+        return
+    count = store.migrate_from_csv(sys.argv[2])
+    print(f"迁移完成，共 {count} 条记录")
+
+
+if __name__ == "__main__":
+    main()